@@ -0,0 +1,207 @@
+"""Benchmarks of the Golden Config optimizations against the implementations they replace.
+
+Run with `invoke benchmark`, optionally limited to some of them with `invoke benchmark --names diff_engine`.
+Each benchmark prints the best duration of a few runs of both implementations, after checking their results match.
+The file is fed to the interactive `nbshell`, so the functions must not have blank lines.
+"""
+
+import difflib
+import json
+import random
+import time
+from collections import OrderedDict
+from os import getenv
+from types import SimpleNamespace
+
+from nautobot_golden_config.models import _get_json_compliance, _get_xml_compliance
+from nautobot_golden_config.tests.test_models import (
+    _get_json_compliance_full_diff,
+    _get_xml_compliance_two_pass,
+    _json_interfaces,
+    _xml_interfaces,
+)
+from nautobot_golden_config.tests.test_utilities.test_config_sanitizer import (
+    REMOVE_LINES,
+    SUBSTITUTE_LINES,
+    netutils_sanitize,
+    router_config,
+)
+from nautobot_golden_config.tests.test_utilities.test_diff_engine import (
+    access_switch_config,
+    apply_unified_diff,
+    prefix_list_config,
+)
+from nautobot_golden_config.tests.test_utilities.test_helpers import (
+    XmlSubtreeTest,
+    _get_xml_subtree_per_match,
+    _openconfig_interfaces,
+)
+from nautobot_golden_config.utilities import json_codec
+from nautobot_golden_config.utilities.config_sanitizer import ConfigSanitizer
+from nautobot_golden_config.utilities.diff_engine import fast_unified_diff
+from nautobot_golden_config.utilities.helper import get_xml_config, get_xml_subtree_with_full_path
+
+BENCHMARKS = {}
+
+
+def benchmark(function):
+    """Register a benchmark under the name of its function."""
+    BENCHMARKS[function.__name__] = function
+    return function
+
+
+def _timed(function, runs=3):
+    """Return the best duration of a few runs of a function, and its result."""
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - started)
+    return min(durations), result
+
+
+def _check(condition, message):
+    """Fail the benchmark when its optimized implementation gives another result than the baseline."""
+    if not condition:
+        raise RuntimeError(message)
+
+
+def _report(name, duration, baseline_duration=None):
+    """Print the duration of a benchmark case, and its speedup over the baseline when there is one."""
+    if baseline_duration is None:
+        print(f"  {name}: {duration:.3f}s")
+    else:
+        print(f"  {name}: {duration:.3f}s, baseline {baseline_duration:.3f}s, {baseline_duration / duration:.1f}x")
+
+
+@benchmark
+def diff_engine():
+    """Diff large configurations with `fast_unified_diff` and `difflib.unified_diff`."""
+    backup = access_switch_config(2000)
+    intended = list(backup)
+    for index in range(4, len(intended), 60):
+        intended[index] = " switchport access vlan 20\n"
+    duration, diff = _timed(lambda: list(fast_unified_diff(backup, intended, lineterm="")))
+    baseline_duration, baseline_diff = _timed(lambda: list(difflib.unified_diff(backup, intended, lineterm="")))
+    _check(diff == baseline_diff, "The diff differs from difflib.")
+    _report("VLAN change every ten interfaces of 2000", duration, baseline_duration)
+    backup = prefix_list_config(50000)
+    prefixes = backup[5:]
+    intended = backup[:5] + prefixes[1000:] + prefixes[:1000]
+    duration, diff = _timed(lambda: list(fast_unified_diff(backup, intended, lineterm="")))
+    _check(apply_unified_diff(backup, diff) == intended, "The diff does not apply.")
+    _report(f"1000 prefixes of 50000 moved, {len(diff)} diff lines", duration)
+
+
+def _device_config(interfaces):
+    """Return the JSON configuration of a device, as a dictionary of top level features."""
+    return {
+        "hostname": "router1",
+        "interfaces": {
+            f"Gi{index}": {"description": f"link {index}", "mtu": 9000, "enabled": True, "vlans": list(range(10))}
+            for index in range(interfaces)
+        },
+        "ntp": {"servers": ["192.0.2.1", "192.0.2.2"]},
+        "snmp": {"community": "public", "contact": "noc@example.com"},
+    }
+
+
+def _sot_agg_data(interfaces):
+    """Return SoT aggregation data shaped like a GraphQL result, with nested OrderedDict."""
+    return OrderedDict(
+        name="router1",
+        interfaces=[
+            OrderedDict(name=f"Gi{index}", description=f"link {index}", ip_addresses=[{"address": "192.0.2.1/24"}])
+            for index in range(interfaces)
+        ],
+    )
+
+
+def _select_features(config_json, features):
+    """Return the top level features of a parsed JSON configuration, as the compliance rules match them."""
+    return {feature: config_json[feature] for feature in features}
+
+
+@benchmark
+def json_codec_orjson():
+    """Parse JSON backups and convert SoT aggregation data with orjson and with the standard library."""
+    if json_codec.orjson is None:
+        print("  orjson is not installed.")
+        return
+    config = json.dumps(_device_config(5000))
+    rules = ["hostname", "interfaces", "ntp", "snmp"]
+    duration, parsed = _timed(lambda: _select_features(json_codec.loads(config), rules))
+    baseline_duration, baseline_parsed = _timed(lambda: {rule: json.loads(config)[rule] for rule in rules})
+    _check(parsed == baseline_parsed, "The parsed configuration differs from json.")
+    _report("JSON backup of 5000 interfaces parsed once, against once per rule", duration, baseline_duration)
+    data = _sot_agg_data(20000)
+    duration, converted = _timed(lambda: json_codec.loads(json_codec.dumps(data)))
+    baseline_duration, baseline_converted = _timed(lambda: json.loads(json.dumps(data)))
+    _check(converted == baseline_converted, "The converted data differs from json.")
+    _report("SoT aggregation data of 20000 interfaces converted to plain types", duration, baseline_duration)
+
+
+@benchmark
+def json_compliance():
+    """Compare a large JSON value drifting on a single leaf with the hashed compliance and the full DeepDiff."""
+    actual, intended = _json_interfaces(1000), _json_interfaces(1000)
+    intended["Gi7"]["units"][3]["vlan"] = "100"
+    obj = SimpleNamespace(actual=actual, intended=intended, ordered=True)
+    duration, compliance = _timed(lambda: _get_json_compliance(obj))
+    baseline_duration, baseline_compliance = _timed(lambda: _get_json_compliance_full_diff(obj))
+    _check(compliance == baseline_compliance, "The compliance differs from the full DeepDiff.")
+    _report("A VLAN change on 1000 interfaces", duration, baseline_duration)
+
+
+@benchmark
+def xml_compliance():
+    """Compare a large XML configuration with the single pass compliance and the two pass one it replaces."""
+    actual = _xml_interfaces(random.Random(1), 1500, values=("up",))  # noqa: S311
+    obj = SimpleNamespace(
+        actual=actual, intended=actual.replace("<mtu>1500</mtu>", "<mtu>9216</mtu>", 30), ordered=True
+    )
+    duration, compliance = _timed(lambda: _get_xml_compliance(obj))
+    baseline_duration, baseline_compliance = _timed(lambda: _get_xml_compliance_two_pass(obj))
+    _check(compliance == baseline_compliance, "The compliance differs from the two pass one.")
+    _report("30 MTU changes on 1500 interfaces", duration, baseline_duration)
+
+
+@benchmark
+def xml_subtree():
+    """Extract the MTU of many interfaces of a large NETCONF payload, merged and with a parent chain per match."""
+    config_xml = get_xml_config(_openconfig_interfaces(500))
+    match_config = XmlSubtreeTest.MTU_XPATH
+    duration, subtree = _timed(lambda: get_xml_subtree_with_full_path(config_xml, match_config))
+    baseline_duration, baseline_subtree = _timed(lambda: _get_xml_subtree_per_match(config_xml, match_config))
+    _check(len(subtree) < len(baseline_subtree), "The subtree is not smaller than per match.")
+    _report("MTU of 500 interfaces", duration, baseline_duration)
+    config_xml = get_xml_config(_openconfig_interfaces(5000))
+    duration, _ = _timed(lambda: get_xml_subtree_with_full_path(config_xml, match_config))
+    _report("MTU of 5000 interfaces", duration)
+
+
+@benchmark
+def config_sanitizer():
+    """Sanitize a large configuration with many rules with the `ConfigSanitizer` and with netutils."""
+    config = router_config(6000)
+    remove_lines = REMOVE_LINES + [{"regex": rf"^logging\s+host\s+192\.0\.2\.{index}\s.*\n"} for index in range(50)]
+    substitute_lines = SUBSTITUTE_LINES + [
+        {"regex": rf"^(tacacs-server\s+key\s+{index}\s+)\S+", "replace": r"\1<redacted>"} for index in range(10)
+    ]
+    sanitizer = ConfigSanitizer(remove_lines, substitute_lines)
+    duration, sanitized = _timed(lambda: sanitizer.sanitize(config))
+    baseline_duration, baseline_sanitized = _timed(lambda: netutils_sanitize(config, remove_lines, substitute_lines))
+    _check(sanitized == baseline_sanitized, "The sanitized configuration differs from netutils.")
+    _report("60 rules on 6000 interfaces", duration, baseline_duration)
+
+
+def _main():
+    names = [name for name in getenv("BENCHMARK_NAMES", "").split(",") if name] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            raise RuntimeError(f"Unknown benchmark: {name}, one of {', '.join(BENCHMARKS)}")
+        print(f"{name}:")
+        BENCHMARKS[name]()
+
+
+_main()
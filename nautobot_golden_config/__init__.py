@@ -36,6 +36,21 @@ class GoldenConfig(NautobotAppConfig):
         "per_feature_width": 13,
         "per_feature_height": 4,
         "get_custom_compliance": None,
+        "get_custom_compliance_batch": None,
+        "get_custom_remediation_batch": None,
+        "inventory_chunk_size": 0,
+        "queue_routing": {},
+        "sot_agg_batch_size": 0,
+        "sot_agg_cache_timeout": 0,
+        "jinja_bytecode_cache_dir": "",
+        "jinja_bytecode_cache_timeout": 0,
+        "compliance_source": "repository",
+        "compliance_rule_recompute": False,
+        "compliance_after_backup": False,
+        "compliance_after_backup_batch_size": 50,
+        "store_compliance_diff": True,
+        "compliance_diff_cache_timeout": 86400,
+        "compliance_diff_engine": "difflib.unified_diff",
         "jinja_env": {
             "undefined": "jinja2.StrictUndefined",
             "trim_blocks": True,
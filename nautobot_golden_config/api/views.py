@@ -1,7 +1,5 @@
 """View for Golden Config APIs."""
 
-import json
-
 from django.contrib.contenttypes.models import ContentType
 from nautobot.core.api.views import (
     BulkDestroyModelMixin,
@@ -12,6 +10,7 @@ from nautobot.core.api.views import (
 from nautobot.dcim.models import Device
 from nautobot.extras.api.views import NautobotModelViewSet, NotesViewSetMixin
 from rest_framework import mixins, viewsets
+from rest_framework.decorators import action
 from rest_framework.mixins import DestroyModelMixin, ListModelMixin, RetrieveModelMixin, UpdateModelMixin
 from rest_framework.permissions import AllowAny, BasePermission, IsAuthenticated
 from rest_framework.response import Response
@@ -21,6 +20,7 @@ from rest_framework.viewsets import GenericViewSet
 
 from nautobot_golden_config import filters, models
 from nautobot_golden_config.api import serializers
+from nautobot_golden_config.utilities.compliance_diff import get_compliance_diff
 from nautobot_golden_config.utilities.graphql import graph_ql_query
 from nautobot_golden_config.utilities.helper import get_device_to_settings_map
 
@@ -42,8 +42,9 @@ class SOTAggDeviceDetailView(APIView):
         """Get method serialize for a dictionary to json response."""
         device = Device.objects.get(pk=kwargs["pk"])
         settings = get_device_to_settings_map(queryset=Device.objects.filter(pk=device.pk))[device.id]
-        status_code, data = graph_ql_query(request, device, settings.sot_agg_query.query)
-        data = json.loads(json.dumps(data))
+        status_code, data = graph_ql_query(
+            request, device, settings.sot_agg_query.query, query_id=settings.sot_agg_query.pk
+        )
         return Response(serializers.GraphQLSerializer(data=data).initial_data, status=status_code)
 
 
@@ -78,6 +79,11 @@ class GoldenConfigViewSet(NautobotModelViewSet):  # pylint:disable=too-many-ance
     serializer_class = serializers.GoldenConfigSerializer
     filterset_class = filters.GoldenConfigFilterSet
 
+    @action(detail=True, methods=["get"], url_path="compliance-diff")
+    def compliance_diff(self, request, pk=None):  # pylint: disable=unused-argument
+        """Return the full configuration diff of the device, computed on demand when not stored by the job."""
+        return Response({"compliance_config": get_compliance_diff(self.get_object())})
+
 
 class GoldenConfigSettingViewSet(NautobotModelViewSet):  # pylint:disable=too-many-ancestors
     """API viewset for interacting with GoldenConfigSetting objects."""
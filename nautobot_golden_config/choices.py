@@ -43,3 +43,31 @@ class ConfigPlanTypeChoice(ChoiceSet):
         (TYPE_REMEDIATION, "Remediation"),
         (TYPE_MANUAL, "Manual"),
     )
+
+
+class ShardTypeChoice(ChoiceSet):
+    """Choiceset used to split the devices of a job in shards."""
+
+    TYPE_NONE = "none"
+    TYPE_COUNT = "count"
+    TYPE_LOCATION = "location"
+    TYPE_SETTING = "setting"
+
+    CHOICES = (
+        (TYPE_NONE, "None"),
+        (TYPE_COUNT, "Device Count"),
+        (TYPE_LOCATION, "Location"),
+        (TYPE_SETTING, "Golden Config Setting"),
+    )
+
+
+class ComplianceSourceChoice(ChoiceSet):
+    """Choiceset used to select where the compliance job reads the backup and intended configurations from."""
+
+    TYPE_REPOSITORY = "repository"
+    TYPE_DATABASE = "database"
+
+    CHOICES = (
+        (TYPE_REPOSITORY, "Git Repositories"),
+        (TYPE_DATABASE, "Database"),
+    )
@@ -11,30 +11,70 @@ from nautobot.extras.registry import DatasourceContent
 from nautobot_golden_config.exceptions import MissingReference
 from nautobot_golden_config.models import ComplianceFeature, ComplianceRule, ConfigRemove, ConfigReplace
 from nautobot_golden_config.utilities.constant import ENABLE_BACKUP, ENABLE_COMPLIANCE, ENABLE_INTENDED
+from nautobot_golden_config.utilities.helper import precompile_jinja_templates
+from nautobot_golden_config.utilities.repo_index import delete_repository_index, refresh_repository_index
 
 
-def refresh_git_jinja(repository_record, job_result, delete=False):  # pylint: disable=unused-argument
-    """Callback for gitrepository updates on Jinja Template repo."""
+def refresh_git_jinja(repository_record, job_result, delete=False):
+    """Callback for gitrepository updates on Jinja Template repo.
+
+    The templates are compiled and the ones that fail to compile are reported. When the shared bytecode cache is
+    enabled, the intended job then loads them compiled.
+    """
     job_result.log(
         "Successfully Pulled git repo",
         level_choice=LogLevelChoices.LOG_DEBUG,
     )
+    if delete:
+        return
+
+    compiled, errors = precompile_jinja_templates(repository_record.filesystem_path)
+    for template_name, error in errors:
+        job_result.log(
+            f"`E3035:` The template `{template_name}` failed to compile: {error}",
+            obj=repository_record,
+            level_choice=LogLevelChoices.LOG_ERROR,
+        )
+    job_result.log(
+        f"Compiled {compiled} Jinja templates, {len(errors)} failed.",
+        level_choice=LogLevelChoices.LOG_INFO,
+    )
 
 
-def refresh_git_intended(repository_record, job_result, delete=False):  # pylint: disable=unused-argument
+def refresh_git_intended(repository_record, job_result, delete=False):
     """Callback for gitrepository updates on Intended Config repo."""
     job_result.log(
         "Successfully Pulled git repo",
         level_choice=LogLevelChoices.LOG_DEBUG,
     )
+    refresh_git_config_index(repository_record, job_result, delete)
 
 
-def refresh_git_backup(repository_record, job_result, delete=False):  # pylint: disable=unused-argument
+def refresh_git_backup(repository_record, job_result, delete=False):
     """Callback for gitrepository updates on Git Backup repo."""
     job_result.log(
         "Successfully Pulled git repo",
         level_choice=LogLevelChoices.LOG_DEBUG,
     )
+    refresh_git_config_index(repository_record, job_result, delete)
+
+
+def refresh_git_config_index(repository_record, job_result, delete=False):
+    """Build the file index of a backup or intended repo, used by the compliance job to locate the configs."""
+    if delete:
+        delete_repository_index(repository_record)
+        return
+    index = refresh_repository_index(repository_record)
+    if index is None:
+        job_result.log(
+            "Unable to index the repository, the compliance job will locate its files one by one.",
+            level_choice=LogLevelChoices.LOG_WARNING,
+        )
+        return
+    job_result.log(
+        f"Indexed {len(index['files'])} files at commit {index['commit']}.",
+        level_choice=LogLevelChoices.LOG_DEBUG,
+    )
 
 
 def refresh_git_gc_properties(repository_record, job_result, delete=False):  # pylint: disable=unused-argument
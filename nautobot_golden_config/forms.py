@@ -1,8 +1,6 @@
 """Forms for Device Configuration Backup."""
 # pylint: disable=too-many-ancestors
 
-import json
-
 import django.forms as django_forms
 from nautobot.apps import forms
 from nautobot.dcim.models import Device, DeviceType, Location, Manufacturer, Platform, Rack, RackGroup
@@ -12,6 +10,7 @@ from nautobot.tenancy.models import Tenant, TenantGroup
 
 from nautobot_golden_config import models
 from nautobot_golden_config.choices import ComplianceRuleConfigTypeChoice, ConfigPlanTypeChoice, RemediationTypeChoice
+from nautobot_golden_config.utilities import json_codec
 
 # ConfigCompliance
 
@@ -539,7 +538,7 @@ class ConfigPlanForm(NautobotModelForm):
             }
         ]
         # Example of how to use this `JSON.parse('{{ form.hide_form_data|safe }}')`
-        self.hide_form_data = json.dumps(hide_form_data)
+        self.hide_form_data = json_codec.dumps(hide_form_data)
 
     class Meta:
         """Boilerplate form Meta data for ConfigPlan."""
@@ -4,8 +4,11 @@
 # TODO: Remove the following ignore, added to be able to pass pylint in CI.
 # pylint: disable=arguments-differ
 
+import time
 from datetime import datetime
 
+from celery import group
+from django.conf import settings
 from django.utils.timezone import make_aware
 from nautobot.core.celery import register_jobs
 from nautobot.dcim.models import Device, DeviceType, Location, Manufacturer, Platform, Rack, RackGroup
@@ -13,6 +16,7 @@ from nautobot.extras.datasources.git import ensure_git_repository, get_repo_from
 from nautobot.extras.jobs import (
     BooleanVar,
     ChoiceVar,
+    IntegerVar,
     Job,
     JobButtonReceiver,
     MultiObjectVar,
@@ -26,13 +30,14 @@ from nautobot_plugin_nornir.plugins.inventory.nautobot_orm import NautobotORMInv
 from nornir.core.plugins.inventory import InventoryPluginRegister
 from nornir_nautobot.exceptions import NornirNautobotException
 
-from nautobot_golden_config.choices import ConfigPlanTypeChoice
+from nautobot_golden_config.choices import ComplianceSourceChoice, ConfigPlanTypeChoice, ShardTypeChoice
 from nautobot_golden_config.exceptions import BackupFailure, ComplianceFailure, IntendedGenerationFailure
 from nautobot_golden_config.models import ComplianceFeature, ConfigPlan, GoldenConfig
 from nautobot_golden_config.nornir_plays.config_backup import config_backup
 from nautobot_golden_config.nornir_plays.config_compliance import config_compliance
 from nautobot_golden_config.nornir_plays.config_deployment import config_deployment
 from nautobot_golden_config.nornir_plays.config_intended import config_intended
+from nautobot_golden_config.tasks import run_play_shard
 from nautobot_golden_config.utilities import constant
 from nautobot_golden_config.utilities.config_plan import (
     config_plan_default_status,
@@ -40,21 +45,38 @@ from nautobot_golden_config.utilities.config_plan import (
     generate_config_set_from_manual,
 )
 from nautobot_golden_config.utilities.git import GitRepo
-from nautobot_golden_config.utilities.helper import get_device_to_settings_map, get_job_filter
+from nautobot_golden_config.utilities.helper import get_device_to_settings_map, get_job_filter, get_task_queues
+from nautobot_golden_config.utilities.repo_index import refresh_repository_index
+from nautobot_golden_config.utilities.sharding import get_device_shards, write_shard_configs
+from nautobot_golden_config.utilities.time_budget import TimeBudget
 
 InventoryPluginRegister.register("nautobot-inventory", NautobotORMInventory)
 
 name = "Golden Configuration"  # pylint: disable=invalid-name
 
+PLAY_FAILURES = {
+    config_backup: BackupFailure,
+    config_intended: IntendedGenerationFailure,
+    config_compliance: ComplianceFailure,
+}
+# Seconds between two polls of the shard results, and the time the shards are waited for after the job deadline,
+# when no device time budget bounds the devices still running then.
+SHARD_POLL_INTERVAL = 5
+SHARD_DEADLINE_GRACE = 600
 
-def get_repo_types_for_job(job_name):
+
+def get_repo_types_for_job(job_name, config_source=None):
     """Logic to determine which repo_types are needed based on job + plugin settings."""
     repo_types = []
     if constant.ENABLE_BACKUP and job_name == "nautobot_golden_config.jobs.BackupJob":
         repo_types.extend(["backup_repository"])
     if constant.ENABLE_INTENDED and job_name == "nautobot_golden_config.jobs.IntendedJob":
         repo_types.extend(["jinja_repository", "intended_repository"])
-    if constant.ENABLE_COMPLIANCE and job_name == "nautobot_golden_config.jobs.ComplianceJob":
+    if (
+        constant.ENABLE_COMPLIANCE
+        and job_name == "nautobot_golden_config.jobs.ComplianceJob"
+        and config_source != ComplianceSourceChoice.TYPE_DATABASE
+    ):
         repo_types.extend(["intended_repository", "backup_repository"])
     if "All" in job_name:
         repo_types.extend(["backup_repository", "jinja_repository", "intended_repository"])
@@ -65,11 +87,11 @@ def get_refreshed_repos(job_obj, repo_types, data=None):
     """Small wrapper to pull latest branch, and return a GitRepo app specific object."""
     dynamic_groups = DynamicGroup.objects.exclude(golden_config_setting__isnull=True)
     repository_records = set()
-    for group in dynamic_groups:
+    for dynamic_group in dynamic_groups:
         # Make sure the data(device qs) device exist in the dg first.
-        if data.filter(group.generate_query()).exists():
+        if data.filter(dynamic_group.generate_query()).exists():
             for repo_type in repo_types:
-                repo = getattr(group.golden_config_setting, repo_type, None)
+                repo = getattr(dynamic_group.golden_config_setting, repo_type, None)
                 if repo:
                     repository_records.add(repo)
 
@@ -117,7 +139,9 @@ def gc_repo_prep(job, data):
     job.logger.debug(f"In scope device count for this job: {job.qs.count()}", extra={"grouping": "Get Job Filter"})
     job.logger.debug("Mapping device(s) to GC Settings.", extra={"grouping": "Device to Settings Map"})
     job.device_to_settings_map = get_device_to_settings_map(queryset=job.qs)
-    gitrepo_types = list(set(get_repo_types_for_job(job.class_path)))
+    job.time_budget = TimeBudget.from_job_data(data)
+    job.config_source = data.get("config_source") or constant.COMPLIANCE_SOURCE
+    gitrepo_types = list(set(get_repo_types_for_job(job.class_path, job.config_source)))
     job.logger.debug(
         f"Repository types to sync: {', '.join(sorted(gitrepo_types))}",
         extra={"grouping": "GC Repo Syncs"},
@@ -147,6 +171,106 @@ def gc_repo_push(job, current_repos):
                 )
                 repo["repo_obj"].commit_with_added(f"{job.Meta.name.upper()} JOB {now}")
                 repo["repo_obj"].push()
+                # Indexed at the new commit, so the next jobs use the index without building it.
+                refresh_repository_index(repo["repo_obj"].nautobot_repo_obj)
+
+
+def wait_for_shards(job, group_result):
+    """Poll the results of the shards until they all finished, or until the job deadline is exceeded.
+
+    The results are polled rather than waited for with `GroupResult.get`, so the wait is bounded by the deadline of
+    the job, plus the device time budget, or `SHARD_DEADLINE_GRACE` seconds, for the devices still running then. The
+    shards not finished by then are revoked and failed.
+
+    Args:
+        job (Job): Nautobot Job with logger and other attributes.
+        group_result (GroupResult): The results of the dispatched shards.
+
+    Returns:
+        list: The result of each shard, or the exception it failed with.
+    """
+    timeout = None
+    if job.time_budget.deadline is not None:
+        timeout = job.time_budget.deadline + (job.time_budget.device_budget or SHARD_DEADLINE_GRACE)
+    while not group_result.ready():
+        if timeout is not None and time.time() >= timeout:
+            group_result.revoke()
+            break
+        time.sleep(SHARD_POLL_INTERVAL)
+    return [
+        result.result if result.ready() else TimeoutError("The shard did not finish before the job deadline.")
+        for result in group_result.results
+    ]
+
+
+def gc_run_play(job, play, data):
+    """Run a Nornir play, either in the job process or split in shards dispatched to the Celery workers.
+
+    When sharded, the logs of every shard are written to the JobResult of the job, and the configurations they
+    persisted are written to the repositories of the job, so they are committed and pushed once by `gc_repo_push`.
+
+    Args:
+        job (Job): Nautobot Job with logger and other attributes.
+        play (function): The Nornir play to run, e.g. `config_backup`.
+        data (dict): Data being passed from Job.
+
+    Raises:
+        BackupFailure, IntendedGenerationFailure, ComplianceFailure: If any of the shards failed.
+    """
+    shards = get_device_shards(job.qs, job.device_to_settings_map, data.get("shard_type"), data.get("shard_size"))
+    if len(shards) < 2:  # noqa: PLR2004
+        play(job)
+        return
+
+    # The job waits for its shards, they must be consumed by other workers than the one running the job.
+    shard_queues = get_task_queues("shard")
+    job_queue = (job.job_result.celery_kwargs or {}).get("queue") or settings.CELERY_TASK_DEFAULT_QUEUE
+    if not shard_queues or shard_queues[0] == job_queue:
+        job.logger.warning(
+            "`E3037:` The shards must be routed to a different queue than the job, with the `shard` key of "
+            f"`queue_routing`, running the {len(shards)} shards in the job process.",
+            extra={"grouping": "GC Shards"},
+        )
+        play(job)
+        return
+
+    started = make_aware(datetime.now())
+    job.logger.info(f"Dispatching {len(shards)} shards to the workers.", extra={"grouping": "GC Shards"})
+    group_result = group(
+        run_play_shard.s(
+            play.__name__,
+            str(job.job_result.pk),
+            shard,
+            job.logger.getEffectiveLevel(),
+            deadline=job.time_budget.deadline,
+            device_budget=job.time_budget.device_budget,
+            skip_unchanged=job.skip_unchanged,
+            config_source=job.config_source,
+        )
+        for shard in shards
+    ).apply_async(queue=shard_queues[0])
+    shard_results = wait_for_shards(job, group_result)
+
+    failed = False
+    for index, (shard, shard_result) in enumerate(zip(shards, shard_results), start=1):
+        if isinstance(shard_result, Exception):
+            result = {"devices": len(shard), "failed": True, "error": str(shard_result)}
+        else:
+            result = shard_result
+        if result["failed"]:
+            failed = True
+            job.logger.error(
+                f"`E3032:` Shard {index} of {len(shards)} ({result['devices']} devices) failed. {result['error']}",
+                extra={"grouping": "GC Shards"},
+            )
+        else:
+            job.logger.debug(
+                f"Shard {index} of {len(shards)} ({result['devices']} devices) completed.",
+                extra={"grouping": "GC Shards"},
+            )
+    write_shard_configs(job, play.__name__, started)
+    if failed:
+        raise PLAY_FAILURES[play]()
 
 
 def gc_repos(func):
@@ -195,6 +319,43 @@ class FormEntry:  # pylint disable=too-few-public-method
     debug = BooleanVar(description="Enable for more verbose debug logging")
 
 
+class ShardFormEntry:  # pylint disable=too-few-public-method
+    """Class definition to use as Mixin for sharded execution form definitions."""
+
+    shard_type = ChoiceVar(
+        choices=ShardTypeChoice.CHOICES,
+        default=ShardTypeChoice.TYPE_NONE,
+        required=False,
+        label="Shard By",
+        description="Split the devices in shards, each one run by a separate worker.",
+    )
+    shard_size = IntegerVar(
+        required=False,
+        min_value=1,
+        description="Maximum amount of devices per shard, larger locations or settings are split.",
+    )
+
+
+class TimeBudgetFormEntry:  # pylint disable=too-few-public-method
+    """Class definition to use as Mixin for time budget form definitions."""
+
+    deadline = IntegerVar(
+        required=False,
+        min_value=1,
+        label="Deadline (minutes)",
+        description="Skip the devices not started yet after this many minutes, completed results are still committed.",
+    )
+    device_time_budget = IntegerVar(
+        required=False,
+        min_value=1,
+        label="Device Time Budget (seconds)",
+        description=(
+            "Mark a device as timed out when a job stage takes longer than this on it. The budget is checked before "
+            "each rendering, compliance and diff of a device, one that already started is not interrupted."
+        ),
+    )
+
+
 class GoldenConfigJobMixin(Job):  # pylint: disable=abstract-method
     """Reused mixin to be able to set defaults for instance attributes in all GC jobs."""
 
@@ -205,17 +366,49 @@ class GoldenConfigJobMixin(Job):  # pylint: disable=abstract-method
         super().__init__(*args, **kwargs)
         self.qs = None
         self.device_to_settings_map = {}
-
-
-class ComplianceJob(GoldenConfigJobMixin, FormEntry):
+        self.time_budget = TimeBudget()
+        self.skip_unchanged = True
+        self.config_source = constant.COMPLIANCE_SOURCE
+
+    @classmethod
+    def as_form(cls, data=None, files=None, initial=None, **kwargs):
+        """Return the job form, with the `fast_lane` queue selected when the job is opened for a single device."""
+        form = super().as_form(data=data, files=files, initial=initial, **kwargs)
+        device = (initial or {}).get("device")
+        fast_lane = get_task_queues("fast_lane")
+        if not fast_lane or not device or (isinstance(device, (list, tuple)) and len(device) != 1):
+            return form
+        # The queue field is `_task_queue` before Nautobot 2.4, and `_job_queue` since.
+        if "_task_queue" in form.fields and fast_lane[0] in dict(form.fields["_task_queue"].choices):
+            form.fields["_task_queue"].initial = fast_lane[0]
+        elif "_job_queue" in form.fields:
+            job_queue = form.fields["_job_queue"].queryset.filter(name=fast_lane[0]).first()
+            if job_queue:
+                form.fields["_job_queue"].initial = job_queue.pk
+        return form
+
+
+class ComplianceJob(GoldenConfigJobMixin, FormEntry, ShardFormEntry, TimeBudgetFormEntry):
     """Job to to run the compliance engine."""
 
+    force_compliance = BooleanVar(
+        description="Run the compliance of the devices even when their config files and rules are unchanged."
+    )
+    config_source = ChoiceVar(
+        choices=ComplianceSourceChoice.CHOICES,
+        default=constant.COMPLIANCE_SOURCE,
+        required=False,
+        label="Config Source",
+        description="Read the backup and intended configurations from the git repositories, or from the database.",
+    )
+
     class Meta:
         """Meta object boilerplate for compliance."""
 
         name = "Perform Configuration Compliance"
         description = "Run configuration compliance on your network infrastructure."
         has_sensitive_variables = False
+        task_queues = get_task_queues("compliance", "fast_lane")
 
     @gc_repos
     def run(self, *args, **data):  # pylint: disable=unused-argument
@@ -224,18 +417,22 @@ class ComplianceJob(GoldenConfigJobMixin, FormEntry):
         if not constant.ENABLE_COMPLIANCE:
             self.logger.critical("Compliance is disabled in application settings.")
             raise ValueError("Compliance is disabled in application settings.")
-        config_compliance(self)
+        self.skip_unchanged = not data.get("force_compliance")
+        gc_run_play(self, config_compliance, data)
 
 
-class IntendedJob(GoldenConfigJobMixin, FormEntry):
+class IntendedJob(GoldenConfigJobMixin, FormEntry, ShardFormEntry, TimeBudgetFormEntry):
     """Job to to run generation of intended configurations."""
 
+    force_render = BooleanVar(description="Render the devices even when their SoT data and templates are unchanged.")
+
     class Meta:
         """Meta object boilerplate for intended."""
 
         name = "Generate Intended Configurations"
         description = "Generate the configuration for your intended state."
         has_sensitive_variables = False
+        task_queues = get_task_queues("intended", "fast_lane")
 
     @gc_repos
     def run(self, *args, **data):  # pylint: disable=unused-argument
@@ -244,10 +441,11 @@ class IntendedJob(GoldenConfigJobMixin, FormEntry):
         if not constant.ENABLE_INTENDED:
             self.logger.critical("Intended Generation is disabled in application settings.")
             raise ValueError("Intended Generation is disabled in application settings.")
-        config_intended(self)
+        self.skip_unchanged = not data.get("force_render")
+        gc_run_play(self, config_intended, data)
 
 
-class BackupJob(GoldenConfigJobMixin, FormEntry):
+class BackupJob(GoldenConfigJobMixin, FormEntry, ShardFormEntry, TimeBudgetFormEntry):
     """Job to to run the backup job."""
 
     class Meta:
@@ -256,6 +454,7 @@ class BackupJob(GoldenConfigJobMixin, FormEntry):
         name = "Backup Configurations"
         description = "Backup the configurations of your network devices."
         has_sensitive_variables = False
+        task_queues = get_task_queues("backup", "fast_lane")
 
     @gc_repos
     def run(self, *args, **data):  # pylint: disable=unused-argument
@@ -264,7 +463,7 @@ class BackupJob(GoldenConfigJobMixin, FormEntry):
         if not constant.ENABLE_BACKUP:
             self.logger.critical("Backups are disabled in application settings.")
             raise ValueError("Backups are disabled in application settings.")
-        config_backup(self)
+        gc_run_play(self, config_backup, data)
 
 
 class AllGoldenConfig(GoldenConfigJobMixin):
@@ -272,6 +471,10 @@ class AllGoldenConfig(GoldenConfigJobMixin):
 
     device = ObjectVar(model=Device, required=True)
     debug = BooleanVar(description="Enable for more verbose debug logging")
+    force_render = BooleanVar(description="Render the device even when its SoT data and templates are unchanged.")
+    force_compliance = BooleanVar(
+        description="Run the compliance of the device even when its config files and rules are unchanged."
+    )
 
     class Meta:
         """Meta object boilerplate for all jobs to run against a device."""
@@ -279,19 +482,21 @@ class AllGoldenConfig(GoldenConfigJobMixin):
         name = "Execute All Golden Configuration Jobs - Single Device"
         description = "Process to run all Golden Configuration jobs configured."
         has_sensitive_variables = False
+        task_queues = get_task_queues("fast_lane")
 
     def run(self, *args, **data):  # pylint: disable=unused-argument, too-many-branches
         """Run all jobs on a single device."""
         current_repos = gc_repo_prep(job=self, data=data)
         failed_jobs = []
         error_msg, jobs_list = "", "All"
-        for enabled, play in [
-            (constant.ENABLE_INTENDED, config_intended),
-            (constant.ENABLE_BACKUP, config_backup),
-            (constant.ENABLE_COMPLIANCE, config_compliance),
+        for enabled, play, skip_unchanged in [
+            (constant.ENABLE_INTENDED, config_intended, not data.get("force_render")),
+            (constant.ENABLE_BACKUP, config_backup, True),
+            (constant.ENABLE_COMPLIANCE, config_compliance, not data.get("force_compliance")),
         ]:
             try:
                 if enabled:
+                    self.skip_unchanged = skip_unchanged
                     play(self)
             except BackupFailure:
                 self.logger.error("Backup failure occurred!")
@@ -319,9 +524,14 @@ class AllGoldenConfig(GoldenConfigJobMixin):
             raise NornirNautobotException(error_msg)
 
 
-class AllDevicesGoldenConfig(GoldenConfigJobMixin, FormEntry):
+class AllDevicesGoldenConfig(GoldenConfigJobMixin, FormEntry, TimeBudgetFormEntry):
     """Job to to run all three jobs against multiple devices."""
 
+    force_render = BooleanVar(description="Render the devices even when their SoT data and templates are unchanged.")
+    force_compliance = BooleanVar(
+        description="Run the compliance of the devices even when their config files and rules are unchanged."
+    )
+
     class Meta:
         """Meta object boilerplate for all jobs to run against multiple devices."""
 
@@ -334,13 +544,14 @@ class AllDevicesGoldenConfig(GoldenConfigJobMixin, FormEntry):
         current_repos = gc_repo_prep(job=self, data=data)
         failed_jobs = []
         error_msg, jobs_list = "", "All"
-        for enabled, play in [
-            (constant.ENABLE_INTENDED, config_intended),
-            (constant.ENABLE_BACKUP, config_backup),
-            (constant.ENABLE_COMPLIANCE, config_compliance),
+        for enabled, play, skip_unchanged in [
+            (constant.ENABLE_INTENDED, config_intended, not data.get("force_render")),
+            (constant.ENABLE_BACKUP, config_backup, True),
+            (constant.ENABLE_COMPLIANCE, config_compliance, not data.get("force_compliance")),
         ]:
             try:
                 if enabled:
+                    self.skip_unchanged = skip_unchanged
                     play(self)
             except BackupFailure:
                 self.logger.error("Backup failure occurred!")
@@ -531,6 +742,7 @@ class DeployConfigPlanJobButtonReceiver(JobButtonReceiver):
 
         name = "Deploy Config Plan (Job Button Receiver)"
         has_sensitive_variables = False
+        task_queues = get_task_queues("fast_lane")
 
     def __init__(self, *args, **kwargs):
         """Initialize the job."""
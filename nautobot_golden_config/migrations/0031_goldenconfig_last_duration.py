@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("nautobot_golden_config", "0030_alter_goldenconfig_device"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="goldenconfig",
+            name="backup_last_duration",
+            field=models.FloatField(
+                blank=True, help_text="Duration in seconds of the last successful backup.", null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="goldenconfig",
+            name="compliance_last_duration",
+            field=models.FloatField(
+                blank=True, help_text="Duration in seconds of the last successful compliance.", null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="goldenconfig",
+            name="intended_last_duration",
+            field=models.FloatField(
+                blank=True,
+                help_text="Duration in seconds of the last successful intended configuration generation.",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.25 on 2026-10-19 14:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("nautobot_golden_config", "0031_goldenconfig_last_duration"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="goldenconfig",
+            name="backup_timed_out",
+            field=models.BooleanField(default=False, help_text="Whether the last backup exceeded its time budget."),
+        ),
+        migrations.AddField(
+            model_name="goldenconfig",
+            name="compliance_timed_out",
+            field=models.BooleanField(default=False, help_text="Whether the last compliance exceeded its time budget."),
+        ),
+        migrations.AddField(
+            model_name="goldenconfig",
+            name="intended_timed_out",
+            field=models.BooleanField(
+                default=False,
+                help_text="Whether the last intended configuration generation exceeded its time budget.",
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-19 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("nautobot_golden_config", "0032_goldenconfig_timed_out"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="goldenconfig",
+            name="intended_fingerprint",
+            field=models.CharField(
+                blank=True,
+                help_text="Fingerprint of the SoT data and templates the intended config was last rendered from.",
+                max_length=64,
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.25 on 2026-10-19 17:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("nautobot_golden_config", "0033_goldenconfig_intended_fingerprint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="goldenconfig",
+            name="intended_template_deps",
+            field=models.JSONField(
+                blank=True,
+                default=list,
+                help_text="Jinja templates loaded by the last rendering of the intended config.",
+            ),
+        ),
+        migrations.AddField(
+            model_name="goldenconfig",
+            name="intended_jinja_commit",
+            field=models.CharField(
+                blank=True,
+                help_text="Jinja repository commit the intended config was last rendered from.",
+                max_length=48,
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-19 18:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("nautobot_golden_config", "0034_goldenconfig_intended_template_deps"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="goldenconfig",
+            name="backup_path",
+            field=models.CharField(
+                blank=True, help_text="Path of the backup config, relative to its repository.", max_length=255
+            ),
+        ),
+        migrations.AddField(
+            model_name="goldenconfig",
+            name="intended_path",
+            field=models.CharField(
+                blank=True, help_text="Path of the intended config, relative to its repository.", max_length=255
+            ),
+        ),
+    ]
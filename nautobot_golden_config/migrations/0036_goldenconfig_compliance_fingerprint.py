@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-19 18:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("nautobot_golden_config", "0035_goldenconfig_config_paths"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="goldenconfig",
+            name="compliance_fingerprint",
+            field=models.CharField(
+                blank=True,
+                help_text="Fingerprint of the config files and rules the compliance was last run with.",
+                max_length=64,
+            ),
+        ),
+    ]
@@ -1,13 +1,15 @@
 """Django Models for tracking the configuration compliance per feature and device."""
 
-import json
+import hashlib
 import logging
+import math
 
 from deepdiff import DeepDiff
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.module_loading import import_string
 from hier_config import Host as HierConfigHost
+from lxml import etree
 from nautobot.core.models.generics import PrimaryModel
 from nautobot.core.models.utils import serialize_object, serialize_object_v2
 from nautobot.dcim.models import Device
@@ -18,6 +20,7 @@ from netutils.config.compliance import feature_compliance
 from xmldiff import actions, main
 
 from nautobot_golden_config.choices import ComplianceRuleConfigTypeChoice, ConfigPlanTypeChoice, RemediationTypeChoice
+from nautobot_golden_config.utilities import json_codec
 from nautobot_golden_config.utilities.constant import ENABLE_SOTAGG, PLUGIN_CFG
 
 LOGGER = logging.getLogger(__name__)
@@ -34,20 +37,27 @@ MISSING_MSG = (
 VALIDATION_MSG = (
     ERROR_MSG + "Specifically the key {} was expected to be of type(s) {} and the value of {} was not that type(s)."
 )
+BATCH_MSG = (
+    "There was an issue with the data that was returned by your {} function. "
+    "This is a local issue that requires the attention of your systems administrator and not something "
+    "that can be fixed within the Golden Config app. "
+    "Specifically a list of {} results was expected, one per object and in the same order, and {} was returned."
+)
 
 CUSTOM_FUNCTIONS = {
     "get_custom_compliance": "custom",
     "get_custom_remediation": RemediationTypeChoice.TYPE_CUSTOM,
 }
+# Functions given all the objects of a batch at once, as `objs`, and returning their results in the same order.
+CUSTOM_BATCH_FUNCTIONS = {
+    "get_custom_compliance_batch": "custom",
+    "get_custom_remediation_batch": RemediationTypeChoice.TYPE_CUSTOM,
+}
 
 
 def _is_jsonable(val):
     """Check is value can be converted to json."""
-    try:
-        json.dumps(val)
-        return True
-    except (TypeError, OverflowError):
-        return False
+    return json_codec.is_jsonable(val)
 
 
 def _null_to_empty(val):
@@ -85,8 +95,69 @@ def _get_cli_compliance(obj):
     }
 
 
+class _UnhashableJson(Exception):
+    """Raised for values whose equality DeepDiff does not decide as their canonical hash would, e.g. NaN."""
+
+
+def _json_hash(value, ignore_order, hashes):
+    """Return the canonical hash of a JSON value, and record the hash of every value below it in `hashes` by id.
+
+    Equal values of the same types have the same hash. Dictionaries are hashed regardless of the order of their keys,
+    and lists regardless of the order of their items when `ignore_order` is set, as DeepDiff compares them.
+    """
+    if isinstance(value, dict):
+        digest = hashlib.blake2b(b"dict", digest_size=16)
+        for key, key_digest in sorted(
+            (_json_hash(key, ignore_order, hashes), _json_hash(child, ignore_order, hashes))
+            for key, child in value.items()
+        ):
+            digest.update(key)
+            digest.update(key_digest)
+    elif isinstance(value, (list, tuple)):
+        digest = hashlib.blake2b(type(value).__name__.encode(), digest_size=16)
+        child_digests = [_json_hash(child, ignore_order, hashes) for child in value]
+        for child_digest in sorted(child_digests) if ignore_order else child_digests:
+            digest.update(child_digest)
+    else:
+        if isinstance(value, float) and math.isnan(value):
+            raise _UnhashableJson()
+        digest = hashlib.blake2b(f"{type(value).__name__}:{value!r}".encode(), digest_size=16)
+    hashes[id(value)] = digest.digest()
+    return hashes[id(value)]
+
+
+def _prune_equal_json(actual, intended, hashes):
+    """Remove the keys whose values are equal on both sides from two dictionaries, recursively.
+
+    The pruned keys are not reported by DeepDiff, and the remaining keys keep their path and order, so DeepDiff
+    reports the same differences on the pruned dictionaries. Lists are kept whole, as their differences are reported
+    by index.
+    """
+    if not isinstance(actual, dict) or not isinstance(intended, dict):
+        return actual, intended
+    pruned = {}
+    for key, value in actual.items():
+        if key in intended and hashes[id(value)] != hashes[id(intended[key])]:
+            pruned[key] = _prune_equal_json(value, intended[key], hashes)
+    pruned_actual = {
+        key: pruned[key][0] if key in pruned else value
+        for key, value in actual.items()
+        if key in pruned or key not in intended
+    }
+    pruned_intended = {
+        key: pruned[key][1] if key in pruned else value
+        for key, value in intended.items()
+        if key in pruned or key not in actual
+    }
+    return pruned_actual, pruned_intended
+
+
 def _get_json_compliance(obj):
-    """This function performs the actual compliance for json serializable data."""
+    """This function performs the actual compliance for json serializable data.
+
+    The canonical hashes of both values are compared first, equal values are compliant without running DeepDiff, and
+    DeepDiff only gets the keys whose values differ.
+    """
 
     def _normalize_diff(diff, path_to_diff):
         """Normalizes the diff to a list of keys and list indexes that have changed."""
@@ -96,7 +167,15 @@ def _get_json_compliance(obj):
         type_changes = list(diff.get("type_changes", {}).keys())
         return dictionary_items + list_items + values_changed + type_changes
 
-    diff = DeepDiff(obj.actual, obj.intended, ignore_order=obj.ordered, report_repetition=True)
+    actual, intended = obj.actual, obj.intended
+    try:
+        hashes = {}
+        equal = _json_hash(actual, obj.ordered, hashes) == _json_hash(intended, obj.ordered, hashes)
+        if not equal:
+            actual, intended = _prune_equal_json(actual, intended, hashes)
+    except _UnhashableJson:
+        equal = False
+    diff = None if equal else DeepDiff(actual, intended, ignore_order=obj.ordered, report_repetition=True)
     if not diff:
         compliance_int = 1
         compliance = True
@@ -119,8 +198,44 @@ def _get_json_compliance(obj):
     }
 
 
+# Options for the XML diff operation. These are set to prefer updates over node insertions/deletions.
+XML_DIFF_OPTIONS = {
+    "F": 0.1,
+    "fast_match": True,
+}
+
+
+def _parse_xml(text):
+    """Parse an XML text as `xmldiff.main.diff_texts` does, ignoring the whitespace between tags."""
+    # The configurations compared are the backup and intended ones of the device, with the same parser `diff_texts`
+    # used on them before, and lxml does not access the network to resolve their DTD or entities.
+    return etree.fromstring(text, etree.XMLParser(remove_blank_text=True, no_network=True))  # noqa: S320
+
+
+def _get_xml_replaced_texts(tree, diff):
+    """Return the texts of the nodes the text updates of a diff replace, as `_normalize_diff` formats them.
+
+    Returns:
+        str: The nodes with their current text, or None when the diff is not only made of text updates.
+    """
+    if not all(isinstance(operation, actions.UpdateTextIn) for operation in diff):
+        return None
+    namespaces = {prefix: uri for prefix, uri in tree.nsmap.items() if prefix}
+    try:
+        return "\n".join(
+            f"{operation.node}, {tree.xpath(operation.node, namespaces=namespaces)[0].text}" for operation in diff
+        )
+    except (etree.XPathError, IndexError):
+        return None
+
+
 def _get_xml_compliance(obj):
-    """This function performs the actual compliance for xml serializable data."""
+    """This function performs the actual compliance for xml serializable data.
+
+    Both texts are parsed once, and a single edit script from the actual to the intended tree is computed. When the
+    script only updates the text of nodes, which keeps both trees the same shape, the extra values are the texts the
+    script replaces in the actual tree. Otherwise the script from the intended to the actual tree is computed too.
+    """
 
     def _normalize_diff(diff):
         """Format the diff output to a list of nodes with values that have updated."""
@@ -131,19 +246,18 @@ def _get_xml_compliance(obj):
                 formatted_diff.append(formatted_operation)
         return "\n".join(formatted_diff)
 
-    # Options for the diff operation. These are set to prefer updates over node insertions/deletions.
-    diff_options = {
-        "F": 0.1,
-        "fast_match": True,
-    }
-    missing = main.diff_texts(obj.actual, obj.intended, diff_options=diff_options)
-    extra = main.diff_texts(obj.intended, obj.actual, diff_options=diff_options)
+    actual_tree = _parse_xml(obj.actual)
+    intended_tree = _parse_xml(obj.intended)
+    missing = main.diff_trees(actual_tree, intended_tree, diff_options=XML_DIFF_OPTIONS)
 
-    compliance = not missing and not extra
+    compliance = not missing
     compliance_int = int(compliance)
     ordered = obj.ordered
+    extra = _get_xml_replaced_texts(actual_tree, missing)
+    if extra is None:
+        extra = _normalize_diff(main.diff_trees(intended_tree, actual_tree, diff_options=XML_DIFF_OPTIONS))
     missing = _null_to_empty(_normalize_diff(missing))
-    extra = _null_to_empty(_normalize_diff(extra))
+    extra = _null_to_empty(extra)
 
     return {
         "compliance": compliance,
@@ -171,6 +285,12 @@ def _verify_get_custom_compliance_data(compliance_details):
             raise ValidationError(VALIDATION_MSG.format(val, "String or Json", compliance_details[val]))
 
 
+def _verify_batch_results(results, objs, function_name):
+    """This function verifies a batch function returned one result per object."""
+    if not isinstance(results, (list, tuple)) or len(results) != len(objs):
+        raise ValidationError(BATCH_MSG.format(function_name, len(objs), results))
+
+
 def _get_hierconfig_remediation(obj):
     """Returns the remediating config."""
     hierconfig_os = obj.device.platform.network_driver_mappings["hier_config"]
@@ -210,11 +330,14 @@ FUNC_MAPPER = {
     ComplianceRuleConfigTypeChoice.TYPE_XML: _get_xml_compliance,
     RemediationTypeChoice.TYPE_HIERCONFIG: _get_hierconfig_remediation,
 }
+# The below maps the provided batch functions of the custom compliance and remediation
+BATCH_FUNC_MAPPER = {}
 # The below conditionally add the custom provided compliance type
-for custom_function, custom_type in CUSTOM_FUNCTIONS.items():
+for custom_function, custom_type in [*CUSTOM_FUNCTIONS.items(), *CUSTOM_BATCH_FUNCTIONS.items()]:
     if PLUGIN_CFG.get(custom_function):
+        mapper = BATCH_FUNC_MAPPER if custom_function in CUSTOM_BATCH_FUNCTIONS else FUNC_MAPPER
         try:
-            FUNC_MAPPER[custom_type] = import_string(PLUGIN_CFG[custom_function])
+            mapper[custom_type] = import_string(PLUGIN_CFG[custom_function])
         except Exception as error:  # pylint: disable=broad-except
             msg = (
                 "There was an issue attempting to import the custom function of"
@@ -377,38 +500,95 @@ class ConfigCompliance(PrimaryModel):  # pylint: disable=too-many-ancestors
     def compliance_on_save(self):
         """The actual configuration compliance happens here, but the details for actual compliance job would be found in FUNC_MAPPER."""
         if self.rule.custom_compliance:
-            if not FUNC_MAPPER.get("custom"):
+            if FUNC_MAPPER.get("custom"):
+                compliance_details = FUNC_MAPPER["custom"](obj=self)
+            elif BATCH_FUNC_MAPPER.get("custom"):
+                compliance_details = self._get_batch_result("custom", "get_custom_compliance_batch")
+            else:
                 raise ValidationError(
                     "Custom type provided, but no `get_custom_compliance` config set, please contact system admin."
                 )
-            compliance_details = FUNC_MAPPER["custom"](obj=self)
             _verify_get_custom_compliance_data(compliance_details)
         else:
             compliance_details = FUNC_MAPPER[self.rule.config_type](obj=self)
+        self._set_compliance_details(compliance_details)
 
+    def _set_compliance_details(self, compliance_details):
+        """Set the fields of the compliance from the details a compliance function returned."""
         self.compliance = compliance_details["compliance"]
         self.compliance_int = compliance_details["compliance_int"]
         self.ordered = compliance_details["ordered"]
         self.missing = compliance_details["missing"]
         self.extra = compliance_details["extra"]
 
+    def _get_remediation_type(self):
+        """Returns the remediation type of the rule, None when there is nothing to remediate."""
+        if self.compliance or not self.rule.config_remediation:
+            return None
+        remediation_setting = self.rule.remediation_setting
+        if not remediation_setting:
+            return None
+        return remediation_setting.remediation_type
+
     def remediation_on_save(self):
         """The actual remediation happens here, before saving the object."""
-        if self.compliance:
+        remediation_type = self._get_remediation_type()
+        if not remediation_type:
             self.remediation = ""
             return
 
-        if not self.rule.config_remediation:
-            self.remediation = ""
+        if remediation_type not in FUNC_MAPPER and remediation_type in BATCH_FUNC_MAPPER:
+            self.remediation = self._get_batch_result(remediation_type, "get_custom_remediation_batch")
             return
 
-        if not self.rule.remediation_setting:
-            self.remediation = ""
-            return
-
-        remediation_config = FUNC_MAPPER[self.rule.remediation_setting.remediation_type](obj=self)
+        remediation_config = FUNC_MAPPER[remediation_type](obj=self)
         self.remediation = remediation_config
 
+    def _get_batch_result(self, batch_type, function_name):
+        """Returns the result of a batch function called with this object only, when only the batch function is set."""
+        results = BATCH_FUNC_MAPPER[batch_type](objs=[self])
+        _verify_batch_results(results, [self], function_name)
+        return results[0]
+
+    @classmethod
+    def compute_batch(cls, compliances):
+        """The compliance and remediation of several objects happen here, before they are saved in bulk.
+
+        The objects of the custom compliance rules are given at once to the `get_custom_compliance_batch` function,
+        and the ones with a custom remediation to the `get_custom_remediation_batch` function, when these are set.
+        The other objects are computed one by one, as `save` does.
+
+        Args:
+            compliances (list): The ConfigCompliance objects, with their `actual` and `intended` configurations set.
+        """
+        custom = []
+        for compliance in compliances:
+            if compliance.rule.custom_compliance and BATCH_FUNC_MAPPER.get("custom"):
+                custom.append(compliance)
+            else:
+                compliance.compliance_on_save()
+        if custom:
+            results = BATCH_FUNC_MAPPER["custom"](objs=custom)
+            _verify_batch_results(results, custom, "get_custom_compliance_batch")
+            for compliance, compliance_details in zip(custom, results):
+                _verify_get_custom_compliance_data(compliance_details)
+                compliance._set_compliance_details(compliance_details)  # pylint: disable=protected-access
+
+        custom = []
+        for compliance in compliances:
+            remediation_type = compliance._get_remediation_type()  # pylint: disable=protected-access
+            if remediation_type == RemediationTypeChoice.TYPE_CUSTOM and BATCH_FUNC_MAPPER.get(remediation_type):
+                custom.append(compliance)
+            elif remediation_type:
+                compliance.remediation = FUNC_MAPPER[remediation_type](obj=compliance)
+            else:
+                compliance.remediation = ""
+        if custom:
+            results = BATCH_FUNC_MAPPER[RemediationTypeChoice.TYPE_CUSTOM](objs=custom)
+            _verify_batch_results(results, custom, "get_custom_remediation_batch")
+            for compliance, remediation_config in zip(custom, results):
+                compliance.remediation = remediation_config
+
     def save(self, *args, **kwargs):
         """The actual configuration compliance happens here, but the details for actual compliance job would be found in FUNC_MAPPER."""
         self.compliance_on_save()
@@ -439,14 +619,52 @@ class GoldenConfig(PrimaryModel):  # pylint: disable=too-many-ancestors
     backup_config = models.TextField(blank=True, help_text="Full backup config for device.")
     backup_last_attempt_date = models.DateTimeField(null=True, blank=True)
     backup_last_success_date = models.DateTimeField(null=True, blank=True)
+    backup_last_duration = models.FloatField(
+        null=True, blank=True, help_text="Duration in seconds of the last successful backup."
+    )
+    backup_timed_out = models.BooleanField(default=False, help_text="Whether the last backup exceeded its time budget.")
+    backup_path = models.CharField(
+        max_length=255, blank=True, help_text="Path of the backup config, relative to its repository."
+    )
 
     intended_config = models.TextField(blank=True, help_text="Intended config for the device.")
     intended_last_attempt_date = models.DateTimeField(null=True, blank=True)
     intended_last_success_date = models.DateTimeField(null=True, blank=True)
+    intended_last_duration = models.FloatField(
+        null=True, blank=True, help_text="Duration in seconds of the last successful intended configuration generation."
+    )
+    intended_fingerprint = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text="Fingerprint of the SoT data and templates the intended config was last rendered from.",
+    )
+    intended_template_deps = models.JSONField(
+        default=list, blank=True, help_text="Jinja templates loaded by the last rendering of the intended config."
+    )
+    intended_jinja_commit = models.CharField(
+        max_length=48, blank=True, help_text="Jinja repository commit the intended config was last rendered from."
+    )
+    intended_timed_out = models.BooleanField(
+        default=False, help_text="Whether the last intended configuration generation exceeded its time budget."
+    )
+    intended_path = models.CharField(
+        max_length=255, blank=True, help_text="Path of the intended config, relative to its repository."
+    )
 
     compliance_config = models.TextField(blank=True, help_text="Full config diff for device.")
+    compliance_fingerprint = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text="Fingerprint of the config files and rules the compliance was last run with.",
+    )
     compliance_last_attempt_date = models.DateTimeField(null=True, blank=True)
     compliance_last_success_date = models.DateTimeField(null=True, blank=True)
+    compliance_last_duration = models.FloatField(
+        null=True, blank=True, help_text="Duration in seconds of the last successful compliance."
+    )
+    compliance_timed_out = models.BooleanField(
+        default=False, help_text="Whether the last compliance exceeded its time budget."
+    )
 
     def to_objectchange(self, action, *, related_object=None, object_data_extra=None, object_data_exclude=None):  # pylint: disable=arguments-differ
         """Remove actual and intended configuration from changelog."""
@@ -3,6 +3,7 @@
 # pylint: disable=relative-beyond-top-level
 import logging
 import os
+import time
 from datetime import datetime
 
 from django.utils.timezone import make_aware
@@ -17,31 +18,59 @@ from nornir_nautobot.plugins.tasks.dispatcher import dispatcher
 from nautobot_golden_config.exceptions import BackupFailure
 from nautobot_golden_config.models import ConfigRemove, ConfigReplace, GoldenConfig
 from nautobot_golden_config.nornir_plays.processor import ProcessGoldenConfig
+from nautobot_golden_config.utilities.config_sanitizer import ConfigSanitizer
+from nautobot_golden_config.utilities.constant import COMPLIANCE_AFTER_BACKUP, ENABLE_COMPLIANCE, INVENTORY_CHUNK_SIZE
 from nautobot_golden_config.utilities.db_management import close_threaded_db_connections
 from nautobot_golden_config.utilities.helper import (
     dispatch_params,
+    get_inventory_chunks,
     render_jinja_template,
     verify_settings,
 )
 from nautobot_golden_config.utilities.logger import NornirLogger
+from nautobot_golden_config.utilities.repo_index import writing_repository_files
+from nautobot_golden_config.utilities.rule_compliance import ComplianceBatcher
+from nautobot_golden_config.utilities.scheduling import schedule_longest_first
+from nautobot_golden_config.utilities.time_budget import run_within_budget, write_within_budget
 
 InventoryPluginRegister.register("nautobot-inventory", NautobotORMInventory)
 
 
+def _get_running_config(task, logger, obj, backup_file=os.devnull):
+    """Get the running configuration of the device with the dispatcher, which saves it to the backup file."""
+    return task.run(
+        task=dispatcher,
+        obj=obj,
+        logger=logger,
+        name="SAVE BACKUP CONFIGURATION TO FILE",
+        backup_file=backup_file,
+        remove_lines=[],
+        substitute_lines=[],
+        **dispatch_params("get_config", obj.platform.network_driver, logger),
+    )[1].result["config"]
+
+
 @close_threaded_db_connections  # TODO: Is this still needed?
-def run_backup(  # pylint: disable=too-many-arguments
-    task: Task, logger: logging.Logger, device_to_settings_map, remove_regex_dict, replace_regex_dict
+def run_backup(  # noqa: PLR0913 pylint: disable=too-many-arguments
+    task: Task,
+    logger: logging.Logger,
+    device_to_settings_map,
+    config_sanitizers,
+    compliance_batcher=None,
+    device_budget=None,
 ) -> Result:
-    r"""Backup configurations to disk.
+    """Backup configurations to disk.
 
     Args:
         task (Task): Nornir task individual object
-        remove_regex_dict (dict): {'cisco_ios': ['^Building\\s+configuration.*\\n', '^Current\\s+configuration.*\\n', '^!\\s+Last\\s+configuration.*'], 'arista_eos': ['.s*']}
-        replace_regex_dict (dict): {'cisco_ios': [{'regex_replacement': '<redacted_config>', 'regex_search': 'username\\s+\\S+\\spassword\\s+5\\s+(\\S+)\\s+role\\s+\\S+'}]}
+        config_sanitizers (dict): The `ConfigSanitizer` of the config removals and replacements, by network driver.
+        compliance_batcher (ComplianceBatcher): Enqueues the compliance of the devices whose backup changed, if set.
+        device_budget (DeviceBudget): The time budget of the device, checked before the backup is written.
 
     Returns:
         result (Result): Result from Nornir task
     """
+    started = time.monotonic()
     obj = task.host.data["obj"]
     settings = device_to_settings_map[obj.id]
 
@@ -65,22 +94,27 @@ def run_backup(  # pylint: disable=too-many-arguments
             name="TEST CONNECTIVITY",
             **dispatch_params("check_connectivity", obj.platform.network_driver, logger),
         )
-    running_config = task.run(
-        task=dispatcher,
-        obj=obj,
-        logger=logger,
-        name="SAVE BACKUP CONFIGURATION TO FILE",
-        backup_file=backup_file,
-        remove_lines=remove_regex_dict.get(obj.platform.network_driver, []),
-        substitute_lines=replace_regex_dict.get(obj.platform.network_driver, []),
-        **dispatch_params("get_config", obj.platform.network_driver, logger),
-    )[1].result["config"]
+    # The configuration is sanitized here rather than by the dispatcher, which is given no backup file to save it to,
+    # so the unsanitized configuration is never written to disk.
+    running_config = _get_running_config(task, logger, obj)
+    sanitizer = config_sanitizers.get(obj.platform.network_driver)
+    if sanitizer:
+        running_config = sanitizer.sanitize(running_config)
+
+    # Written here rather than by the dispatcher, so a device exceeding its time budget does not write its result.
+    write_within_budget(device_budget, obj, logger, backup_file, running_config)
 
+    backup_changed = backup_obj.backup_config != running_config
     backup_obj.backup_last_success_date = task.host.defaults.data["now"]
+    backup_obj.backup_last_duration = time.monotonic() - started
+    backup_obj.backup_timed_out = False
+    backup_obj.backup_path = backup_path_template_obj
     backup_obj.backup_config = running_config
     backup_obj.save()
 
     logger.info("Successfully extracted running configuration from device.", extra={"object": obj})
+    if compliance_batcher is not None and backup_changed:
+        compliance_batcher.add(obj.pk)
 
     return Result(host=task.host, result=running_config)
 
@@ -106,50 +140,77 @@ def config_backup(job):
 
     # Build a dictionary, with keys of platform.network_driver, and the regex line in it for the netutils func.
     remove_regex_dict = {}
-    for regex in ConfigRemove.objects.all():
+    for regex in ConfigRemove.objects.select_related("platform"):
         if not remove_regex_dict.get(regex.platform.network_driver):
             remove_regex_dict[regex.platform.network_driver] = []
         remove_regex_dict[regex.platform.network_driver].append({"regex": regex.regex})
 
     # Build a dictionary, with keys of platform.network_driver, and the regex and replace keys for the netutils func.
     replace_regex_dict = {}
-    for regex in ConfigReplace.objects.all():
+    for regex in ConfigReplace.objects.select_related("platform"):
         if not replace_regex_dict.get(regex.platform.network_driver):
             replace_regex_dict[regex.platform.network_driver] = []
         replace_regex_dict[regex.platform.network_driver].append({"replace": regex.replace, "regex": regex.regex})
-    try:
-        with InitNornir(
-            runner=NORNIR_SETTINGS.get("runner"),
-            logging={"enabled": False},
-            inventory={
-                "plugin": "nautobot-inventory",
-                "options": {
-                    "credentials_class": NORNIR_SETTINGS.get("credentials"),
-                    "params": NORNIR_SETTINGS.get("inventory_params"),
-                    "queryset": job.qs,
-                    "defaults": {"now": now},
-                },
-            },
-        ) as nornir_obj:
-            nr_with_processors = nornir_obj.with_processors([ProcessGoldenConfig(logger)])
-
-            logger.debug("Run nornir backup tasks.")
-            results = nr_with_processors.run(
-                task=run_backup,
-                name="BACKUP CONFIG",
-                logger=logger,
-                device_to_settings_map=job.device_to_settings_map,
-                remove_regex_dict=remove_regex_dict,
-                replace_regex_dict=replace_regex_dict,
-            )
-            logger.debug("Completed configuration from devices.")
-    except NornirNautobotException as err:
-        logger.error(
-            f"`E3027:` NornirNautobotException raised during backup tasks. Original exception message: ```{err}```"
+    # The rules are compiled once per job, not for each device.
+    config_sanitizers = {
+        network_driver: ConfigSanitizer(remove_regex_dict.get(network_driver), replace_regex_dict.get(network_driver))
+        for network_driver in set(remove_regex_dict) | set(replace_regex_dict)
+    }
+    # The compliance of the devices whose backup changed is recomputed in batches, while the backup goes on.
+    compliance_batcher = ComplianceBatcher() if ENABLE_COMPLIANCE and COMPLIANCE_AFTER_BACKUP else None
+    failed = False
+    job.time_budget.skipped = 0
+    queryset = schedule_longest_first(logger, job.qs, "backup_last_duration", INVENTORY_CHUNK_SIZE)
+    # Each chunk gets its own inventory and results, so host data and results are released between chunks.
+    with writing_repository_files(job.device_to_settings_map, "backup_repository"):
+        for chunk_qs in get_inventory_chunks(queryset, INVENTORY_CHUNK_SIZE):
+            if job.time_budget.expired():
+                job.time_budget.skip(chunk_qs.count())
+                continue
+            try:
+                with InitNornir(
+                    runner=NORNIR_SETTINGS.get("runner"),
+                    logging={"enabled": False},
+                    inventory={
+                        "plugin": "nautobot-inventory",
+                        "options": {
+                            "credentials_class": NORNIR_SETTINGS.get("credentials"),
+                            "params": NORNIR_SETTINGS.get("inventory_params"),
+                            "queryset": chunk_qs,
+                            "defaults": {"now": now},
+                        },
+                    },
+                ) as nornir_obj:
+                    nr_with_processors = nornir_obj.with_processors([ProcessGoldenConfig(logger)])
+
+                    logger.debug("Run nornir backup tasks.")
+                    results = nr_with_processors.run(
+                        task=run_within_budget,
+                        stage_task=run_backup,
+                        stage="backup",
+                        time_budget=job.time_budget,
+                        name="BACKUP CONFIG",
+                        logger=logger,
+                        device_to_settings_map=job.device_to_settings_map,
+                        config_sanitizers=config_sanitizers,
+                        compliance_batcher=compliance_batcher,
+                    )
+                    failed = failed or results.failed
+                    logger.debug("Completed configuration from devices.")
+            except NornirNautobotException as err:
+                logger.error(
+                    f"`E3027:` NornirNautobotException raised during backup tasks. Original exception message: ```{err}```"
+                )
+                # re-raise Exception if it's raised from nornir-nautobot or nautobot-app-nornir
+                if str(err).startswith("`E2") or str(err).startswith("`E1"):
+                    raise NornirNautobotException(err) from err
+    if job.time_budget.skipped:
+        logger.warning(
+            f"`E3034:` The job deadline was reached, the backup of {job.time_budget.skipped} devices was skipped."
         )
-        # re-raise Exception if it's raised from nornir-nautobot or nautobot-app-nornir
-        if str(err).startswith("`E2") or str(err).startswith("`E1"):
-            raise NornirNautobotException(err) from err
+    if compliance_batcher is not None:
+        compliance_batcher.flush()
+        logger.info(f"Enqueued the compliance of {compliance_batcher.enqueued} devices whose backup changed.")
     logger.debug("Completed configuration backup job for devices.")
-    if results.failed:
+    if failed:
         raise BackupFailure()
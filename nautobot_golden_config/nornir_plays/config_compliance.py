@@ -1,9 +1,10 @@
 """Nornir job for generating the compliance data."""
 
 # pylint: disable=relative-beyond-top-level
-import difflib
+import hashlib
 import logging
 import os
+import time
 from collections import defaultdict
 from datetime import datetime
 
@@ -17,12 +18,26 @@ from nornir.core.plugins.inventory import InventoryPluginRegister
 from nornir.core.task import Result, Task
 from nornir_nautobot.exceptions import NornirNautobotException
 
-from nautobot_golden_config.choices import ComplianceRuleConfigTypeChoice
+from nautobot_golden_config.choices import (
+    ComplianceRuleConfigTypeChoice,
+    ComplianceSourceChoice,
+    RemediationTypeChoice,
+)
 from nautobot_golden_config.exceptions import ComplianceFailure
-from nautobot_golden_config.models import ComplianceRule, ConfigCompliance, GoldenConfig
+from nautobot_golden_config.models import (
+    BATCH_FUNC_MAPPER,
+    ComplianceRule,
+    ConfigCompliance,
+    GoldenConfig,
+    RemediationSetting,
+)
 from nautobot_golden_config.nornir_plays.processor import ProcessGoldenConfig
+from nautobot_golden_config.utilities.compliance_diff import diff_configs
+from nautobot_golden_config.utilities.constant import INVENTORY_CHUNK_SIZE, STORE_COMPLIANCE_DIFF
 from nautobot_golden_config.utilities.db_management import close_threaded_db_connections
+from nautobot_golden_config.utilities.diff_engine import get_diff_engine, get_diff_engine_path
 from nautobot_golden_config.utilities.helper import (
+    get_inventory_chunks,
     get_json_config,
     get_xml_config,
     get_xml_subtree_with_full_path,
@@ -30,6 +45,9 @@ from nautobot_golden_config.utilities.helper import (
     verify_settings,
 )
 from nautobot_golden_config.utilities.logger import NornirLogger
+from nautobot_golden_config.utilities.repo_index import get_repository_index
+from nautobot_golden_config.utilities.scheduling import schedule_longest_first
+from nautobot_golden_config.utilities.time_budget import check_within_budget, run_within_budget
 
 InventoryPluginRegister.register("nautobot-inventory", NautobotORMInventory)
 LOGGER = logging.getLogger(__name__)
@@ -51,16 +69,117 @@ def get_rules():
     return rules
 
 
-def get_config_element(rule, config, obj, logger):
+def get_rules_signatures(rules):
+    """Return a signature of the compliance rules and remediation setting of each platform, changed on any edit."""
+    remediation_dates = dict(RemediationSetting.objects.values_list("platform__network_driver", "last_updated"))
+    signatures = {}
+    for platform, platform_rules in rules.items():
+        parts = sorted(f"{rule['obj'].pk}:{rule['obj'].last_updated.isoformat()}" for rule in platform_rules)
+        parts.append(str(remediation_dates.get(platform)))
+        signatures[platform] = hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+    return signatures
+
+
+def _locate_config_file(indexes, repository_record, relative_path):
+    """Return the path and blob SHA of a config file, from the repository index, or None when the file is missing."""
+    if repository_record.pk not in indexes:
+        indexes[repository_record.pk] = get_repository_index(repository_record)
+    index = indexes[repository_record.pk]
+    file_path = os.path.join(repository_record.filesystem_path, relative_path)
+    if index is None:
+        # The repository could not be indexed, fall back to checking the file itself.
+        return (file_path, None) if os.path.exists(file_path) else None
+    entry = index["files"].get(os.path.normpath(relative_path).replace(os.sep, "/"))
+    return (file_path, entry[1]) if entry else None
+
+
+def get_config_files(job, logger):
+    """Locate the intended and backup files of all the devices of the job, from the indexes of the repositories.
+
+    Args:
+        job (Job): The Nautobot Job instance being run.
+        logger (NornirLogger): Logger to log messages to.
+
+    Returns:
+        tuple: The `{device pk: (intended file, intended blob SHA, backup file, backup blob SHA)}` of the devices with
+            both files, and the set of the pk of the devices with a missing file, whose errors were logged.
+    """
+    indexes = {}
+    config_files = {}
+    missing = set()
+    for obj in job.qs.select_related("platform"):
+        settings = job.device_to_settings_map.get(obj.id)
+        if not settings:
+            continue
+        try:
+            intended_path = render_jinja_template(obj, logger, settings.intended_path_template)
+            backup_path = render_jinja_template(obj, logger, settings.backup_path_template)
+        except NornirNautobotException:
+            # The error is raised again by the compliance task of the device.
+            continue
+        intended = _locate_config_file(indexes, settings.intended_repository, intended_path)
+        if not intended:
+            intended_file = os.path.join(settings.intended_repository.filesystem_path, intended_path)
+            error_msg = f"`E3005:` Unable to locate intended file for device at {intended_file}, preemptively failed."
+            logger.error(error_msg, extra={"object": obj})
+            missing.add(obj.id)
+            continue
+        backup = _locate_config_file(indexes, settings.backup_repository, backup_path)
+        if not backup:
+            backup_file = os.path.join(settings.backup_repository.filesystem_path, backup_path)
+            error_msg = f"`E3006:` Unable to locate backup file for device at {backup_file}, preemptively failed."
+            logger.error(error_msg, extra={"object": obj})
+            missing.add(obj.id)
+            continue
+        config_files[obj.id] = intended + backup
+    return config_files, missing
+
+
+def get_stored_configs(job, logger):
+    """Check the backup and intended configurations of all the devices of the job are stored in the database.
+
+    Args:
+        job (Job): The Nautobot Job instance being run.
+        logger (NornirLogger): Logger to log messages to.
+
+    Returns:
+        set: The pk of the devices without a stored configuration, whose errors were logged.
+    """
+    missing = set()
+    stored = GoldenConfig.objects.filter(device__in=job.qs).exclude(backup_config="").exclude(intended_config="")
+    stored_device_pks = set(stored.values_list("device_id", flat=True))
+    for obj in job.qs.exclude(pk__in=stored_device_pks):
+        if obj.id not in job.device_to_settings_map:
+            continue
+        error_msg = "`E3036:` The backup or intended configuration of the device is not stored, preemptively failed."
+        logger.error(error_msg, extra={"object": obj})
+        missing.add(obj.id)
+    return missing
+
+
+def _get_parsed_json_config(config, parsed_configs=None):
+    """Parse a JSON configuration, once for all the rules of a device when given the configurations it parsed."""
+    if parsed_configs is None:
+        return get_json_config(config)
+    if config not in parsed_configs:
+        parsed_configs[config] = get_json_config(config)
+    return parsed_configs[config]
+
+
+def get_config_element(rule, config, obj, logger, parsed_configs=None):
     """
     Helper function to yield elements of the configuration as defined in the `config_match` under ComplianceRule.
 
+    Args:
+        parsed_configs (dict): The JSON configurations already parsed, keyed by their text, to parse each configuration
+            of a device once for all its rules.
+
     Returns:
        - a configuration section for `CLI` based config types
        - top level JSON key for `JSON` based config types
     """
     if rule["obj"].config_type == ComplianceRuleConfigTypeChoice.TYPE_JSON:
-        config_json = get_json_config(config)
+        config_json = _get_parsed_json_config(config, parsed_configs)
 
         if not config_json:
             error_msg = "`E3002:` Unable to interpret configuration as JSON."
@@ -113,32 +232,39 @@ def diff_files(backup_file, intended_file):
     with open(intended_file, encoding="utf-8") as file:
         intended = file.readlines()
 
-    yield from difflib.unified_diff(backup, intended, lineterm="")
+    yield from get_diff_engine()(backup, intended, lineterm="")
 
 
-@close_threaded_db_connections
-def run_compliance(  # pylint: disable=too-many-arguments,too-many-locals
-    task: Task,
-    logger: logging.Logger,
-    device_to_settings_map,
-    rules,
-) -> Result:
-    """Prepare data for compliance task.
+def _get_stored_configs(obj, logger, compliance_obj):
+    """Return the backup and intended configurations stored on the Golden Config of a device, and their SHAs.
+
+    Raises:
+        NornirNautobotException: When one of the configurations is not stored.
+    """
+    if not compliance_obj.backup_config or not compliance_obj.intended_config:
+        error_msg = "`E3036:` The backup or intended configuration of the device is not stored, preemptively failed."
+        logger.error(error_msg, extra={"object": obj})
+        raise NornirNautobotException(error_msg)
+    return (
+        compliance_obj.backup_config,
+        compliance_obj.intended_config,
+        hashlib.sha256(compliance_obj.backup_config.encode("utf-8")).hexdigest(),
+        hashlib.sha256(compliance_obj.intended_config.encode("utf-8")).hexdigest(),
+    )
+
+
+def _get_config_files(obj, logger, settings, config_files):
+    """Return the backup and intended files of a device, and their blob SHAs when located with the repository index.
 
     Args:
-        task (Task): Nornir task individual object
+        config_files (dict): The intended and backup files and blob SHAs already located, keyed by device pk.
 
-    Returns:
-        result (Result): Result from Nornir task
+    Raises:
+        NornirNautobotException: When one of the files does not exist.
     """
-    obj = task.host.data["obj"]
-    settings = device_to_settings_map[obj.id]
-
-    compliance_obj = GoldenConfig.objects.filter(device=obj).first()
-    if not compliance_obj:
-        compliance_obj = GoldenConfig.objects.create(device=obj)
-    compliance_obj.compliance_last_attempt_date = task.host.defaults.data["now"]
-    compliance_obj.save()
+    if config_files and obj.id in config_files:
+        intended_file, intended_sha, backup_file, backup_sha = config_files[obj.id]
+        return backup_file, intended_file, backup_sha, intended_sha
 
     intended_directory = settings.intended_repository.filesystem_path
     intended_path_template_obj = render_jinja_template(obj, logger, settings.intended_path_template)
@@ -157,27 +283,74 @@ def run_compliance(  # pylint: disable=too-many-arguments,too-many-locals
         error_msg = f"`E3006:` Unable to locate backup file for device at {backup_file}, preemptively failed."
         logger.error(error_msg, extra={"object": obj})
         raise NornirNautobotException(error_msg)
+    return backup_file, intended_file, None, None
+
+
+def _get_compliance_batch(obj, device_rules, backup_cfg, intended_cfg, logger):
+    """Compute the compliance of all the rules of a device at once, to be saved with one bulk write per operation."""
+    existing = {compliance.rule_id: compliance for compliance in ConfigCompliance.objects.filter(device=obj)}
+    parsed_configs = {}
+    compliances = []
+    for rule in device_rules:
+        compliance = existing.get(rule["obj"].pk) or ConfigCompliance(device=obj, rule=rule["obj"])
+        compliance.actual = get_config_element(rule, backup_cfg, obj, logger, parsed_configs)
+        compliance.intended = get_config_element(rule, intended_cfg, obj, logger, parsed_configs)
+        compliances.append(compliance)
+    ConfigCompliance.compute_batch(compliances)
+    return compliances
+
+
+def _uses_batch_functions(obj, device_rules):
+    """Return whether a device has rules whose compliance or remediation is computed by a custom batch function."""
+    if BATCH_FUNC_MAPPER.get("custom") and any(rule["obj"].custom_compliance for rule in device_rules):
+        return True
+    return bool(
+        BATCH_FUNC_MAPPER.get(RemediationTypeChoice.TYPE_CUSTOM)
+        and any(rule["obj"].config_remediation for rule in device_rules)
+        and RemediationSetting.objects.filter(
+            platform=obj.platform, remediation_type=RemediationTypeChoice.TYPE_CUSTOM
+        ).exists()
+    )
+
+
+def _get_compliances(obj, device_rules, backup_cfg, intended_cfg, logger):
+    """Return the compliance of each rule of a device, computed but not written yet, see `_save_compliances`.
 
-    platform = obj.platform.network_driver
-    if not rules.get(platform):
-        error_msg = (
-            f"`E3007:` There is no defined `Configuration Rule` for platform network_driver `{platform}`, "
-            "preemptively failed."
+    Returns:
+        tuple: The compliances, and whether they were computed by the custom batch functions.
+    """
+    if _uses_batch_functions(obj, device_rules):
+        # The custom batch functions get all the rules of the device at once, see `ConfigCompliance.compute_batch`.
+        return _get_compliance_batch(obj, device_rules, backup_cfg, intended_cfg, logger), True
+    parsed_configs = {}
+    compliances = [
+        (
+            rule["obj"],
+            get_config_element(rule, backup_cfg, obj, logger, parsed_configs),
+            get_config_element(rule, intended_cfg, obj, logger, parsed_configs),
         )
-        logger.error(error_msg, extra={"object": obj})
-        raise NornirNautobotException(error_msg)
+        for rule in device_rules
+    ]
+    return compliances, False
 
-    backup_cfg = _open_file_config(backup_file)
-    intended_cfg = _open_file_config(intended_file)
 
-    for rule in rules[obj.platform.network_driver]:
-        _actual = get_config_element(rule, backup_cfg, obj, logger)
-        _intended = get_config_element(rule, intended_cfg, obj, logger)
+def _save_compliances(obj, compliances, now, batched):
+    """Write the compliance of each rule of a device, as returned by `_get_compliances`.
+
+    The compliances computed by the batch functions are written in bulk, without the `full_clean` and change log of
+    `ConfigCompliance.save`, the other ones are saved one by one.
+    """
+    if batched:
+        # pylint: disable=import-outside-toplevel,cyclic-import
+        from nautobot_golden_config.utilities.rule_compliance import save_compliances
 
+        save_compliances(compliances, now)
+        return
+    for rule_obj, _actual, _intended in compliances:
         # using update_or_create() method to conveniently update actual obj or create new one.
         ConfigCompliance.objects.update_or_create(
             device=obj,
-            rule=rule["obj"],
+            rule=rule_obj,
             defaults={
                 "actual": _actual,
                 "intended": _intended,
@@ -186,8 +359,102 @@ def run_compliance(  # pylint: disable=too-many-arguments,too-many-locals
             },
         )
 
+
+@close_threaded_db_connections
+def run_compliance(  # noqa: PLR0913 pylint: disable=too-many-arguments,too-many-locals
+    task: Task,
+    logger: logging.Logger,
+    device_to_settings_map,
+    rules,
+    config_files=None,
+    rules_signatures=None,
+    job_class_instance=None,
+    config_source=ComplianceSourceChoice.TYPE_REPOSITORY,
+    device_budget=None,
+) -> Result:
+    """Prepare data for compliance task.
+
+    Args:
+        task (Task): Nornir task individual object
+        config_files (dict): The intended and backup files and blob SHAs already located, keyed by device pk.
+        rules_signatures (dict): The signature of the rules of each platform, see `get_rules_signatures`.
+        job_class_instance (Job): The Nautobot Job instance being run.
+        config_source (str): One of `ComplianceSourceChoice`, where the configurations are read from.
+        device_budget (DeviceBudget): The time budget of the device, checked before the compliance, the diff and the
+            write.
+
+    Returns:
+        result (Result): Result from Nornir task
+    """
+    started = time.monotonic()
+    obj = task.host.data["obj"]
+    settings = device_to_settings_map[obj.id]
+
+    compliance_obj = GoldenConfig.objects.filter(device=obj).first()
+    if not compliance_obj:
+        compliance_obj = GoldenConfig.objects.create(device=obj)
+    compliance_obj.compliance_last_attempt_date = task.host.defaults.data["now"]
+    compliance_obj.save()
+
+    from_database = config_source == ComplianceSourceChoice.TYPE_DATABASE
+    if from_database:
+        backup_source, intended_source, backup_sha, intended_sha = _get_stored_configs(obj, logger, compliance_obj)
+    else:
+        backup_source, intended_source, backup_sha, intended_sha = _get_config_files(
+            obj, logger, settings, config_files
+        )
+
+    platform = obj.platform.network_driver
+    if not rules.get(platform):
+        error_msg = (
+            f"`E3007:` There is no defined `Configuration Rule` for platform network_driver `{platform}`, "
+            "preemptively failed."
+        )
+        logger.error(error_msg, extra={"object": obj})
+        raise NornirNautobotException(error_msg)
+
+    # The committed files, the rules and the diff engine are unchanged since the last compliance, so are its results.
+    fingerprint = ""
+    if intended_sha and backup_sha and rules_signatures:
+        fingerprint = hashlib.sha256(
+            "\n".join([intended_sha, backup_sha, rules_signatures[platform], get_diff_engine_path()]).encode("utf-8")
+        ).hexdigest()
+    if (
+        fingerprint
+        and getattr(job_class_instance, "skip_unchanged", False)
+        and compliance_obj.compliance_fingerprint == fingerprint
+    ):
+        compliance_obj.compliance_last_success_date = task.host.defaults.data["now"]
+        compliance_obj.compliance_timed_out = False
+        compliance_obj.save(update_fields=["compliance_last_success_date", "compliance_timed_out", "last_updated"])
+        logger.debug("The config files and the rules are unchanged, skipped compliance.", extra={"object": obj})
+        return Result(host=task.host, unchanged=True)
+
+    if from_database:
+        backup_cfg, intended_cfg = backup_source, intended_source
+    else:
+        backup_cfg = _open_file_config(backup_source)
+        intended_cfg = _open_file_config(intended_source)
+    # The compliance and the diff can not be interrupted, so the budget is also checked before each of them starts.
+    check_within_budget(device_budget, obj, logger)
+    compliances, batched = _get_compliances(obj, rules[platform], backup_cfg, intended_cfg, logger)
+    check_within_budget(device_budget, obj, logger)
+
     compliance_obj.compliance_last_success_date = task.host.defaults.data["now"]
-    compliance_obj.compliance_config = "\n".join(diff_files(backup_file, intended_file))
+    compliance_obj.compliance_last_duration = time.monotonic() - started
+    compliance_obj.compliance_timed_out = False
+    compliance_obj.compliance_fingerprint = fingerprint
+    if not STORE_COMPLIANCE_DIFF:
+        # Computed on demand from the stored configurations, see `get_compliance_diff`.
+        compliance_obj.compliance_config = ""
+    elif from_database:
+        compliance_obj.compliance_config = "\n".join(diff_configs(backup_cfg, intended_cfg))
+    else:
+        compliance_obj.compliance_config = "\n".join(diff_files(backup_source, intended_source))
+
+    # The results of a device exceeding its time budget are not written.
+    check_within_budget(device_budget, obj, logger)
+    _save_compliances(obj, compliances, task.host.defaults.data["now"], batched)
     compliance_obj.save()
     logger.info("Successfully tested compliance job.", extra={"object": obj})
 
@@ -212,39 +479,76 @@ def config_compliance(job):  # pylint: disable=unused-argument
 
     rules = get_rules()
 
-    for settings in set(job.device_to_settings_map.values()):
-        verify_settings(logger, settings, ["backup_path_template", "intended_path_template"])
-    try:
-        with InitNornir(
-            runner=NORNIR_SETTINGS.get("runner"),
-            logging={"enabled": False},
-            inventory={
-                "plugin": "nautobot-inventory",
-                "options": {
-                    "credentials_class": NORNIR_SETTINGS.get("credentials"),
-                    "params": NORNIR_SETTINGS.get("inventory_params"),
-                    "queryset": job.qs,
-                    "defaults": {"now": now},
+    # The configurations of all the devices are located upfront, the devices missing one are failed without a task.
+    config_source = getattr(job, "config_source", ComplianceSourceChoice.TYPE_REPOSITORY)
+    if config_source == ComplianceSourceChoice.TYPE_DATABASE:
+        config_files, missing = {}, get_stored_configs(job, logger)
+    else:
+        for settings in set(job.device_to_settings_map.values()):
+            verify_settings(logger, settings, ["backup_path_template", "intended_path_template"])
+        config_files, missing = get_config_files(job, logger)
+    rules_signatures = get_rules_signatures(rules)
+    GoldenConfig.objects.filter(device__in=missing).update(compliance_last_attempt_date=now)
+    failed = bool(missing)
+    job.time_budget.skipped = 0
+    unchanged = 0
+    queryset = schedule_longest_first(
+        logger, job.qs.exclude(pk__in=missing), "compliance_last_duration", INVENTORY_CHUNK_SIZE
+    )
+    # Each chunk gets its own inventory and results, so host data and results are released between chunks.
+    for chunk_qs in get_inventory_chunks(queryset, INVENTORY_CHUNK_SIZE):
+        if job.time_budget.expired():
+            job.time_budget.skip(chunk_qs.count())
+            continue
+        try:
+            with InitNornir(
+                runner=NORNIR_SETTINGS.get("runner"),
+                logging={"enabled": False},
+                inventory={
+                    "plugin": "nautobot-inventory",
+                    "options": {
+                        "credentials_class": NORNIR_SETTINGS.get("credentials"),
+                        "params": NORNIR_SETTINGS.get("inventory_params"),
+                        "queryset": chunk_qs,
+                        "defaults": {"now": now},
+                    },
                 },
-            },
-        ) as nornir_obj:
-            nr_with_processors = nornir_obj.with_processors([ProcessGoldenConfig(logger)])
-
-            logger.debug("Run nornir compliance tasks.")
-            results = nr_with_processors.run(
-                task=run_compliance,
-                name="RENDER COMPLIANCE TASK GROUP",
-                logger=logger,
-                device_to_settings_map=job.device_to_settings_map,
-                rules=rules,
+            ) as nornir_obj:
+                nr_with_processors = nornir_obj.with_processors([ProcessGoldenConfig(logger)])
+
+                logger.debug("Run nornir compliance tasks.")
+                results = nr_with_processors.run(
+                    task=run_within_budget,
+                    stage_task=run_compliance,
+                    stage="compliance",
+                    time_budget=job.time_budget,
+                    name="RENDER COMPLIANCE TASK GROUP",
+                    logger=logger,
+                    device_to_settings_map=job.device_to_settings_map,
+                    rules=rules,
+                    config_files=config_files,
+                    rules_signatures=rules_signatures,
+                    job_class_instance=job,
+                    config_source=config_source,
+                )
+                failed = failed or results.failed
+                unchanged += sum(bool(getattr(result[0], "unchanged", False)) for result in results.values() if result)
+        except NornirNautobotException as err:
+            logger.error(
+                f"`E3028:` NornirNautobotException raised during compliance tasks. Original exception message: ```{err}```"
             )
-    except NornirNautobotException as err:
-        logger.error(
-            f"`E3028:` NornirNautobotException raised during compliance tasks. Original exception message: ```{err}```"
+            # re-raise Exception if it's raised from nornir-nautobot or nautobot-app-nornir
+            if str(err).startswith("`E2") or str(err).startswith("`E1"):
+                raise NornirNautobotException(err) from err
+    if unchanged:
+        logger.info(
+            f"Skipped the compliance of {unchanged} devices whose config files and rules are unchanged, "
+            "select `Force Compliance` to run them."
+        )
+    if job.time_budget.skipped:
+        logger.warning(
+            f"`E3034:` The job deadline was reached, the compliance of {job.time_budget.skipped} devices was skipped."
         )
-        # re-raise Exception if it's raised from nornir-nautobot or nautobot-app-nornir
-        if str(err).startswith("`E2") or str(err).startswith("`E1"):
-            raise NornirNautobotException(err) from err
     logger.debug("Completed compliance job for devices.")
-    if results.failed:
+    if failed:
         raise ComplianceFailure()
@@ -3,6 +3,9 @@
 # pylint: disable=relative-beyond-top-level
 import logging
 import os
+import threading
+import time
+from collections import defaultdict
 from datetime import datetime
 
 from django.utils.timezone import make_aware
@@ -17,23 +20,89 @@ from nornir_nautobot.plugins.tasks.dispatcher import dispatcher
 from nautobot_golden_config.exceptions import IntendedGenerationFailure
 from nautobot_golden_config.models import GoldenConfig
 from nautobot_golden_config.nornir_plays.processor import ProcessGoldenConfig
+from nautobot_golden_config.utilities.constant import INVENTORY_CHUNK_SIZE, SOT_AGG_BATCH_SIZE
 from nautobot_golden_config.utilities.db_management import close_threaded_db_connections
-from nautobot_golden_config.utilities.graphql import graph_ql_query
+from nautobot_golden_config.utilities.graphql import graph_ql_query, graph_ql_query_batch
 from nautobot_golden_config.utilities.helper import (
     dispatch_params,
     get_django_env,
+    get_intended_fingerprint,
+    get_inventory_chunks,
+    jinja_dependencies_unchanged,
     render_jinja_template,
     verify_settings,
 )
 from nautobot_golden_config.utilities.logger import NornirLogger
+from nautobot_golden_config.utilities.repo_index import writing_repository_files
+from nautobot_golden_config.utilities.scheduling import schedule_longest_first
+from nautobot_golden_config.utilities.time_budget import check_within_budget, run_within_budget, write_within_budget
 
 InventoryPluginRegister.register("nautobot-inventory", NautobotORMInventory)
 LOGGER = logging.getLogger(__name__)
 
 
+class SotAggPreloader:
+    """SoT aggregation data of the devices of a Nornir inventory, queried in batches as the devices are rendered.
+
+    The data of a device is queried when it is first popped, in a batch with the next devices of the inventory
+    sharing its query, and released once popped. At most `batch_size` devices are held at once, whatever the size of
+    the inventory.
+    """
+
+    def __init__(self, job, queryset, batch_size):
+        """Group the devices of the inventory by SoT aggregation query, without querying them yet.
+
+        Args:
+            job (Job): The Nautobot Job instance being run.
+            queryset (QuerySet): The Device queryset of the Nornir inventory.
+            batch_size (int): The maximum amount of devices per GraphQL execution, and of devices held at once.
+        """
+        self.job = job
+        self.batch_size = batch_size
+        self.loaded = {}
+        self.peak = 0
+        self._queries = {}
+        self._pending = defaultdict(dict)
+        self._lock = threading.Lock()
+        for device in queryset:
+            settings = job.device_to_settings_map.get(device.id)
+            if settings and settings.sot_agg_query:
+                self._queries[device.id] = settings.sot_agg_query
+                self._pending[settings.sot_agg_query.pk][device.id] = device
+
+    def pop(self, device_pk, default=None):
+        """Return the `(status, data)` tuple of the SoT aggregation query of a device, and release it."""
+        with self._lock:
+            if device_pk not in self.loaded and device_pk in self._queries:
+                self._load(device_pk)
+            return self.loaded.pop(device_pk, default)
+
+    def _load(self, device_pk):
+        """Query the batch of a device, with the next pending devices of its query, up to `batch_size` held."""
+        sot_agg_query = self._queries.pop(device_pk)
+        pending = self._pending[sot_agg_query.pk]
+        devices = [pending.pop(device_pk)]
+        size = max(self.batch_size - len(self.loaded), 1)
+        while pending and len(devices) < size:
+            devices.append(pending.pop(next(iter(pending))))
+        for device in devices[1:]:
+            del self._queries[device.id]
+        self.job.request.user = self.job.user
+        self.loaded.update(
+            graph_ql_query_batch(self.job.request, devices, sot_agg_query.query, query_id=sot_agg_query.pk)
+        )
+        self.peak = max(self.peak, len(self.loaded))
+
+
 @close_threaded_db_connections
-def run_template(  # pylint: disable=too-many-arguments,too-many-locals
-    task: Task, logger: NornirLogger, device_to_settings_map, job_class_instance, jinja_env
+def run_template(  # noqa: PLR0913 pylint: disable=too-many-arguments,too-many-locals
+    task: Task,
+    logger: NornirLogger,
+    device_to_settings_map,
+    job_class_instance,
+    jinja_env,
+    sot_agg_data=None,
+    device_budget=None,
 ) -> Result:
     """Render Jinja Template.
 
@@ -44,10 +113,13 @@ def run_template(  # pylint: disable=too-many-arguments,too-many-locals
         logger (NornirLogger): Logger to log messages to.
         global_settings (GoldenConfigSetting): The settings for GoldenConfigApp.
         job_class_instance (Result): The the output from the Nautobot Job instance being run.
+        sot_agg_data (SotAggPreloader): The SoT aggregation query results run in batches, popped by device pk.
+        device_budget (DeviceBudget): The time budget of the device, checked before rendering and writing.
 
     Returns:
         result (Result): Result from Nornir task
     """
+    started = time.monotonic()
     obj = task.host.data["obj"]
     settings = device_to_settings_map[obj.id]
 
@@ -63,27 +135,76 @@ def run_template(  # pylint: disable=too-many-arguments,too-many-locals
 
     jinja_template = render_jinja_template(obj, logger, settings.jinja_path_template)
     job_class_instance.request.user = job_class_instance.user
-    status, device_data = graph_ql_query(job_class_instance.request, obj, settings.sot_agg_query.query)
+    # Results of the batched queries are popped, so they are released before the device is rendered.
+    status, device_data = (sot_agg_data or {}).pop(obj.id, None) or graph_ql_query(
+        job_class_instance.request, obj, settings.sot_agg_query.query, query_id=settings.sot_agg_query.pk
+    )
     if status != 200:  # noqa: PLR2004
         error_msg = f"`E3012:` The GraphQL query return a status of {str(status)} with error of {str(device_data)}"
         logger.error(error_msg, extra={"object": obj})
         raise NornirNautobotException(error_msg)
 
+    jinja_commit = settings.jinja_repository.current_head
+    fingerprint = get_intended_fingerprint(
+        device_data, jinja_template, output_file_location, obj.platform.network_driver
+    )
+    # Templates are compared through the files the last rendering loaded, so unrelated template changes are skipped.
+    if (
+        job_class_instance.skip_unchanged
+        and intended_obj.intended_fingerprint == fingerprint
+        and os.path.exists(output_file_location)
+        and jinja_dependencies_unchanged(intended_obj, settings.jinja_repository.filesystem_path, jinja_commit)
+    ):
+        intended_obj.intended_last_success_date = task.host.defaults.data["now"]
+        intended_obj.intended_timed_out = False
+        intended_obj.intended_jinja_commit = jinja_commit
+        intended_obj.intended_path = intended_path_template_obj
+        intended_obj.save(
+            update_fields=[
+                "intended_last_success_date",
+                "intended_timed_out",
+                "intended_jinja_commit",
+                "intended_path",
+                "last_updated",
+            ]
+        )
+        logger.debug("The SoT data and templates are unchanged, skipped rendering.", extra={"object": obj})
+        return Result(host=task.host, result=intended_obj.intended_config, unchanged=True)
+
+    # The rendering can not be interrupted, so the budget is also checked before it starts.
+    check_within_budget(device_budget, obj, logger)
+    inventory_data = {key: task.host.data[key] for key in device_data if key in task.host.data}
     task.host.data.update(device_data)
+    try:
+        with jinja_env.record_loaded_templates() as loaded_templates:
+            generated_config = task.run(
+                task=dispatcher,
+                name="GENERATE CONFIG",
+                obj=obj,
+                logger=logger,
+                jinja_template=jinja_template,
+                jinja_root_path=settings.jinja_repository.filesystem_path,
+                output_file_location=os.devnull,
+                jinja_filters=jinja_env.filters,
+                jinja_env=jinja_env,
+                **dispatch_params("generate_config", obj.platform.network_driver, logger),
+            )[1].result["config"]
+    finally:
+        # The SoT aggregate data is only needed to render, do not keep it on the host until the end of the play.
+        for key in device_data:
+            task.host.data.pop(key, None)
+        task.host.data.update(inventory_data)
+
+    # Written here rather than by the dispatcher, so a device exceeding its time budget does not write its result.
+    write_within_budget(device_budget, obj, logger, output_file_location, generated_config)
 
-    generated_config = task.run(
-        task=dispatcher,
-        name="GENERATE CONFIG",
-        obj=obj,
-        logger=logger,
-        jinja_template=jinja_template,
-        jinja_root_path=settings.jinja_repository.filesystem_path,
-        output_file_location=output_file_location,
-        jinja_filters=jinja_env.filters,
-        jinja_env=jinja_env,
-        **dispatch_params("generate_config", obj.platform.network_driver, logger),
-    )[1].result["config"]
     intended_obj.intended_last_success_date = task.host.defaults.data["now"]
+    intended_obj.intended_last_duration = time.monotonic() - started
+    intended_obj.intended_timed_out = False
+    intended_obj.intended_fingerprint = fingerprint
+    intended_obj.intended_template_deps = sorted(loaded_templates)
+    intended_obj.intended_jinja_commit = jinja_commit
+    intended_obj.intended_path = intended_path_template_obj
     intended_obj.intended_config = generated_config
     intended_obj.save()
 
@@ -113,38 +234,65 @@ def config_intended(job):
 
     # Retrieve filters from the Django jinja template engine
     jinja_env = get_django_env()
-    try:
-        with InitNornir(
-            runner=NORNIR_SETTINGS.get("runner"),
-            logging={"enabled": False},
-            inventory={
-                "plugin": "nautobot-inventory",
-                "options": {
-                    "credentials_class": NORNIR_SETTINGS.get("credentials"),
-                    "params": NORNIR_SETTINGS.get("inventory_params"),
-                    "queryset": job.qs,
-                    "defaults": {"now": now},
-                },
-            },
-        ) as nornir_obj:
-            nr_with_processors = nornir_obj.with_processors([ProcessGoldenConfig(logger)])
-
-            logger.debug("Run nornir render config tasks.")
-            # Run the Nornir Tasks
-            results = nr_with_processors.run(
-                task=run_template,
-                name="RENDER CONFIG",
-                logger=logger,
-                device_to_settings_map=job.device_to_settings_map,
-                job_class_instance=job,
-                jinja_env=jinja_env,
-            )
-    except NornirNautobotException as err:
-        logger.error(
-            f"`E3029:` NornirNautobotException raised during intended tasks. Original exception message: ```{err}```"
+    failed = False
+    job.time_budget.skipped = 0
+    unchanged = 0
+    queryset = schedule_longest_first(logger, job.qs, "intended_last_duration", INVENTORY_CHUNK_SIZE)
+    # Each chunk gets its own inventory and results, so host data and results are released between chunks.
+    with writing_repository_files(job.device_to_settings_map, "intended_repository"):
+        for chunk_qs in get_inventory_chunks(queryset, INVENTORY_CHUNK_SIZE):
+            if job.time_budget.expired():
+                job.time_budget.skip(chunk_qs.count())
+                continue
+            try:
+                with InitNornir(
+                    runner=NORNIR_SETTINGS.get("runner"),
+                    logging={"enabled": False},
+                    inventory={
+                        "plugin": "nautobot-inventory",
+                        "options": {
+                            "credentials_class": NORNIR_SETTINGS.get("credentials"),
+                            "params": NORNIR_SETTINGS.get("inventory_params"),
+                            "queryset": chunk_qs,
+                            "defaults": {"now": now},
+                        },
+                    },
+                ) as nornir_obj:
+                    nr_with_processors = nornir_obj.with_processors([ProcessGoldenConfig(logger)])
+
+                    logger.debug("Run nornir render config tasks.")
+                    # Run the Nornir Tasks
+                    results = nr_with_processors.run(
+                        task=run_within_budget,
+                        stage_task=run_template,
+                        stage="intended",
+                        time_budget=job.time_budget,
+                        name="RENDER CONFIG",
+                        logger=logger,
+                        device_to_settings_map=job.device_to_settings_map,
+                        job_class_instance=job,
+                        jinja_env=jinja_env,
+                        sot_agg_data=SotAggPreloader(job, chunk_qs, SOT_AGG_BATCH_SIZE) if SOT_AGG_BATCH_SIZE else None,
+                    )
+                    failed = failed or results.failed
+                    unchanged += sum(
+                        bool(getattr(result[0], "unchanged", False)) for result in results.values() if result
+                    )
+            except NornirNautobotException as err:
+                logger.error(
+                    f"`E3029:` NornirNautobotException raised during intended tasks. Original exception message: ```{err}```"
+                )
+                # re-raise Exception if it's raised from nornir-nautobot or nautobot-app-nornir
+                if str(err).startswith("`E2") or str(err).startswith("`E1"):
+                    raise NornirNautobotException(err) from err
+    if unchanged:
+        logger.info(
+            f"Skipped the rendering of {unchanged} devices whose SoT data and templates are unchanged, "
+            "select `Force Render` to render them."
+        )
+    if job.time_budget.skipped:
+        logger.warning(
+            f"`E3034:` The job deadline was reached, the intended of {job.time_budget.skipped} devices was skipped."
         )
-        # re-raise Exception if it's raised from nornir-nautobot or nautobot-app-nornir
-        if str(err).startswith("`E2") or str(err).startswith("`E1"):
-            raise NornirNautobotException(err) from err
-    if results.failed:
+    if failed:
         raise IntendedGenerationFailure()
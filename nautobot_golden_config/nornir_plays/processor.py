@@ -51,3 +51,16 @@ class ProcessGoldenConfig(BaseLoggingProcessor):
             exception_string = ", ".join([str(e[0]) for e in exceptions])
             # Log only exception summary to users
             self.logger.error(f"{task.name} failed: {exception_string}", extra={"object": task.host.data["obj"]})
+
+        self._release_result_payloads(result)
+
+    @staticmethod
+    def _release_result_payloads(result):
+        """Drop the payload of successful results, such as full configurations, once they are persisted.
+
+        Only the failed status and exceptions of the results are used after a host is completed, keeping the
+        payloads would otherwise hold every device's configuration in memory until the end of the play.
+        """
+        for sub_result in result:
+            if not sub_result.failed:
+                sub_result.result = None
@@ -1,12 +1,31 @@
 """Signal helpers."""
 
 from django.apps import apps as global_apps
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from nautobot.core.choices import ColorChoices
-from nautobot.dcim.models import Platform
+from nautobot.dcim.models import Device, Interface, Platform
+from nautobot.extras.choices import JobResultStatusChoices
+from nautobot.extras.models import ConfigContext, JobResult
+from nautobot.ipam.models import IPAddress, IPAddressToInterface
 
 from nautobot_golden_config import models
+from nautobot_golden_config.tasks import recompute_compliance, refresh_config_paths_in_scope
+from nautobot_golden_config.utilities import sot_agg_cache
+from nautobot_golden_config.utilities.config_paths import config_paths_changed, refresh_config_paths
+from nautobot_golden_config.utilities.constant import (
+    COMPLIANCE_RULE_RECOMPUTE,
+    ENABLE_BACKUP,
+    ENABLE_COMPLIANCE,
+    ENABLE_INTENDED,
+)
+from nautobot_golden_config.utilities.rule_compliance import apply_compliance_task
+
+BULK_JOB_CLASS_PATHS = {
+    "nautobot.core.jobs.bulk_actions.BulkEditObjects",
+    "nautobot.core.jobs.bulk_actions.BulkDeleteObjects",
+}
 
 
 def post_migrate_create_statuses(sender, apps=global_apps, **kwargs):  # pylint: disable=unused-argument
@@ -85,3 +104,108 @@ def config_compliance_platform_cleanup(sender, instance, **kwargs):  # pylint: d
     )
     if cc_wrong_platform.count() > 0:
         cc_wrong_platform.delete()
+
+
+@receiver([post_save, post_delete], sender=Device)
+def sot_agg_cache_device_changed(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """Invalidate the cached SoT aggregation result of a changed device."""
+    sot_agg_cache.bump_device_versions([instance.pk])
+
+
+@receiver(pre_save, sender=Interface)
+def sot_agg_cache_interface_saving(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """Keep the device of an interface before the save, so moving it invalidates the results of both devices."""
+    if not instance._state.adding:  # pylint: disable=protected-access
+        previous = Interface.objects.filter(pk=instance.pk).values_list("device_id", flat=True).first()
+        instance._sot_agg_previous_device_id = previous  # pylint: disable=protected-access
+
+
+@receiver([post_save, post_delete], sender=Interface)
+def sot_agg_cache_interface_changed(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """Invalidate the cached SoT aggregation result of the device of a changed interface, and of its previous one."""
+    sot_agg_cache.bump_device_versions([instance.device_id, getattr(instance, "_sot_agg_previous_device_id", None)])
+
+
+@receiver(pre_save, sender=IPAddressToInterface)
+def sot_agg_cache_ip_assignment_saving(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """Keep the interface of an IP address assignment before the save, so moving it invalidates both devices."""
+    if not instance._state.adding:  # pylint: disable=protected-access
+        previous = IPAddressToInterface.objects.filter(pk=instance.pk).values_list("interface_id", flat=True).first()
+        instance._sot_agg_previous_interface_id = previous  # pylint: disable=protected-access
+
+
+@receiver([post_save, post_delete], sender=IPAddressToInterface)
+def sot_agg_cache_ip_assignment_changed(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """Invalidate the cached SoT aggregation result of the devices an IP address is assigned to, or unassigned from."""
+    interface_pks = {instance.interface_id, getattr(instance, "_sot_agg_previous_interface_id", None)} - {None}
+    if interface_pks:
+        sot_agg_cache.bump_device_versions(
+            Interface.objects.filter(pk__in=interface_pks).values_list("device_id", flat=True)
+        )
+
+
+@receiver([post_save, post_delete], sender=IPAddress)
+def sot_agg_cache_ip_address_changed(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """Invalidate the cached SoT aggregation result of the devices a changed IP address is assigned to."""
+    sot_agg_cache.bump_device_versions(
+        Interface.objects.filter(ip_addresses=instance).values_list("device_id", flat=True)
+    )
+
+
+@receiver([post_save, post_delete], sender=ConfigContext)
+def sot_agg_cache_config_context_changed(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """Invalidate the cached SoT aggregation results of all the devices, as a config context may apply to any."""
+    sot_agg_cache.bump_global_version()
+
+
+@receiver(post_save, sender=JobResult)
+def sot_agg_cache_bulk_job_finished(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """Invalidate the cached SoT aggregation results of all the devices once a bulk edit or delete job finished.
+
+    Bulk edits also change tags, relationships and related objects, which do not invalidate the devices they apply to.
+    """
+    if instance.status not in JobResultStatusChoices.READY_STATES:
+        return
+    if getattr(instance.job_model, "class_path", None) in BULK_JOB_CLASS_PATHS:
+        sot_agg_cache.bump_global_version()
+
+
+@receiver(pre_save, sender=Device)
+def config_paths_device_saving(sender, instance, update_fields=None, **kwargs):  # pylint: disable=unused-argument
+    """Flag a device whose save may change its config paths, compared before the save overwrites its fields."""
+    changed = (ENABLE_BACKUP or ENABLE_INTENDED) and config_paths_changed(instance, update_fields)
+    instance._config_paths_changed = changed  # pylint: disable=protected-access
+
+
+@receiver(post_save, sender=Device)
+def config_paths_device_changed(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """Refresh the persisted config paths of a saved device, when flagged before the save."""
+    if getattr(instance, "_config_paths_changed", False):
+        transaction.on_commit(lambda: refresh_config_paths(Device.objects.filter(pk=instance.pk)))
+
+
+@receiver(post_save, sender=models.GoldenConfigSetting)
+def config_paths_settings_changed(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """Enqueue the refresh of the persisted config paths of the devices in scope of changed settings."""
+    if not (ENABLE_BACKUP or ENABLE_INTENDED):
+        return
+    transaction.on_commit(lambda: refresh_config_paths_in_scope.delay(settings_pk=str(instance.pk)))
+
+
+def enqueue_compliance_recompute(**kwargs):
+    """Enqueue the recompute of the compliance once the current transaction is committed, when enabled."""
+    if not (ENABLE_COMPLIANCE and COMPLIANCE_RULE_RECOMPUTE):
+        return
+    transaction.on_commit(lambda: apply_compliance_task(recompute_compliance, **kwargs))
+
+
+@receiver(post_save, sender=models.ComplianceRule)
+def compliance_rule_changed(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """Recompute the compliance of a changed rule, deleted rules have their results deleted with them."""
+    enqueue_compliance_recompute(rule_pks=[str(instance.pk)])
+
+
+@receiver([post_save, post_delete], sender=models.RemediationSetting)
+def remediation_setting_changed(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """Recompute the compliance, and so the remediation, of all the rules of the platform of a remediation setting."""
+    enqueue_compliance_recompute(platform_pk=str(instance.platform_id))
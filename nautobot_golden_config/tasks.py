@@ -0,0 +1,103 @@
+"""Celery tasks used by the Golden Config jobs."""
+
+from nautobot.core.celery import nautobot_task
+from nautobot.extras.models import JobResult
+
+from nautobot_golden_config import models
+from nautobot_golden_config.choices import ComplianceSourceChoice
+from nautobot_golden_config.exceptions import BackupFailure, ComplianceFailure, IntendedGenerationFailure
+from nautobot_golden_config.nornir_plays.config_backup import config_backup
+from nautobot_golden_config.nornir_plays.config_compliance import config_compliance
+from nautobot_golden_config.nornir_plays.config_intended import config_intended
+from nautobot_golden_config.utilities.config_paths import refresh_settings_config_paths
+from nautobot_golden_config.utilities.rule_compliance import recompute_device_compliance, recompute_platform_compliance
+from nautobot_golden_config.utilities.sharding import ShardJob, ensure_shard_repositories
+from nautobot_golden_config.utilities.time_budget import TimeBudget
+
+PLAYS = {
+    config_backup.__name__: (config_backup, ["backup_repository"]),
+    config_intended.__name__: (config_intended, ["jinja_repository", "intended_repository"]),
+    config_compliance.__name__: (config_compliance, ["backup_repository", "intended_repository"]),
+}
+
+
+# The arguments are serialized to the Celery broker, so the job inputs are passed as separate plain values.
+@nautobot_task
+def run_play_shard(  # noqa: PLR0913 pylint: disable=too-many-arguments
+    play_name,
+    job_result_id,
+    device_to_settings,
+    log_level,
+    deadline=None,
+    device_budget=None,
+    skip_unchanged=True,
+    config_source=ComplianceSourceChoice.TYPE_REPOSITORY,
+):
+    """Run a Nornir play on a shard of the devices of a Golden Config job.
+
+    Args:
+        play_name (str): The name of the Nornir play to run, e.g. `config_backup`.
+        job_result_id (str): The pk of the parent JobResult, shard logs are written to it.
+        device_to_settings (dict): Mapping of the devices in the shard to the pk of their GoldenConfigSetting.
+        log_level (int): The log level of the parent job.
+        deadline (float): The epoch timestamp of the parent job deadline, if any.
+        device_budget (int): The time budget in seconds of each device, if any.
+        skip_unchanged (bool): Whether devices with unchanged inputs are skipped, see `force_render` and
+            `force_compliance`.
+        config_source (str): One of `ComplianceSourceChoice`, where the compliance play reads the configurations from.
+
+    Returns:
+        dict: The amount of devices in the shard, whether the shard failed and the error message if any.
+    """
+    play, repo_types = PLAYS[play_name]
+    shard_job = ShardJob(JobResult.objects.get(pk=job_result_id), device_to_settings, log_level)
+    shard_job.time_budget = TimeBudget(deadline=deadline, device_budget=device_budget)
+    shard_job.skip_unchanged = skip_unchanged
+    shard_job.config_source = config_source
+    if play is config_compliance and config_source == ComplianceSourceChoice.TYPE_DATABASE:
+        repo_types = []
+    result = {"devices": len(device_to_settings), "failed": False, "error": ""}
+    shard_job.logger.info(
+        f"Running {play_name} on a shard of {result['devices']} devices.", extra={"grouping": "GC Shards"}
+    )
+    try:
+        ensure_shard_repositories(shard_job, repo_types)
+        play(shard_job)
+    except (BackupFailure, IntendedGenerationFailure, ComplianceFailure):
+        result["failed"] = True
+    except Exception as error:  # pylint: disable=broad-exception-caught
+        result.update({"failed": True, "error": str(error)})
+    return result
+
+
+@nautobot_task
+def recompute_compliance(platform_pk=None, rule_pks=None):
+    """Recompute the compliance of changed rules, or of all the rules of a platform, from the stored configurations.
+
+    Args:
+        platform_pk (str): The pk of the platform whose rules are recomputed.
+        rule_pks (list): The pk of the rules to recompute.
+    """
+    recompute_platform_compliance(platform_pk=platform_pk, rule_pks=rule_pks)
+
+
+@nautobot_task
+def compliance_after_backup(device_pks):
+    """Recompute the compliance of a batch of devices whose backup changed, from the stored configurations.
+
+    Args:
+        device_pks (list): The pk of the devices to recompute.
+    """
+    recompute_device_compliance(device_pks)
+
+
+@nautobot_task
+def refresh_config_paths_in_scope(settings_pk):
+    """Refresh the persisted config paths of the devices in scope of a GoldenConfigSetting.
+
+    Args:
+        settings_pk (str): The pk of the GoldenConfigSetting, nothing is refreshed when it was deleted since.
+    """
+    settings = models.GoldenConfigSetting.objects.filter(pk=settings_pk).first()
+    if settings:
+        refresh_settings_config_paths(settings)
@@ -1,10 +1,10 @@
 """Helper for JSON rendering that extends what Nautobot Core provides."""
 
-import json
-
 from django import template
 from django_jinja import library
 
+from nautobot_golden_config.utilities import json_codec
+
 register = template.Library()
 
 
@@ -13,5 +13,5 @@ register = template.Library()
 def condition_render_json(value):
     """Render a dictionary as formatted JSON conditionally."""
     if isinstance(value, (dict, list)):
-        return json.dumps(value, indent=4, sort_keys=True, ensure_ascii=False)
+        return json_codec.dumps(value, indent=4, sort_keys=True)
     return value
@@ -11,7 +11,7 @@ from nautobot.extras.models import DynamicGroup, GitRepository, GraphQLQuery, St
 from rest_framework import status
 
 from nautobot_golden_config.choices import RemediationTypeChoice
-from nautobot_golden_config.models import ConfigPlan, GoldenConfigSetting, RemediationSetting
+from nautobot_golden_config.models import ConfigPlan, GoldenConfig, GoldenConfigSetting, RemediationSetting
 from nautobot_golden_config.tests.conftest import (
     create_config_compliance,
     create_device,
@@ -95,6 +95,21 @@ class GoldenConfigAPITest(APITestCase):  # pylint: disable=too-many-ancestors
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertFalse(response.data["compliance"])
 
+    def test_golden_config_compliance_diff(self):
+        """Verify the full config diff is computed on demand when not stored by the compliance job."""
+        golden_config = GoldenConfig.objects.create(
+            device=self.device,
+            backup_config="hostname foobaz\nntp server 10.0.0.1\n",
+            intended_config="hostname foobaz\nntp server 10.0.0.2\n",
+        )
+        self.add_permissions("nautobot_golden_config.view_goldenconfig")
+        url = reverse(
+            "plugins-api:nautobot_golden_config-api:goldenconfig-compliance-diff", kwargs={"pk": golden_config.pk}
+        )
+        response = self.client.get(url, **self.header)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("+ntp server 10.0.0.2\n", response.data["compliance_config"])
+
 
 class GoldenConfigSettingsAPITest(APITestCase):  # pylint: disable=too-many-ancestors
     """Verify that the combination of values in a GoldenConfigSettings object POST are valid."""
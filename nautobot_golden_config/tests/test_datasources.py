@@ -1,12 +1,14 @@
 """Unit tests for nautobot_golden_config datasources."""
 
+import os
+import tempfile
 from unittest import skip
 from unittest.mock import Mock
 
 from django.test import TestCase
 from nautobot.dcim.models import Platform
 
-from nautobot_golden_config.datasources import MissingReference, get_id_kwargs
+from nautobot_golden_config.datasources import MissingReference, get_id_kwargs, refresh_git_jinja
 from nautobot_golden_config.models import ComplianceFeature
 
 
@@ -95,3 +97,35 @@ class GitPropertiesDatasourceTestCase(TestCase):
         )
         self.assertEqual(id_kwargs, {"feature": self.compliance_feature})
         self.assertEqual(gc_config_item_dict, {})
+
+
+class JinjaDatasourceTestCase(TestCase):
+    """Test Jinja Template datasource."""
+
+    def setUp(self):
+        """Create a Jinja repository with a valid and an invalid template."""
+        tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(tmp_dir.cleanup)
+        templates = {
+            "arista_eos.j2": "hostname {{ obj.name }}\n",
+            "cisco_ios.j2": "{% if obj.name %}hostname {{ obj.name }}\n",
+            "README.md": "Use {{ and }} for variables.\n",
+        }
+        for name, content in templates.items():
+            with open(os.path.join(tmp_dir.name, name), "w", encoding="utf-8") as template_file:
+                template_file.write(content)
+        self.repository_record = Mock(filesystem_path=tmp_dir.name)
+        self.job_result = Mock()
+
+    def test_refresh_git_jinja(self):
+        """Verify the templates are compiled on sync and the invalid ones reported."""
+        refresh_git_jinja(self.repository_record, self.job_result)
+        messages = [call.args[0] for call in self.job_result.log.call_args_list]
+        self.assertEqual(len([message for message in messages if message.startswith("`E3035:`")]), 1)
+        self.assertIn("cisco_ios.j2", messages[1])
+        self.assertEqual(messages[-1], "Compiled 1 Jinja templates, 1 failed.")
+
+    def test_refresh_git_jinja_delete(self):
+        """Verify nothing is compiled when the repository is deleted."""
+        refresh_git_jinja(self.repository_record, self.job_result, delete=True)
+        self.assertEqual(self.job_result.log.call_count, 1)
@@ -1,7 +1,12 @@
 """Basic Job Test."""
 
+import time
+from types import SimpleNamespace
+from unittest import TestCase
 from unittest.mock import MagicMock, patch
 
+from django import forms
+from django.conf import settings
 from nautobot.apps.testing import TransactionTestCase, create_job_result_and_run_job
 from nautobot.dcim.models import Device
 from nautobot.extras.models import JobLogEntry
@@ -13,6 +18,8 @@ from nautobot_golden_config.tests.conftest import (
     dgs_gc_settings_and_job_repo_objects,
 )
 from nautobot_golden_config.utilities import constant
+from nautobot_golden_config.utilities.helper import get_task_queues
+from nautobot_golden_config.utilities.time_budget import TimeBudget
 
 
 @patch("nautobot_golden_config.nornir_plays.config_backup.run_backup", MagicMock(return_value="foo"))
@@ -205,6 +212,7 @@ class GCReposIntendedTestCase(TransactionTestCase):
 
 
 @patch("nautobot_golden_config.nornir_plays.config_compliance.run_compliance", MagicMock(return_value="foo"))
+@patch("nautobot_golden_config.nornir_plays.config_compliance.get_config_files", MagicMock(return_value=({}, set())))
 @patch.object(jobs, "ensure_git_repository")
 class GCReposComplianceTestCase(TransactionTestCase):
     """Test the repos to sync and commit are working for compliance job."""
@@ -263,6 +271,22 @@ class GCReposComplianceTestCase(TransactionTestCase):
         log_entries = JobLogEntry.objects.filter(job_result=job_result, grouping="GC Repo Commit and Push")
         self.assertEqual(log_entries.count(), 1)
 
+    def test_compliance_job_database_source(self, mock_ensure_git_repository):
+        """Test compliance job from the database does not sync or push any repository"""
+        job_result = create_job_result_and_run_job(
+            module="nautobot_golden_config.jobs",
+            name="ComplianceJob",
+            device=Device.objects.filter(name=self.device.name),
+            config_source="database",
+        )
+        mock_ensure_git_repository.assert_not_called()
+
+        log_entries = JobLogEntry.objects.filter(job_result=job_result, grouping="GC Repo Syncs")
+        self.assertEqual(log_entries.first().message, "Repository types to sync: ")
+
+        log_entries = JobLogEntry.objects.filter(job_result=job_result, grouping="GC Repo Commit and Push")
+        self.assertEqual(log_entries.count(), 0)
+
     @patch("nautobot_golden_config.utilities.constant.ENABLE_COMPLIANCE", False)
     def test_compliance_job_repos_one_setting_compliance_disabled(self, mock_ensure_git_repository):
         """Test compliance job one GC setting enabled_compliance disabled"""
@@ -620,3 +644,162 @@ class GCReposRunAllMultipleTestCase(TransactionTestCase):
 
         log_entries = JobLogEntry.objects.filter(job_result=job_result, grouping="GC Repo Commit and Push")
         self.assertEqual(log_entries.count(), 0)
+
+    def test_run_all_job_multiple_force(self, mock_ensure_git_repository):
+        """Test run all job multiple only skips the unchanged devices of the plays that are not forced."""
+        mock_ensure_git_repository.return_value = True
+        skip_unchanged = {}
+
+        def play(name):
+            return lambda job: skip_unchanged.__setitem__(name, job.skip_unchanged)
+
+        with (
+            patch.object(jobs, "config_intended", side_effect=play("intended")),
+            patch.object(jobs, "config_backup", side_effect=play("backup")),
+            patch.object(jobs, "config_compliance", side_effect=play("compliance")),
+        ):
+            create_job_result_and_run_job(
+                module="nautobot_golden_config.jobs",
+                name="AllDevicesGoldenConfig",
+                device=Device.objects.all(),
+                force_render=True,
+            )
+        self.assertEqual(skip_unchanged, {"intended": False, "backup": True, "compliance": True})
+
+
+@patch("nautobot_golden_config.nornir_plays.config_backup.run_backup", MagicMock(return_value="foo"))
+@patch("nautobot_golden_config.utilities.sharding.ensure_git_repository", MagicMock(return_value=True))
+@patch("nautobot_golden_config.utilities.helper.QUEUE_ROUTING", {"shard": "gc-shards"})
+@patch.object(jobs, "ensure_git_repository")
+class GCShardedBackupTestCase(TransactionTestCase):
+    """Test the backup job dispatching its devices in shards."""
+
+    databases = ("default", "job_logs")
+
+    def setUp(self) -> None:
+        """Setup test data."""
+        self.device = create_device(name="foobaz")
+        self.device2 = create_orphan_device(name="foobaz2")
+        dgs_gc_settings_and_job_repo_objects()
+        super().setUp()
+
+    @patch("nautobot_golden_config.utilities.constant.ENABLE_BACKUP", True)
+    def test_backup_job_sharded_by_count(self, mock_ensure_git_repository):
+        """Test backup job is split in one shard per device and pushed once."""
+        mock_ensure_git_repository.return_value = True
+        job_result = create_job_result_and_run_job(
+            module="nautobot_golden_config.jobs",
+            name="BackupJob",
+            device=Device.objects.all(),
+            shard_type="count",
+            shard_size=1,
+        )
+
+        log_entries = JobLogEntry.objects.filter(job_result=job_result, grouping="GC Shards")
+        self.assertEqual(log_entries.first().message, "Dispatching 2 shards to the workers.")
+        self.assertEqual(log_entries.filter(message="Running config_backup on a shard of 1 devices.").count(), 2)
+        self.assertFalse(log_entries.filter(message__startswith="`E3032:`").exists())
+
+        log_entries = JobLogEntry.objects.filter(job_result=job_result, grouping="GC Repo Commit and Push")
+        self.assertEqual(log_entries.count(), 1)
+
+    @patch("nautobot_golden_config.utilities.constant.ENABLE_BACKUP", True)
+    def test_backup_job_without_shard_queue_runs_in_process(self, mock_ensure_git_repository):
+        """Test backup job is not dispatched when the shards have no queue of their own."""
+        mock_ensure_git_repository.return_value = True
+        with patch("nautobot_golden_config.utilities.helper.QUEUE_ROUTING", {}):
+            job_result = create_job_result_and_run_job(
+                module="nautobot_golden_config.jobs",
+                name="BackupJob",
+                device=Device.objects.all(),
+                shard_type="count",
+                shard_size=1,
+            )
+
+        log_entries = JobLogEntry.objects.filter(job_result=job_result, grouping="GC Shards")
+        self.assertEqual(log_entries.count(), 1)
+        self.assertTrue(log_entries.first().message.startswith("`E3037:`"))
+
+        log_entries = JobLogEntry.objects.filter(job_result=job_result, grouping="GC Repo Commit and Push")
+        self.assertEqual(log_entries.count(), 1)
+
+    @patch("nautobot_golden_config.utilities.constant.ENABLE_BACKUP", True)
+    def test_backup_job_single_shard_runs_in_process(self, mock_ensure_git_repository):
+        """Test backup job is not dispatched when all devices fit in one shard."""
+        mock_ensure_git_repository.return_value = True
+        job_result = create_job_result_and_run_job(
+            module="nautobot_golden_config.jobs",
+            name="BackupJob",
+            device=Device.objects.all(),
+            shard_type="count",
+        )
+
+        log_entries = JobLogEntry.objects.filter(job_result=job_result, grouping="GC Shards")
+        self.assertEqual(log_entries.count(), 0)
+
+        log_entries = JobLogEntry.objects.filter(job_result=job_result, grouping="GC Repo Commit and Push")
+        self.assertEqual(log_entries.count(), 1)
+
+
+class WaitForShardsTestCase(TestCase):
+    """Test the job polls the results of its shards, bounded by its deadline."""
+
+    @staticmethod
+    def _job(deadline=None, device_budget=None):
+        return SimpleNamespace(time_budget=TimeBudget(deadline=deadline, device_budget=device_budget))
+
+    @patch.object(jobs, "SHARD_POLL_INTERVAL", 0)
+    def test_finished_shards(self):
+        """Test the results of the shards are returned, with the exception of the failed ones."""
+        error = ValueError("failed")
+        results = [MagicMock(ready=MagicMock(return_value=True), result=value) for value in ({"failed": False}, error)]
+        group_result = MagicMock(results=results, ready=MagicMock(side_effect=[False, True]))
+        self.assertEqual(jobs.wait_for_shards(self._job(), group_result), [{"failed": False}, error])
+        group_result.revoke.assert_not_called()
+
+    @patch.object(jobs, "SHARD_POLL_INTERVAL", 0)
+    def test_deadline_exceeded(self):
+        """Test the shards not finished after the deadline and the device budget are revoked and failed."""
+        results = [MagicMock(ready=MagicMock(return_value=ready), result={"failed": False}) for ready in (True, False)]
+        group_result = MagicMock(results=results, ready=MagicMock(return_value=False))
+        shard_results = jobs.wait_for_shards(self._job(deadline=time.time() - 20, device_budget=10), group_result)
+        group_result.revoke.assert_called_once_with()
+        self.assertEqual(shard_results[0], {"failed": False})
+        self.assertIsInstance(shard_results[1], TimeoutError)
+
+
+@patch("nautobot_golden_config.utilities.helper.QUEUE_ROUTING", {"backup": "gc-io", "fast_lane": "gc-interactive"})
+class GCFastLaneFormTestCase(TestCase):
+    """Test the job form selects the `fast_lane` queue when opened for a single device."""
+
+    @staticmethod
+    def _queue(initial):
+        """Return the queue initially selected in the backup job form."""
+        form = SimpleNamespace(
+            fields={
+                "_task_queue": forms.ChoiceField(choices=[("gc-io", "gc-io"), ("gc-interactive", "gc-interactive")])
+            }
+        )
+        with patch.object(jobs.Job, "as_form", MagicMock(return_value=form)):
+            return jobs.BackupJob.as_form(initial=initial).fields["_task_queue"].initial
+
+    def test_single_device(self):
+        """Test the `fast_lane` queue is selected for a single device."""
+        self.assertEqual(self._queue({"device": "a"}), "gc-interactive")
+        self.assertEqual(self._queue({"device": ["a"]}), "gc-interactive")
+
+    def test_many_devices(self):
+        """Test the default queue is kept for more devices, or without a device."""
+        self.assertIsNone(self._queue({"device": ["a", "b"]}))
+        self.assertIsNone(self._queue({"location": ["a"]}))
+        self.assertIsNone(self._queue(None))
+
+    def test_only_fast_lane(self):
+        """Test the `fast_lane` queue is only selected for a single device, when it is the only configured queue."""
+        # The class patch is applied last, so the routing is narrowed within the test.
+        with patch("nautobot_golden_config.utilities.helper.QUEUE_ROUTING", {"fast_lane": "gc-interactive"}):
+            self.assertEqual(
+                get_task_queues("backup", "fast_lane"), [settings.CELERY_TASK_DEFAULT_QUEUE, "gc-interactive"]
+            )
+            self.assertEqual(self._queue({"device": ["a"]}), "gc-interactive")
+            self.assertIsNone(self._queue({"device": ["a", "b"]}))
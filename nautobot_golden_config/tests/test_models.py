@@ -1,20 +1,30 @@
 """Unit tests for nautobot_golden_config models."""
 
+import random
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from deepdiff import DeepDiff
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
 from django.db.models.deletion import ProtectedError
 from django.test import TestCase
 from nautobot.dcim.models import Platform
 from nautobot.extras.models import DynamicGroup, GitRepository, GraphQLQuery, Status
+from xmldiff import actions, main
 
 from nautobot_golden_config.choices import RemediationTypeChoice
 from nautobot_golden_config.models import (
+    XML_DIFF_OPTIONS,
     ConfigCompliance,
     ConfigPlan,
     ConfigRemove,
     ConfigReplace,
     GoldenConfigSetting,
     RemediationSetting,
+    _get_json_compliance,
+    _get_xml_compliance,
 )
 from nautobot_golden_config.tests.conftest import create_git_repos
 
@@ -22,6 +32,7 @@ from .conftest import (
     create_config_compliance,
     create_device,
     create_feature_rule_json,
+    create_feature_rule_json_with_remediation,
     create_feature_rule_xml,
     create_job_result,
     create_saved_queries,
@@ -120,6 +131,300 @@ class ConfigComplianceModelTestCase(TestCase):
         self.assertEqual(ConfigCompliance.objects.filter(device=self.device).count(), 1)
 
 
+def _custom_compliance_details(obj):
+    """Return the compliance details of a custom function, compliant when the actual is the intended."""
+    compliance = obj.actual == obj.intended
+    return {
+        "compliance": compliance,
+        "compliance_int": int(compliance),
+        "ordered": compliance,
+        "missing": "" if compliance else obj.intended,
+        "extra": "" if compliance else obj.actual,
+    }
+
+
+class ConfigComplianceBatchTestCase(TestCase):
+    """Test the compliance of several ConfigCompliance computed at once, with the custom batch functions."""
+
+    def setUp(self):
+        """Set up a device with a custom rule, a JSON rule with a custom remediation, and a JSON rule."""
+        self.device = create_device()
+        self.rule_custom = create_feature_rule_json(self.device, feature="custom")
+        self.rule_custom.custom_compliance = True
+        self.rule_custom.save()
+        self.rule_remediation = create_feature_rule_json_with_remediation(self.device)
+        self.rule_json = create_feature_rule_json(self.device)
+        RemediationSetting.objects.create(
+            platform=self.device.platform, remediation_type=RemediationTypeChoice.TYPE_CUSTOM
+        )
+
+    def _compliances(self):
+        """Return not compliant ConfigCompliance of each rule, not computed nor saved."""
+        return [
+            ConfigCompliance(device=self.device, rule=rule, actual={"foo": "bar"}, intended={"foo": "baz"})
+            for rule in [self.rule_custom, self.rule_remediation, self.rule_json]
+        ]
+
+    def test_compute_batch(self):
+        """Verify the custom rules are given at once to the batch functions, and the others computed one by one."""
+        compliance_batch = MagicMock(side_effect=lambda objs: [_custom_compliance_details(obj) for obj in objs])
+        remediation_batch = MagicMock(side_effect=lambda objs: [f"remediate {obj.rule}" for obj in objs])
+        compliances = self._compliances()
+        with patch.dict(
+            "nautobot_golden_config.models.BATCH_FUNC_MAPPER",
+            {"custom": compliance_batch, RemediationTypeChoice.TYPE_CUSTOM: remediation_batch},
+        ):
+            ConfigCompliance.compute_batch(compliances)
+        compliance_batch.assert_called_once_with(objs=compliances[:1])
+        remediation_batch.assert_called_once_with(objs=compliances[1:2])
+        self.assertEqual([compliance.compliance for compliance in compliances], [False, False, False])
+        self.assertEqual(compliances[0].missing, {"foo": "baz"})
+        self.assertEqual(compliances[1].missing, ["root['foo']"])
+        self.assertEqual(compliances[1].remediation, f"remediate {self.rule_remediation}")
+        self.assertEqual(compliances[2].remediation, "")
+
+    def test_compute_batch_without_batch_functions(self):
+        """Verify the objects are computed one by one with the custom functions, as `save` does."""
+        custom_compliance = MagicMock(side_effect=_custom_compliance_details)
+        custom_remediation = MagicMock(return_value="remediate")
+        compliances = self._compliances()
+        with patch.dict(
+            "nautobot_golden_config.models.FUNC_MAPPER",
+            {"custom": custom_compliance, RemediationTypeChoice.TYPE_CUSTOM: custom_remediation},
+        ):
+            ConfigCompliance.compute_batch(compliances)
+        custom_compliance.assert_called_once_with(obj=compliances[0])
+        custom_remediation.assert_called_once_with(obj=compliances[1])
+        self.assertEqual(compliances[1].remediation, "remediate")
+
+    def test_save_with_only_batch_functions(self):
+        """Verify an object saved on its own is given alone to the batch functions, when only these are set."""
+        compliance_batch = MagicMock(side_effect=lambda objs: [_custom_compliance_details(obj) for obj in objs])
+        remediation_batch = MagicMock(side_effect=lambda objs: [f"remediate {obj.rule}" for obj in objs])
+        compliances = self._compliances()
+        with patch.dict(
+            "nautobot_golden_config.models.BATCH_FUNC_MAPPER",
+            {"custom": compliance_batch, RemediationTypeChoice.TYPE_CUSTOM: remediation_batch},
+        ):
+            for compliance in compliances:
+                compliance.save()
+        compliance_batch.assert_called_once_with(objs=compliances[:1])
+        remediation_batch.assert_called_once_with(objs=compliances[1:2])
+        self.assertEqual(ConfigCompliance.objects.get(rule=self.rule_custom).missing, {"foo": "baz"})
+        self.assertEqual(
+            ConfigCompliance.objects.get(rule=self.rule_remediation).remediation, f"remediate {self.rule_remediation}"
+        )
+
+    def test_compute_batch_invalid_results(self):
+        """Verify the results of the batch functions are validated."""
+        compliance_details = _custom_compliance_details(SimpleNamespace(actual="a", intended="a"))
+        for results in [[], [compliance_details, compliance_details], compliance_details, [{"compliance": True}]]:
+            batch_function = MagicMock(return_value=results)
+            with patch.dict("nautobot_golden_config.models.BATCH_FUNC_MAPPER", {"custom": batch_function}):
+                with self.assertRaises(ValidationError):
+                    ConfigCompliance.compute_batch(self._compliances()[:1])
+
+
+def _get_json_compliance_full_diff(obj):
+    """Reference JSON compliance, with a single DeepDiff of the full actual and intended values."""
+
+    def _normalize_diff(diff, path_to_diff):
+        dictionary_items = list(diff.get(f"dictionary_item_{path_to_diff}", []))
+        list_items = list(diff.get(f"iterable_item_{path_to_diff}", {}).keys())
+        values_changed = list(diff.get("values_changed", {}).keys())
+        type_changes = list(diff.get("type_changes", {}).keys())
+        return dictionary_items + list_items + values_changed + type_changes or ""
+
+    diff = DeepDiff(obj.actual, obj.intended, ignore_order=obj.ordered, report_repetition=True)
+    return {
+        "compliance": not diff,
+        "compliance_int": int(not diff),
+        "ordered": not diff,
+        "missing": _normalize_diff(diff, "added") if diff else "",
+        "extra": _normalize_diff(diff, "removed") if diff else "",
+    }
+
+
+def _random_json(generator, depth=0):
+    """Return a random JSON value, with few distinct keys and scalars so that random values often overlap."""
+    kind = generator.random()
+    if depth > 3 or kind < 0.4:  # noqa: PLR2004
+        return generator.choice([0, 1, 1.0, -0.0, True, False, None, "a", "b", "1"])
+    if kind < 0.7:  # noqa: PLR2004
+        return {generator.choice("abcdef"): _random_json(generator, depth + 1) for _ in range(generator.randint(0, 4))}
+    return [_random_json(generator, depth + 1) for _ in range(generator.randint(0, 4))]
+
+
+def _mutate_json(generator, value):
+    """Return a copy of a JSON value with a random change, or the same value."""
+    if isinstance(value, dict):
+        value = dict(value)
+        if value and generator.random() < 0.5:  # noqa: PLR2004
+            key = generator.choice(list(value))
+            value[key] = _mutate_json(generator, value[key])
+        elif value and generator.random() < 0.5:  # noqa: PLR2004
+            del value[generator.choice(list(value))]
+        else:
+            value[generator.choice("abcdefg")] = _random_json(generator, 2)
+        return value
+    if isinstance(value, list):
+        value = list(value)
+        if value and generator.random() < 0.5:  # noqa: PLR2004
+            index = generator.randrange(len(value))
+            value[index] = _mutate_json(generator, value[index])
+        elif generator.random() < 0.3:  # noqa: PLR2004
+            generator.shuffle(value)
+        else:
+            value.insert(generator.randint(0, len(value)), _random_json(generator, 3))
+        return value
+    return _random_json(generator, 3) if generator.random() < 0.7 else value  # noqa: PLR2004
+
+
+def _json_interfaces(count):
+    """Return the JSON of interfaces, each with a few units."""
+    return {
+        f"Gi{index}": {"units": [{"unit": unit, "vlan": f"{unit + 10}"} for unit in range(20)], "mtu": 1500}
+        for index in range(count)
+    }
+
+
+class JsonComplianceTestCase(unittest.TestCase):
+    """Test the hashed JSON compliance against a DeepDiff of the full values."""
+
+    def assertSameCompliance(self, actual, intended):  # pylint: disable=invalid-name
+        """Assert the JSON compliance is the same as the full DeepDiff compliance, ordered or not."""
+        for ordered in (True, False):
+            obj = SimpleNamespace(actual=actual, intended=intended, ordered=ordered)
+            self.assertEqual(_get_json_compliance(obj), _get_json_compliance_full_diff(obj))
+
+    def test_compliant(self):
+        """Verify equal values are compliant, whatever the order of the keys and, when ignored, of the lists."""
+        self.assertSameCompliance(
+            {"foo": {"bar-1": "baz", "bar-2": [1, 2]}}, {"foo": {"bar-2": [1, 2], "bar-1": "baz"}}
+        )
+        self.assertSameCompliance({"foo": [1, 2, 2]}, {"foo": [2, 1, 2]})
+        obj = SimpleNamespace(actual={"foo": [1, 2, 2]}, intended={"foo": [2, 1, 2]}, ordered=True)
+        self.assertTrue(_get_json_compliance(obj)["compliance"])
+
+    def test_changed_subtrees(self):
+        """Verify the missing and extra paths are the same as the full DeepDiff, on the changed subtrees only."""
+        actual = {"foo": {"bar-1": "baz", "bar-2": {"a": 1}, "bar-3": [1, 2]}, "ntp": ["10.0.0.1"]}
+        intended = {"foo": {"bar-1": "notbaz", "bar-2": {"a": 1}, "bar-4": [1, 2]}, "ntp": ["10.0.0.1", "10.0.0.2"]}
+        self.assertSameCompliance(actual, intended)
+        obj = SimpleNamespace(actual=actual, intended=intended, ordered=False)
+        self.assertEqual(
+            _get_json_compliance(obj)["missing"], ["root['foo']['bar-4']", "root['ntp'][1]", "root['foo']['bar-1']"]
+        )
+
+    def test_type_changes(self):
+        """Verify equal values of different types are not compliant."""
+        self.assertSameCompliance({"mtu": 1500}, {"mtu": 1500.0})
+        self.assertSameCompliance({"enabled": True}, {"enabled": 1})
+        self.assertSameCompliance({"foo": {"a": 1}}, {"foo": [1]})
+        self.assertSameCompliance("foo", {"foo": "bar"})
+
+    def test_nan(self):
+        """Verify values with NaN are compared by the full DeepDiff."""
+        self.assertSameCompliance({"foo": float("nan")}, {"foo": float("nan")})
+
+    def test_random_values(self):
+        """Verify the compliance is the same on random values."""
+        generator = random.Random(1)
+        for _ in range(2000):
+            actual = _random_json(generator)
+            self.assertSameCompliance(actual, _mutate_json(generator, actual))
+
+    def test_large_value(self):
+        """Verify a large value drifting on a single leaf gives the same compliance as the full DeepDiff."""
+        actual, intended = _json_interfaces(100), _json_interfaces(100)
+        intended["Gi7"]["units"][3]["vlan"] = "100"
+        self.assertSameCompliance(actual, intended)
+        obj = SimpleNamespace(actual=actual, intended=intended, ordered=True)
+        self.assertEqual(_get_json_compliance(obj)["extra"], ["root['Gi7']['units'][3]['vlan']"])
+
+
+def _get_xml_compliance_two_pass(obj):
+    """Reference XML compliance, with one `diff_texts` from actual to intended and one from intended to actual."""
+
+    def _normalize_diff(diff):
+        return "\n".join(
+            f"{operation.node}, {operation.text}" for operation in diff if isinstance(operation, actions.UpdateTextIn)
+        )
+
+    missing = main.diff_texts(obj.actual, obj.intended, diff_options=XML_DIFF_OPTIONS)
+    extra = main.diff_texts(obj.intended, obj.actual, diff_options=XML_DIFF_OPTIONS)
+    compliance = not missing and not extra
+    return {
+        "compliance": compliance,
+        "compliance_int": int(compliance),
+        "ordered": obj.ordered,
+        "missing": _normalize_diff(missing),
+        "extra": _normalize_diff(extra),
+    }
+
+
+def _xml_interfaces(generator, count, values=("up", "down", "core")):
+    """Return the XML of interfaces, with random descriptions and MTU."""
+    interfaces = "".join(
+        f"<interface><name>Gi{index}</name><description>{generator.choice(values)}</description>"
+        f"<mtu>{generator.choice(['1500', '9000'])}</mtu></interface>"
+        for index in range(count)
+    )
+    return f"<interfaces>{interfaces}</interfaces>"
+
+
+class XmlComplianceTestCase(unittest.TestCase):
+    """Test the single pass XML compliance against the two pass compliance it replaces."""
+
+    def assertSameCompliance(self, actual, intended):  # pylint: disable=invalid-name
+        """Assert the XML compliance is the same as the two pass compliance."""
+        obj = SimpleNamespace(actual=actual, intended=intended, ordered=True)
+        self.assertEqual(_get_xml_compliance(obj), _get_xml_compliance_two_pass(obj))
+
+    def test_compliant(self):
+        """Verify identical and differently indented configurations are compliant."""
+        self.assertSameCompliance("<root><foo>baz</foo></root>", "<root><foo>baz</foo></root>")
+        self.assertSameCompliance("<root><foo>baz</foo></root>", "<root>\n  <foo>baz</foo>\n</root>\n")
+
+    def test_text_updates(self):
+        """Verify the extra values are the replaced values of the actual configuration."""
+        actual = "<root><foo><bar-1>notbaz</bar-1><bar-2>x</bar-2></foo></root>"
+        intended = "<root><foo><bar-1>baz</bar-1><bar-2/></foo></root>"
+        self.assertSameCompliance(actual, intended)
+        obj = SimpleNamespace(actual=actual, intended=intended, ordered=True)
+        self.assertEqual(_get_xml_compliance(obj)["extra"], "/root/foo/bar-1[1], notbaz\n/root/foo/bar-2[1], x")
+
+    def test_namespaces(self):
+        """Verify the replaced values are found in namespaced configurations."""
+        actual = (
+            '<config xmlns="urn:a" xmlns:x="urn:x"><x:system><x:hostname>r1</x:hostname></x:system>'
+            "<ntp><server>192.0.2.1</server></ntp></config>"
+        )
+        self.assertSameCompliance(actual, actual.replace("r1", "r2").replace("192.0.2.1", "192.0.2.2"))
+
+    def test_structural_changes(self):
+        """Verify added and removed nodes fall back to the diff from intended to actual."""
+        actual = "<root><foo><bar-1>baz</bar-1></foo></root>"
+        self.assertSameCompliance(actual, "<root><foo><bar-1>notbaz</bar-1><bar-2>x</bar-2></foo></root>")
+        self.assertSameCompliance(actual, "<root><foo/></root>")
+        self.assertSameCompliance(actual, '<root><foo enabled="true"><bar-1>baz</bar-1></foo></root>')
+
+    def test_random_configurations(self):
+        """Verify the compliance is the same on random interface configurations."""
+        generator = random.Random(7)
+        for _ in range(100):
+            count = generator.randint(1, 8)
+            actual = _xml_interfaces(generator, count)
+            intended = _xml_interfaces(generator, count + generator.choice([-1, 0, 0, 0, 1]))
+            self.assertSameCompliance(actual, intended)
+
+    def test_large_configuration(self):
+        """Verify the compliance is the same on a large configuration drifting on a few values."""
+        generator = random.Random(1)
+        actual = _xml_interfaces(generator, 200, values=("up",))
+        self.assertSameCompliance(actual, actual.replace("<mtu>1500</mtu>", "<mtu>9216</mtu>", 30))
+
+
 class GoldenConfigTestCase(TestCase):
     """Test GoldenConfig Model."""
 
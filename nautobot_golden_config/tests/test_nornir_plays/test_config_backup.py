@@ -0,0 +1,89 @@
+"""Unit tests for nautobot_golden_config nornir backup."""
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+from nornir.core.task import MultiResult, Result
+
+from nautobot_golden_config.nornir_plays.config_backup import config_backup
+from nautobot_golden_config.utilities.time_budget import TimeBudget
+
+
+class FakeQuerySet(list):
+    """Minimal stand-in of a Device queryset, as used to split the inventory in chunks."""
+
+    def values_list(self, *args, **kwargs):  # pylint: disable=unused-argument
+        return list(self)
+
+    def filter(self, pk__in):  # pylint: disable=arguments-differ
+        return FakeQuerySet(pk__in)
+
+
+class FakeNornir:
+    """Fake Nornir object completing each host of its chunk with a full configuration in its result."""
+
+    chunks = []
+    results = []
+
+    def __init__(self, inventory, **kwargs):  # pylint: disable=unused-argument
+        self.hosts = inventory["options"]["queryset"]
+        self.processors = []
+        self.chunks.append(list(self.hosts))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def with_processors(self, processors):
+        self.processors = processors
+        return self
+
+    def run(self, **kwargs):
+        for host in self.hosts:
+            result = MultiResult(kwargs["name"])
+            result.append(Result(host=None, result=f"hostname {host}"))
+            result.append(Result(host=None, result={"config": f"hostname {host}"}))
+            for processor in self.processors:
+                processor.task_instance_completed(MagicMock(), MagicMock(), result)
+            self.results.append(result)
+        return MagicMock(failed=False)
+
+
+@patch("nautobot_golden_config.nornir_plays.config_backup.NornirLogger", MagicMock())
+@patch("nautobot_golden_config.nornir_plays.config_backup.ConfigRemove", MagicMock())
+@patch("nautobot_golden_config.nornir_plays.config_backup.ConfigReplace", MagicMock())
+@patch("nautobot_golden_config.nornir_plays.config_backup.InitNornir", FakeNornir)
+@patch(
+    "nautobot_golden_config.nornir_plays.config_backup.schedule_longest_first",
+    lambda logger, queryset, duration_field, chunk_size: queryset,
+)
+class ConfigBackupChunkTest(unittest.TestCase):
+    """Test the backup play runs its inventory in chunks, releasing the results of each host once completed."""
+
+    def setUp(self):
+        """Reset the chunks and results recorded by the fake Nornir."""
+        FakeNornir.chunks = []
+        FakeNornir.results = []
+
+    @staticmethod
+    def _config_backup(fleet_size):
+        config_backup(
+            MagicMock(qs=FakeQuerySet(range(fleet_size)), device_to_settings_map={}, time_budget=TimeBudget())
+        )
+
+    @patch("nautobot_golden_config.nornir_plays.config_backup.INVENTORY_CHUNK_SIZE", 50)
+    def test_chunked_inventory(self):
+        """Verify each chunk gets its own inventory, and the configuration of each completed host is released."""
+        self._config_backup(120)
+        self.assertEqual([len(chunk) for chunk in FakeNornir.chunks], [50, 50, 20])
+        self.assertEqual(len(FakeNornir.results), 120)
+        for result in FakeNornir.results:
+            self.assertEqual([sub_result.result for sub_result in result], [None, None])
+
+    @patch("nautobot_golden_config.nornir_plays.config_backup.INVENTORY_CHUNK_SIZE", 0)
+    def test_unchunked_inventory(self):
+        """Verify the inventory is a single chunk when chunking is disabled."""
+        self._config_backup(120)
+        self.assertEqual([len(chunk) for chunk in FakeNornir.chunks], [120])
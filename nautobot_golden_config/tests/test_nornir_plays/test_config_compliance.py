@@ -4,8 +4,21 @@ import json
 import unittest
 from unittest.mock import MagicMock, Mock, patch
 
-from nautobot_golden_config.choices import ComplianceRuleConfigTypeChoice
-from nautobot_golden_config.nornir_plays.config_compliance import get_config_element, get_rules
+from nornir_nautobot.exceptions import NornirNautobotException
+
+from nautobot_golden_config.choices import (
+    ComplianceRuleConfigTypeChoice,
+    ComplianceSourceChoice,
+    RemediationTypeChoice,
+)
+from nautobot_golden_config.nornir_plays.config_compliance import (
+    _locate_config_file,
+    _uses_batch_functions,
+    get_config_element,
+    get_rules,
+    run_compliance,
+)
+from nautobot_golden_config.utilities.time_budget import DeviceBudget
 
 
 class ConfigComplianceTest(unittest.TestCase):
@@ -48,3 +61,168 @@ class ConfigComplianceTest(unittest.TestCase):
         mock_rule["obj"].config_type = ComplianceRuleConfigTypeChoice.TYPE_JSON
         return_config = json.dumps(get_config_element(mock_rule, mock_config, mock_obj, None))
         self.assertEqual(return_config, mock_config)
+
+    @patch("nautobot_golden_config.nornir_plays.config_compliance.get_json_config", wraps=json.loads)
+    def test_get_config_element_parsed_once(self, mock_get_json_config):
+        """Verify a JSON configuration is parsed once for all the rules of a device."""
+        mock_config = json.dumps({"key1": "value1", "key2": "value2"})
+        mock_obj = MagicMock(name="Device")
+        parsed_configs = {}
+        for match_config in ["key1", "key2"]:
+            mock_rule = MagicMock(name="ComplianceRule")
+            mock_rule["obj"].match_config = match_config
+            mock_rule["obj"].config_type = ComplianceRuleConfigTypeChoice.TYPE_JSON
+            self.assertEqual(
+                get_config_element(mock_rule, mock_config, mock_obj, None, parsed_configs),
+                {match_config: f"value{match_config[-1]}"},
+            )
+        mock_get_json_config.assert_called_once_with(mock_config)
+
+
+class ConfigFilesTest(unittest.TestCase):
+    """Test the config files of the compliance job are located from the repository indexes."""
+
+    def setUp(self):
+        """Setup a mock repository and its index."""
+        self.repository_record = Mock(pk="backup-repo", filesystem_path="/opt/nautobot/git/backups")
+        self.index = {"commit": "abc123", "files": {"dc1/router1.cfg": (17, "0a1b2c", 1700000000.0)}}
+
+    @patch("nautobot_golden_config.nornir_plays.config_compliance.get_repository_index")
+    def test_locate_config_file(self, mock_get_repository_index):
+        """Verify the files are located from the index, fetched once per repository."""
+        mock_get_repository_index.return_value = self.index
+        indexes = {}
+        self.assertEqual(
+            _locate_config_file(indexes, self.repository_record, "dc1/router1.cfg"),
+            ("/opt/nautobot/git/backups/dc1/router1.cfg", "0a1b2c"),
+        )
+        self.assertIsNone(_locate_config_file(indexes, self.repository_record, "dc2/router2.cfg"))
+        mock_get_repository_index.assert_called_once()
+
+    @patch("nautobot_golden_config.nornir_plays.config_compliance.os.path.exists")
+    @patch("nautobot_golden_config.nornir_plays.config_compliance.get_repository_index", Mock(return_value=None))
+    def test_locate_config_file_without_index(self, mock_exists):
+        """Verify the files are checked one by one when the repository can not be indexed."""
+        mock_exists.return_value = True
+        self.assertEqual(
+            _locate_config_file({}, self.repository_record, "dc2/router2.cfg"),
+            ("/opt/nautobot/git/backups/dc2/router2.cfg", None),
+        )
+        mock_exists.return_value = False
+        self.assertIsNone(_locate_config_file({}, self.repository_record, "dc2/router2.cfg"))
+
+
+@patch("nautobot_golden_config.nornir_plays.config_compliance.RemediationSetting")
+class UsesBatchFunctionsTest(unittest.TestCase):
+    """Test the devices whose compliance goes through the custom batch functions, and is written in bulk."""
+
+    def setUp(self):
+        """Setup the rules of a device, none of them custom."""
+        self.device = MagicMock()
+        self.rules = [{"obj": MagicMock(custom_compliance=False, config_remediation=False)} for _ in range(2)]
+
+    def test_without_batch_functions(self, mock_remediation_setting):
+        """Verify the compliance is not batched without batch functions, whatever the rules."""
+        self.rules[0]["obj"].custom_compliance = True
+        self.assertFalse(_uses_batch_functions(self.device, self.rules))
+        mock_remediation_setting.objects.filter.assert_not_called()
+
+    def test_custom_compliance(self, mock_remediation_setting):  # pylint: disable=unused-argument
+        """Verify the compliance is only batched for the devices with a custom compliance rule."""
+        with patch.dict("nautobot_golden_config.nornir_plays.config_compliance.BATCH_FUNC_MAPPER", {"custom": Mock()}):
+            self.assertFalse(_uses_batch_functions(self.device, self.rules))
+            self.rules[0]["obj"].custom_compliance = True
+            self.assertTrue(_uses_batch_functions(self.device, self.rules))
+
+    def test_custom_remediation(self, mock_remediation_setting):
+        """Verify the compliance is only batched for the remediated rules of a platform with a custom remediation."""
+        batch_func_mapper = {RemediationTypeChoice.TYPE_CUSTOM: Mock()}
+        with patch.dict("nautobot_golden_config.nornir_plays.config_compliance.BATCH_FUNC_MAPPER", batch_func_mapper):
+            self.assertFalse(_uses_batch_functions(self.device, self.rules))
+            self.rules[1]["obj"].config_remediation = True
+            mock_remediation_setting.objects.filter.return_value.exists.return_value = False
+            self.assertFalse(_uses_batch_functions(self.device, self.rules))
+            mock_remediation_setting.objects.filter.return_value.exists.return_value = True
+            self.assertTrue(_uses_batch_functions(self.device, self.rules))
+
+
+@patch("nautobot_golden_config.nornir_plays.config_compliance.ConfigCompliance")
+@patch("nautobot_golden_config.nornir_plays.config_compliance.get_config_element", MagicMock(return_value="aaa"))
+@patch("nautobot_golden_config.nornir_plays.config_compliance._open_file_config")
+@patch("nautobot_golden_config.nornir_plays.config_compliance.GoldenConfig")
+class RunComplianceDatabaseSourceTest(unittest.TestCase):
+    """Test the compliance of a device from the configurations stored in the database."""
+
+    def setUp(self):
+        """Setup a mock Nornir task and device."""
+        self.device = MagicMock()
+        self.device.platform.network_driver = "cisco_ios"
+        self.task = MagicMock()
+        self.task.host.data = {"obj": self.device}
+        self.task.host.defaults.data = {"now": "now"}
+        self.rules = {"cisco_ios": [{"obj": MagicMock(), "ordered": True, "section": ["aaa"]}]}
+
+    def _run_compliance(self, device_budget=None):
+        return run_compliance(
+            self.task,
+            logger=MagicMock(),
+            device_to_settings_map={self.device.id: MagicMock()},
+            rules=self.rules,
+            rules_signatures={"cisco_ios": "0a1b2c"},
+            job_class_instance=MagicMock(skip_unchanged=True),
+            config_source=ComplianceSourceChoice.TYPE_DATABASE,
+            device_budget=device_budget,
+        )
+
+    def test_database_source(self, mock_golden_config, mock_open_file_config, mock_config_compliance):
+        """Verify the stored configurations are compared, without reading any file."""
+        compliance_obj = mock_golden_config.objects.filter.return_value.first.return_value
+        compliance_obj.backup_config = "hostname foo\n"
+        compliance_obj.intended_config = "hostname bar\n"
+        compliance_obj.compliance_fingerprint = ""
+        self._run_compliance()
+        mock_open_file_config.assert_not_called()
+        self.assertIn("+hostname bar", compliance_obj.compliance_config)
+        self.assertTrue(compliance_obj.compliance_fingerprint)
+
+    def test_database_source_unchanged(  # pylint: disable=unused-argument
+        self, mock_golden_config, mock_open_file_config, mock_config_compliance
+    ):
+        """Verify the compliance of unchanged stored configurations is skipped and reported as unchanged."""
+        compliance_obj = mock_golden_config.objects.filter.return_value.first.return_value
+        compliance_obj.backup_config = "hostname foo\n"
+        compliance_obj.intended_config = "hostname bar\n"
+        compliance_obj.compliance_fingerprint = ""
+        self.assertFalse(getattr(self._run_compliance(), "unchanged", False))
+        self.assertTrue(self._run_compliance().unchanged)
+        self.assertEqual(mock_config_compliance.objects.update_or_create.call_count, 1)
+
+    def test_database_source_missing(self, mock_golden_config, mock_open_file_config, mock_config_compliance):
+        """Verify a device without a stored configuration fails."""
+        compliance_obj = mock_golden_config.objects.filter.return_value.first.return_value
+        compliance_obj.backup_config = "hostname foo\n"
+        compliance_obj.intended_config = ""
+        with self.assertRaises(NornirNautobotException):
+            self._run_compliance()
+        mock_open_file_config.assert_not_called()
+        mock_config_compliance.objects.update_or_create.assert_not_called()
+
+    @patch("nautobot_golden_config.utilities.time_budget.GoldenConfig")
+    def test_time_budget_exceeded(  # pylint: disable=unused-argument
+        self, mock_budget_golden_config, mock_golden_config, mock_open_file_config, mock_config_compliance
+    ):
+        """Verify a device exceeding its time budget does not start its compliance, nor write it."""
+        compliance_obj = mock_golden_config.objects.filter.return_value.first.return_value
+        compliance_obj.backup_config = "hostname foo\n"
+        compliance_obj.intended_config = "hostname bar\n"
+        compliance_obj.compliance_fingerprint = ""
+        compliance_obj.save.reset_mock()
+        with patch("nautobot_golden_config.nornir_plays.config_compliance._get_compliances") as mock_get_compliances:
+            with self.assertRaises(NornirNautobotException):
+                self._run_compliance(device_budget=DeviceBudget("compliance", 0))
+        mock_get_compliances.assert_not_called()
+        mock_config_compliance.objects.update_or_create.assert_not_called()
+        self.assertEqual(compliance_obj.save.call_count, 1)
+        mock_budget_golden_config.objects.update_or_create.assert_called_once_with(
+            device=self.device, defaults={"compliance_timed_out": True}
+        )
@@ -0,0 +1,250 @@
+"""Unit tests for nautobot_golden_config nornir intended."""
+
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from nornir.core.task import Result
+from nornir_nautobot.exceptions import NornirNautobotException
+
+from nautobot_golden_config.nornir_plays.config_intended import config_intended, run_template
+from nautobot_golden_config.utilities.time_budget import DeviceBudget, TimeBudget
+
+
+@patch("nautobot_golden_config.nornir_plays.config_intended.os.path.exists", MagicMock(return_value=True))
+@patch("nautobot_golden_config.nornir_plays.config_intended.write_within_budget", MagicMock())
+@patch("nautobot_golden_config.nornir_plays.config_intended.dispatch_params", MagicMock(return_value={}))
+@patch("nautobot_golden_config.nornir_plays.config_intended.render_jinja_template", MagicMock(return_value="foo.cfg"))
+@patch("nautobot_golden_config.nornir_plays.config_intended.graph_ql_query")
+@patch("nautobot_golden_config.nornir_plays.config_intended.GoldenConfig")
+class RunTemplateFingerprintTest(unittest.TestCase):
+    """Test the intended configuration is only rendered when its inputs changed."""
+
+    def setUp(self):
+        """Setup a mock Nornir task, device and settings."""
+        self.device = MagicMock()
+        self.task = MagicMock()
+        self.task.host.data = {"obj": self.device}
+        self.task.host.defaults.data = {"now": "now"}
+        self.task.run.return_value = [None, MagicMock(result={"config": "hostname foo"})]
+        self.settings = MagicMock()
+        self.settings.jinja_repository.current_head = "abc123"
+        self.job = MagicMock(skip_unchanged=True)
+
+    def _run_template(self, jinja_env=None):
+        return run_template(
+            self.task,
+            logger=MagicMock(),
+            device_to_settings_map={self.device.id: self.settings},
+            job_class_instance=self.job,
+            jinja_env=jinja_env or MagicMock(),
+        )
+
+    def test_unchanged_skipped(self, mock_golden_config, mock_graph_ql_query):
+        """Verify a device is rendered once while its SoT data and templates are unchanged."""
+        mock_graph_ql_query.return_value = (200, {"hostname": "foo"})
+        intended_obj = mock_golden_config.objects.filter.return_value.first.return_value
+        self.assertFalse(getattr(self._run_template(), "unchanged", False))
+        self.assertTrue(self._run_template().unchanged)
+        self.assertEqual(self.task.run.call_count, 1)
+        intended_obj.save.assert_called_with(
+            update_fields=[
+                "intended_last_success_date",
+                "intended_timed_out",
+                "intended_jinja_commit",
+                "intended_path",
+                "last_updated",
+            ]
+        )
+
+    def test_changed_rendered(self, mock_golden_config, mock_graph_ql_query):  # pylint: disable=unused-argument
+        """Verify a device is rendered again when its SoT data or the templates changed."""
+        mock_graph_ql_query.return_value = (200, {"hostname": "foo"})
+        self._run_template()
+        mock_graph_ql_query.return_value = (200, {"hostname": "bar"})
+        self._run_template()
+        self.settings.jinja_repository.current_head = "def456"
+        self._run_template()
+        self.assertEqual(self.task.run.call_count, 3)
+
+    def test_force_render(self, mock_golden_config, mock_graph_ql_query):  # pylint: disable=unused-argument
+        """Verify a device is rendered again when forced."""
+        mock_graph_ql_query.return_value = (200, {"hostname": "foo"})
+        self.job.skip_unchanged = False
+        self._run_template()
+        self._run_template()
+        self.assertEqual(self.task.run.call_count, 2)
+
+    @patch("nautobot_golden_config.utilities.time_budget.GoldenConfig")
+    def test_time_budget_exceeded(  # pylint: disable=unused-argument
+        self, mock_budget_golden_config, mock_golden_config, mock_graph_ql_query
+    ):
+        """Verify a device exceeding its time budget is not rendered."""
+        mock_graph_ql_query.return_value = (200, {"hostname": "foo"})
+        self.job.skip_unchanged = False
+        with self.assertRaises(NornirNautobotException):
+            run_template(
+                self.task,
+                logger=MagicMock(),
+                device_to_settings_map={self.device.id: self.settings},
+                job_class_instance=self.job,
+                jinja_env=MagicMock(),
+                device_budget=DeviceBudget("intended", 0),
+            )
+        self.task.run.assert_not_called()
+        mock_budget_golden_config.objects.update_or_create.assert_called_once_with(
+            device=self.device, defaults={"intended_timed_out": True}
+        )
+
+    @patch("nautobot_golden_config.utilities.helper.get_changed_files")
+    def test_template_dependencies(self, mock_get_changed_files, mock_golden_config, mock_graph_ql_query):
+        """Verify a device is only rendered again when one of the templates it loaded changed."""
+        mock_graph_ql_query.return_value = (200, {"hostname": "foo"})
+        intended_obj = mock_golden_config.objects.filter.return_value.first.return_value
+        jinja_env = MagicMock()
+        jinja_env.record_loaded_templates.return_value.__enter__.return_value = {"foo.j2", "partials/snmp.j2"}
+        self._run_template(jinja_env)
+        self.assertEqual(intended_obj.intended_template_deps, ["foo.j2", "partials/snmp.j2"])
+        self.assertEqual(intended_obj.intended_jinja_commit, "abc123")
+
+        self.settings.jinja_repository.current_head = "def456"
+        mock_get_changed_files.return_value = frozenset({"partials/ntp.j2"})
+        self._run_template(jinja_env)
+        self.assertEqual(self.task.run.call_count, 1)
+        self.assertEqual(intended_obj.intended_jinja_commit, "def456")
+
+        self.settings.jinja_repository.current_head = "0a1b2c"
+        mock_get_changed_files.return_value = frozenset({"partials/snmp.j2"})
+        self._run_template(jinja_env)
+        self.assertEqual(self.task.run.call_count, 2)
+
+    def test_device_data_released(self, mock_golden_config, mock_graph_ql_query):  # pylint: disable=unused-argument
+        """Verify the SoT data is only on the host while rendering, and the inventory data is restored afterwards."""
+        self.task.host.data["platform"] = "inventory"
+        mock_graph_ql_query.return_value = (200, {"hostname": "foo", "platform": "sot"})
+        rendered_with = []
+
+        def render(**kwargs):  # pylint: disable=unused-argument
+            rendered_with.append(dict(self.task.host.data))
+            return [None, MagicMock(result={"config": "hostname foo"})]
+
+        self.task.run.side_effect = render
+        self._run_template()
+        self.assertEqual(rendered_with, [{"obj": self.device, "hostname": "foo", "platform": "sot"}])
+        self.assertEqual(self.task.host.data, {"obj": self.device, "platform": "inventory"})
+
+        self.job.skip_unchanged = False
+        self.task.run.side_effect = ValueError("foo")
+        with self.assertRaises(ValueError):
+            self._run_template()
+        self.assertEqual(self.task.host.data, {"obj": self.device, "platform": "inventory"})
+
+    def test_batched_sot_agg_data_released(self, mock_golden_config, mock_graph_ql_query):  # pylint: disable=unused-argument
+        """Verify the batched SoT data of a device is used once, then released."""
+        sot_agg_data = {self.device.id: (200, {"hostname": "foo"})}
+        run_template(
+            self.task,
+            logger=MagicMock(),
+            device_to_settings_map={self.device.id: self.settings},
+            job_class_instance=self.job,
+            jinja_env=MagicMock(),
+            sot_agg_data=sot_agg_data,
+        )
+        mock_graph_ql_query.assert_not_called()
+        self.assertEqual(sot_agg_data, {})
+        self.assertEqual(self.task.host.data, {"obj": self.device})
+
+
+class FakeNornir:
+    """Fake Nornir object running its task on a mock Nornir task for each device of its inventory."""
+
+    def __init__(self, inventory, **kwargs):  # pylint: disable=unused-argument
+        self.devices = inventory["options"]["queryset"]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def with_processors(self, processors):  # pylint: disable=unused-argument
+        return self
+
+    def run(self, task, name, **kwargs):  # pylint: disable=unused-argument
+        results = [[task(MagicMock(host=MagicMock(data={"obj": device})), **kwargs)] for device in self.devices]
+        return MagicMock(failed=False, **{"values.return_value": results})
+
+
+@patch("nautobot_golden_config.nornir_plays.config_intended.NornirLogger", MagicMock())
+@patch("nautobot_golden_config.nornir_plays.config_intended.get_django_env", MagicMock())
+@patch("nautobot_golden_config.nornir_plays.config_intended.InitNornir", FakeNornir)
+@patch("nautobot_golden_config.nornir_plays.config_intended.INVENTORY_CHUNK_SIZE", 0)
+@patch(
+    "nautobot_golden_config.nornir_plays.config_intended.schedule_longest_first",
+    lambda logger, queryset, duration_field, chunk_size: queryset,
+)
+@patch("nautobot_golden_config.nornir_plays.config_intended.graph_ql_query_batch")
+@patch("nautobot_golden_config.nornir_plays.config_intended.run_template")
+class ConfigIntendedPlayTest(unittest.TestCase):
+    """Test the intended play runs the SoT aggregation queries in batches, as the devices are rendered."""
+
+    def setUp(self):
+        """Setup a job with three devices sharing their settings."""
+        self.devices = [SimpleNamespace(id=index) for index in range(3)]
+        settings = MagicMock()
+        self.job = MagicMock(
+            qs=self.devices,
+            device_to_settings_map={device.id: settings for device in self.devices},
+            time_budget=TimeBudget(),
+        )
+
+    @patch("nautobot_golden_config.nornir_plays.config_intended.SOT_AGG_BATCH_SIZE", 2)
+    def test_batched_sot_agg_data(self, mock_run_template, mock_graph_ql_query_batch):
+        """Verify the SoT aggregation data of the batches reaches the rendering of every device."""
+        mock_graph_ql_query_batch.side_effect = lambda request, devices, query, query_id: {
+            device.id: (200, {"hostname": f"device{device.id}"}) for device in devices
+        }
+        rendered = {}
+        mock_run_template.side_effect = lambda task, **kwargs: rendered.update(
+            {task.host.data["obj"].id: kwargs["sot_agg_data"].pop(task.host.data["obj"].id)}
+        )
+        config_intended(self.job)
+        self.assertEqual([len(call.args[1]) for call in mock_graph_ql_query_batch.call_args_list], [2, 1])
+        self.assertEqual(rendered, {device.id: (200, {"hostname": f"device{device.id}"}) for device in self.devices})
+        self.assertEqual(mock_run_template.call_args.kwargs["sot_agg_data"].loaded, {})
+
+    @patch("nautobot_golden_config.nornir_plays.config_intended.SOT_AGG_BATCH_SIZE", 2)
+    def test_sot_agg_preload_bounded(self, mock_run_template, mock_graph_ql_query_batch):
+        """Verify at most a batch of SoT aggregation data is held at once, with chunking disabled."""
+        self.devices.extend(SimpleNamespace(id=index) for index in range(3, 7))
+        self.job.device_to_settings_map.update(
+            {device.id: self.job.device_to_settings_map[0] for device in self.devices}
+        )
+        mock_graph_ql_query_batch.side_effect = lambda request, devices, query, query_id: {
+            device.id: (200, {}) for device in devices
+        }
+        mock_run_template.side_effect = lambda task, **kwargs: kwargs["sot_agg_data"].pop(task.host.data["obj"].id)
+        config_intended(self.job)
+        self.assertEqual(mock_graph_ql_query_batch.call_count, 4)
+        self.assertEqual(mock_run_template.call_args.kwargs["sot_agg_data"].peak, 2)
+
+    @patch("nautobot_golden_config.nornir_plays.config_intended.SOT_AGG_BATCH_SIZE", 0)
+    def test_unbatched_sot_agg_data(self, mock_run_template, mock_graph_ql_query_batch):
+        """Verify the devices run their own query when batching is disabled."""
+        config_intended(self.job)
+        mock_graph_ql_query_batch.assert_not_called()
+        self.assertIsNone(mock_run_template.call_args.kwargs["sot_agg_data"])
+
+    @patch("nautobot_golden_config.nornir_plays.config_intended.SOT_AGG_BATCH_SIZE", 0)
+    def test_unchanged_logged(self, mock_run_template, mock_graph_ql_query_batch):  # pylint: disable=unused-argument
+        """Verify the number of devices skipped as unchanged is logged."""
+        mock_run_template.side_effect = lambda task, **kwargs: Result(
+            host=None, unchanged=task.host.data["obj"].id != 1
+        )
+        # The class patch is applied last, so the logger is patched again within the test.
+        with patch("nautobot_golden_config.nornir_plays.config_intended.NornirLogger") as mock_logger:
+            config_intended(self.job)
+        mock_logger.return_value.info.assert_called_once_with(
+            "Skipped the rendering of 2 devices whose SoT data and templates are unchanged, "
+            "select `Force Render` to render them."
+        )
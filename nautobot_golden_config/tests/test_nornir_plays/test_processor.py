@@ -0,0 +1,24 @@
+"""Unit tests for nautobot_golden_config nornir processor."""
+
+import unittest
+from unittest.mock import MagicMock
+
+from nornir.core.task import MultiResult, Result
+
+from nautobot_golden_config.nornir_plays.processor import ProcessGoldenConfig
+
+
+class ProcessGoldenConfigTest(unittest.TestCase):
+    """Test the processor of the golden config plays."""
+
+    def test_release_result_payloads(self):
+        """Verify the payloads of the successful results are released once the host is completed, not the failures."""
+        host = MagicMock()
+        result = MultiResult("BACKUP CONFIG")
+        result.append(Result(host=None, result={"config": "hostname foo"}))
+        result.append(Result(host=None, result="Traceback", failed=True, exception=ValueError("foo")))
+        ProcessGoldenConfig(MagicMock()).task_instance_completed(MagicMock(), host, result)
+        host.close_connections.assert_called_once_with()
+        self.assertIsNone(result[0].result)
+        self.assertEqual(result[1].result, "Traceback")
+        self.assertIsInstance(result[1].exception, ValueError)
@@ -0,0 +1,56 @@
+"""Unit tests for nautobot_golden_config utilities compliance_diff."""
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+from nautobot_golden_config.utilities.compliance_diff import get_compliance_diff
+
+
+@patch("nautobot_golden_config.utilities.compliance_diff.cache")
+class ComplianceDiffTest(unittest.TestCase):
+    """Test the full configuration diff computed on demand."""
+
+    def setUp(self):
+        """Setup a Golden Config without a stored diff."""
+        self.golden_config = MagicMock(
+            compliance_config="",
+            backup_config="hostname router1\nntp server 10.0.0.1\n",
+            intended_config="hostname router1\nntp server 10.0.0.2\n",
+        )
+
+    def test_stored_diff(self, mock_cache):
+        """Verify the diff stored by the compliance job is returned as is."""
+        self.golden_config.compliance_config = "stored diff"
+        self.assertEqual(get_compliance_diff(self.golden_config), "stored diff")
+        mock_cache.get.assert_not_called()
+
+    def test_diff_computed_and_cached(self, mock_cache):
+        """Verify the diff is computed from the stored configurations and cached by their content."""
+        mock_cache.get.return_value = None
+        compliance_diff = get_compliance_diff(self.golden_config)
+        self.assertIn("-ntp server 10.0.0.1\n", compliance_diff)
+        self.assertIn("+ntp server 10.0.0.2\n", compliance_diff)
+        cache_key, cached_diff = mock_cache.set.call_args.args
+        self.assertEqual(cached_diff, compliance_diff)
+        self.golden_config.intended_config = "hostname router1\n"
+        mock_cache.get.return_value = "cached diff"
+        self.assertEqual(get_compliance_diff(self.golden_config), "cached diff")
+        self.assertNotEqual(mock_cache.get.call_args.args[0], cache_key)
+
+    def test_cache_key_of_the_diff_engine(self, mock_cache):
+        """Verify a diff cached with another diff engine is not reused."""
+        mock_cache.get.return_value = None
+        get_compliance_diff(self.golden_config)
+        difflib_key = mock_cache.get.call_args.args[0]
+        with patch(
+            "nautobot_golden_config.utilities.diff_engine.PLUGIN_CFG",
+            {"compliance_diff_engine": "nautobot_golden_config.utilities.diff_engine.fast_unified_diff"},
+        ):
+            get_compliance_diff(self.golden_config)
+        self.assertNotEqual(mock_cache.get.call_args.args[0], difflib_key)
+
+    def test_configs_not_stored(self, mock_cache):
+        """Verify no diff is computed without a stored backup or intended configuration."""
+        self.golden_config.intended_config = ""
+        self.assertEqual(get_compliance_diff(self.golden_config), "")
+        mock_cache.get.assert_not_called()
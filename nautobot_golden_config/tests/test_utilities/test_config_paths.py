@@ -0,0 +1,101 @@
+"""Unit tests for nautobot_golden_config utilities config_paths."""
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+from nautobot.dcim.models import Device
+from nautobot.extras.models import DynamicGroup
+
+from nautobot_golden_config.models import GoldenConfigSetting
+from nautobot_golden_config.tests.conftest import create_device
+from nautobot_golden_config.utilities.config_paths import config_paths_changed, get_config_paths
+
+
+class ConfigPathsTest(unittest.TestCase):
+    """Test the backup and intended paths persisted on GoldenConfig."""
+
+    def setUp(self):
+        """Setup a mock device and settings."""
+        self.device = MagicMock()
+        self.device.name = "router1"
+        self.device.location.name = "dc1"
+        self.settings = MagicMock(
+            backup_path_template="{{ obj.location.name }}/{{ obj.name }}.cfg",
+            intended_path_template="{{ obj.location.name }}/{{ obj.name }}.intended.cfg",
+        )
+
+    def test_get_config_paths(self):
+        """Verify the paths are rendered from the path templates of the settings."""
+        self.assertEqual(
+            get_config_paths(self.device, self.settings),
+            {"backup_path": "dc1/router1.cfg", "intended_path": "dc1/router1.intended.cfg"},
+        )
+
+    def test_get_config_paths_not_set(self):
+        """Verify the paths are empty without settings, repository or template."""
+        self.assertEqual(get_config_paths(self.device, None), {"backup_path": "", "intended_path": ""})
+        self.settings.backup_repository = None
+        self.settings.intended_path_template = ""
+        self.assertEqual(get_config_paths(self.device, self.settings), {"backup_path": "", "intended_path": ""})
+
+    def test_get_config_paths_render_error(self):
+        """Verify a path is empty when its template fails to render, without failing the other one."""
+        self.settings.backup_path_template = "{{ obj.name }"
+        paths = get_config_paths(self.device, self.settings, logger=MagicMock())
+        self.assertEqual(paths, {"backup_path": "", "intended_path": "dc1/router1.intended.cfg"})
+
+
+class ConfigPathsChangedTest(TestCase):
+    """Test the config paths of a device are only refreshed when a field its path templates use changes."""
+
+    def setUp(self):
+        """Setup a device and path templates using its name."""
+        self.device = create_device()
+        self.settings = GoldenConfigSetting.objects.create(
+            name="test",
+            slug="test",
+            weight=1000,
+            dynamic_group=DynamicGroup.objects.create(
+                name="test", content_type=ContentType.objects.get_for_model(Device), filter={}
+            ),
+            backup_path_template="{{ obj.name }}.cfg",
+            intended_path_template="{{ obj.name }}.intended.cfg",
+        )
+
+    def test_new_device(self):
+        """Verify a new device is not flagged, it has no Golden Config yet."""
+        self.assertFalse(config_paths_changed(Device(name="new")))
+
+    def test_used_field_changed(self):
+        """Verify a device is flagged when a field the path templates use changes, and only then."""
+        self.assertFalse(config_paths_changed(self.device))
+        self.device.serial = "123456"
+        self.assertFalse(config_paths_changed(self.device))
+        self.device.name = "renamed"
+        self.assertTrue(config_paths_changed(self.device))
+
+    def test_update_fields(self):
+        """Verify a device saving only fields the path templates do not use is not flagged."""
+        self.device.name = "renamed"
+        self.assertFalse(config_paths_changed(self.device, update_fields=frozenset(["serial"])))
+        self.assertTrue(config_paths_changed(self.device, update_fields=frozenset(["name"])))
+
+    def test_related_field_changed(self):
+        """Verify a device is flagged when a related object the path templates use changes."""
+        GoldenConfigSetting.objects.update(backup_path_template="{{ obj.location.name }}/{{ obj.name }}.cfg")
+        self.device.location = self.device.location.parent
+        self.assertTrue(config_paths_changed(self.device, update_fields=frozenset(["location_id"])))
+
+    def test_device_used_otherwise(self):
+        """Verify a device is always flagged when a path template uses it other than through its fields."""
+        GoldenConfigSetting.objects.update(backup_path_template="{{ obj.cf.path }}.cfg")
+        self.assertTrue(config_paths_changed(self.device))
+
+    @patch("nautobot_golden_config.signals.refresh_config_paths_in_scope")
+    def test_settings_changed(self, mock_task):
+        """Verify saving settings enqueues the refresh of the paths of the devices in their scope."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.settings.save()
+        mock_task.delay.assert_called_once_with(settings_pk=str(self.settings.pk))
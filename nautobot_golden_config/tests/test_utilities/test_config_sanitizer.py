@@ -0,0 +1,126 @@
+"""Unit tests for nautobot_golden_config utilities config_sanitizer."""
+
+import random
+import re
+import unittest
+
+from netutils.config.clean import clean_config, sanitize_config
+
+from nautobot_golden_config.utilities.config_sanitizer import ConfigSanitizer, _line_start_prefix
+
+REMOVE_LINES = [
+    {"regex": r"^Building\s+configuration.*\n"},
+    {"regex": r"^Current\s+configuration.*\n"},
+    {"regex": r"^!\s+Last\s+configuration.*"},
+    {"regex": r"^ntp\s+clock-period.*\n"},
+]
+SUBSTITUTE_LINES = [
+    {"regex": r"(username\s+\S+\s+privilege\s+\d+\s+secret\s+\d+\s+)\S+", "replace": r"\1<redacted>"},
+    {"regex": r"^(snmp-server\s+community\s+)\S+", "replace": r"\1<redacted>"},
+    {"regex": r"^(\s*description\s+).*$", "replace": r"\g<1><removed>"},
+]
+
+
+def router_config(interfaces):
+    """Return the running configuration of a router, with the lines the rules above remove or substitute."""
+    lines = [
+        "Building configuration...\n",
+        "\n",
+        "Current configuration : 1582 bytes\n",
+        "! Last configuration change at 10:00:00 UTC\n",
+        "hostname router1\n",
+        "ntp clock-period 17179\n",
+        "snmp-server community public RO\n",
+    ]
+    lines.extend(f"username user{index} privilege 15 secret 5 $1$abc{index}\n" for index in range(interfaces // 10))
+    for index in range(interfaces):
+        lines.extend(
+            [
+                f"interface GigabitEthernet1/0/{index}\n",
+                f" description link {index}\n",
+                " switchport access vlan 10\n",
+                " no shutdown\n",
+                "!\n",
+            ]
+        )
+    lines.append("end")
+    return "".join(lines)
+
+
+def netutils_sanitize(config, remove_lines, substitute_lines):
+    """Sanitize the configuration as the dispatcher does with netutils."""
+    return sanitize_config(clean_config(config, remove_lines), substitute_lines)
+
+
+class ConfigSanitizerTest(unittest.TestCase):
+    """Test the sanitizer gives the same configuration as netutils."""
+
+    def assertSameConfig(self, config, remove_lines, substitute_lines):  # pylint: disable=invalid-name
+        """Assert the sanitizer gives the same configuration as `clean_config` then `sanitize_config`."""
+        self.assertEqual(
+            ConfigSanitizer(remove_lines, substitute_lines).sanitize(config),
+            netutils_sanitize(config, remove_lines, substitute_lines),
+        )
+
+    def test_router_config(self):
+        """Verify the usual rules remove and substitute the same lines as netutils."""
+        config = router_config(20)
+        sanitized = ConfigSanitizer(REMOVE_LINES, SUBSTITUTE_LINES).sanitize(config)
+        self.assertEqual(sanitized, netutils_sanitize(config, REMOVE_LINES, SUBSTITUTE_LINES))
+        self.assertTrue(sanitized.startswith("\n\nhostname router1\nsnmp-server community <redacted> RO\n"))
+        self.assertNotIn("$1$abc", sanitized)
+
+    def test_anchored_regexes(self):
+        """Verify the regexes anchored to the start of the lines match the same text as netutils."""
+        config = "ab\nabc\n\nab ab\na\nAB\nab\n"
+        for regex in [r"^ab", r"^ab.*\n", r"^ab\s*", r"^(a)(b)?", r"^a$\n", r"^ab\n^ab", r"^\nab", r"(?i)^ab"]:
+            self.assertSameConfig(config, [{"regex": regex}], [])
+            self.assertSameConfig(config, [], [{"regex": regex, "replace": r"<\g<0>>"}])
+
+    def test_line_start_prefix(self):
+        """Verify the literal text a regex starts a line with, empty when it is not certain."""
+        for regex, prefix in [
+            (r"^Building\s+configuration.*\n", "Building"),
+            (r"^ntp clock-period", "ntp clock-period"),
+            (r"^ab\n^ab", "ab"),
+            (r"^ab*", ""),
+            (r"^ab{2}", ""),
+            (r"^ba|^ab", ""),
+            (r"^\.ab", ""),
+            (r"(?i)^ab", ""),
+            (r"^(ab)+", ""),
+            (r"ab", ""),
+        ]:
+            self.assertEqual(_line_start_prefix(re.compile(regex, re.MULTILINE)), prefix, regex)
+        self.assertEqual(_line_start_prefix(re.compile(r"^ab", re.MULTILINE | re.IGNORECASE)), "")
+
+    def test_no_rules(self):
+        """Verify the configuration is unchanged without rules."""
+        sanitizer = ConfigSanitizer()
+        self.assertFalse(sanitizer)
+        self.assertEqual(sanitizer.sanitize("hostname router1\n"), "hostname router1\n")
+
+    def test_invalid_rules(self):
+        """Verify an invalid regex or replacement text raises the same error as netutils, when sanitizing."""
+        for remove_lines, substitute_lines in [
+            ([{"regex": r"^(interface"}], []),
+            ([], [{"regex": r"^hostname", "replace": r"\1"}]),
+        ]:
+            sanitizer = ConfigSanitizer(remove_lines, substitute_lines)
+            with self.assertRaises(re.error) as netutils_error:
+                netutils_sanitize("interface Gi1\n", remove_lines, substitute_lines)
+            with self.assertRaisesRegex(re.error, re.escape(str(netutils_error.exception))):
+                sanitizer.sanitize("interface Gi1\n")
+
+    def test_random_rules(self):
+        """Verify random rules on random configurations give the same result as netutils."""
+        regexes = [r"^ab", r"^a.*\n", r"^(ab)+", r"^a\n?", r"^ba|^ab", r"^a(?=b)", r"^b[^a]*", r"^a+\n", r"b\n", r"a$"]
+        generator = random.Random(42)
+        for _ in range(2000):
+            config = "".join(generator.choice("ab \n") for _ in range(generator.randint(0, 30)))
+            remove_lines = [{"regex": generator.choice(regexes)} for _ in range(generator.randint(0, 3))]
+            substitute_lines = [
+                {"regex": generator.choice(regexes), "replace": generator.choice(["", "x", "y\n", r"\g<0>z"])}
+                for _ in range(generator.randint(0, 2))
+            ]
+            self.assertSameConfig(config, remove_lines, substitute_lines)
@@ -0,0 +1,150 @@
+"""Unit tests for nautobot_golden_config utilities diff_engine, see `development/benchmarks.py` for its benchmark."""
+
+import difflib
+import random
+import re
+import unittest
+
+from nautobot_golden_config.utilities.diff_engine import fast_unified_diff
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+\d+(?:,\d+)? @@")
+
+
+def apply_unified_diff(a, diff):
+    """Apply a unified diff to the lines it was computed from, returning the resulting lines."""
+    result, position = [], 0
+    for line in diff[2:]:
+        header = HUNK_HEADER.match(line)
+        if header:
+            start, length = int(header.group(1)), int(header.group(2) or 1)
+            start = start - 1 if length else start
+            result.extend(a[position:start])
+            position = start
+        elif line.startswith(" "):
+            result.append(line[1:])
+            position += 1
+        elif line.startswith("-"):
+            position += 1
+        elif line.startswith("+"):
+            result.append(line[1:])
+    result.extend(a[position:])
+    return result
+
+
+def access_switch_config(interfaces):
+    """Return the lines of an access switch configuration, mostly made of identical interface sections."""
+    lines = ["hostname switch1\n", "!\n"]
+    for index in range(interfaces):
+        lines.extend(
+            [
+                f"interface GigabitEthernet1/0/{index}\n",
+                " switchport mode access\n",
+                " switchport access vlan 10\n",
+                " spanning-tree portfast\n",
+                " no shutdown\n",
+                "!\n",
+            ]
+        )
+    return lines
+
+
+def prefix_list_config(prefixes):
+    """Return the lines of a router configuration ending with a large prefix-list."""
+    lines = ["hostname router1\n", "!\n", "router bgp 65000\n", " neighbor 10.0.0.1 remote-as 65001\n", "!\n"]
+    lines.extend(
+        f"ip prefix-list CUSTOMERS seq {(index + 1) * 5} permit 10.{index // 250}.{index % 250}.0/24\n"
+        for index in range(prefixes)
+    )
+    return lines
+
+
+class FastUnifiedDiffTest(unittest.TestCase):
+    """Test the output of the fast diff engine against `difflib.unified_diff`."""
+
+    def assertSameDiff(self, a, b):  # pylint: disable=invalid-name
+        """Assert the fast engine produces the same diff as `difflib.unified_diff`."""
+        self.assertEqual(list(fast_unified_diff(a, b, lineterm="")), list(difflib.unified_diff(a, b, lineterm="")))
+
+    def test_identical_configs(self):
+        """Verify identical configurations have an empty diff."""
+        self.assertSameDiff(access_switch_config(10), access_switch_config(10))
+        self.assertSameDiff([], [])
+
+    def test_changed_added_and_removed_lines(self):
+        """Verify the diff of unambiguous changes is the same as `difflib.unified_diff`."""
+        backup = prefix_list_config(500)
+        intended = list(backup)
+        intended[3] = " neighbor 10.0.0.2 remote-as 65001\n"
+        intended.insert(200, "ip prefix-list CUSTOMERS seq 999 permit 192.0.2.0/24\n")
+        del intended[400:410]
+        self.assertSameDiff(backup, intended)
+        self.assertSameDiff(backup, [])
+        self.assertSameDiff([], intended)
+
+    def test_repeated_lines(self):
+        """Verify the diff of changes among repeated lines is the same as `difflib.unified_diff`."""
+        backup = access_switch_config(50)
+        intended = list(backup)
+        for index in range(4, len(intended), 60):
+            intended[index] = " switchport access vlan 20\n"
+        self.assertSameDiff(backup, intended)
+
+    def test_headers_and_line_terminator(self):
+        """Verify the file names, dates, context size and line terminator are handled as by `difflib`."""
+        backup, intended = ["a\n", "b\n", "c\n", "d\n"], ["a\n", "B\n", "c\n"]
+        kwargs = {"fromfile": "backup", "tofile": "intended", "fromfiledate": "today", "n": 1, "lineterm": "\n"}
+        self.assertEqual(
+            list(fast_unified_diff(backup, intended, **kwargs)), list(difflib.unified_diff(backup, intended, **kwargs))
+        )
+
+    def test_random_edits_apply(self):
+        """Verify the diff of random edits of short configurations always turns the backup into the intended."""
+        generator = random.Random(42)
+        for _ in range(500):
+            backup = [f"{generator.choice('abcdefg')}\n" for _ in range(generator.randint(0, 40))]
+            intended = list(backup)
+            for _ in range(generator.randint(0, 6)):
+                operation = generator.choice(["delete", "insert", "replace"])
+                if operation == "delete" and intended:
+                    del intended[generator.randrange(len(intended))]
+                elif operation == "insert":
+                    intended.insert(generator.randint(0, len(intended)), f"{generator.choice('abcxyz')}\n")
+                elif intended:
+                    intended[generator.randrange(len(intended))] = f"{generator.choice('xyz')}\n"
+            diff = list(fast_unified_diff(backup, intended, lineterm=""))
+            self.assertEqual(apply_unified_diff(backup, diff), intended)
+
+
+class FastUnifiedDiffLargeConfigTest(unittest.TestCase):
+    """Test the fast diff engine on configurations shaped like real ones."""
+
+    def test_scattered_changes_on_repeated_sections(self):
+        """Verify a VLAN change every ten interfaces of a switch gives the same diff as `difflib.unified_diff`."""
+        backup = access_switch_config(200)
+        intended = list(backup)
+        for index in range(4, len(intended), 60):
+            intended[index] = " switchport access vlan 20\n"
+        self.assertEqual(
+            list(fast_unified_diff(backup, intended, lineterm="")),
+            list(difflib.unified_diff(backup, intended, lineterm="")),
+        )
+
+    def test_reordered_prefix_list(self):
+        """Verify a reordered prefix-list gives a valid and small diff."""
+        backup = prefix_list_config(5000)
+        prefixes = backup[5:]
+        intended = backup[:5] + prefixes[100:] + prefixes[:100]
+        diff = list(fast_unified_diff(backup, intended, lineterm=""))
+        self.assertEqual(apply_unified_diff(backup, diff), intended)
+        self.assertLess(len(diff), 220)
+
+    def test_reordered_interface_sections(self):
+        """Verify moved interface sections give a smaller diff than `difflib.unified_diff`."""
+        sections = [access_switch_config(1)[2:] for _ in range(200)]
+        for index, section in enumerate(sections):
+            section[0] = f"interface GigabitEthernet1/0/{index}\n"
+        backup = [line for section in sections for line in section]
+        intended = [line for section in sections[25:] + sections[:25] for line in section]
+        diff = list(fast_unified_diff(backup, intended, lineterm=""))
+        self.assertEqual(apply_unified_diff(backup, diff), intended)
+        self.assertLessEqual(len(diff), len(list(difflib.unified_diff(backup, intended, lineterm=""))))
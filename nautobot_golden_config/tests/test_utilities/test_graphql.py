@@ -1,11 +1,18 @@
 """Unit tests for nautobot_golden_config utilities graphql."""
 
+import time
 from unittest import skip
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from graphene_django.settings import graphene_settings
 from nautobot.core.testing import TestCase
 from nautobot.dcim.models import Device
 
+from nautobot_golden_config.tests.conftest import create_device
+from nautobot_golden_config.utilities import graphql
 from nautobot_golden_config.utilities.graphql import graph_ql_query
 
 
@@ -26,3 +33,117 @@ class GraphQLTest(TestCase):
         self.assertEqual(result[0], 400)
         self.assertTrue(result[1]["error"])
         self.assertRegex(result[1].get("error"), r"Syntax Error GraphQL.*")
+
+
+class GraphQLDocumentCacheTest(TestCase):
+    """Test the parsed GraphQL documents are cached per worker."""
+
+    query = """
+    query ($device_id: ID!) {
+      device(id: $device_id) {
+        name
+        location { name parent { name } }
+        interfaces { name enabled ip_addresses { address } }
+        tags { name }
+      }
+    }
+    """
+
+    def setUp(self):
+        """Start every test with an empty cache."""
+        graphql._DOCUMENT_CACHE.clear()  # pylint: disable=protected-access
+        graphql.get_sot_agg_transposer.cache_clear()
+
+    @patch.object(graphql, "validate", MagicMock(return_value=[]))
+    @patch.object(graphql, "get_default_backend")
+    def test_document_parsed_once_per_query(self, mock_backend):
+        """Verify a query is parsed once for all the devices, and again when the query is edited."""
+        document_from_string = mock_backend.return_value.document_from_string
+        for _ in range(100):
+            graphql.get_document("schema", self.query, query_id="1")
+        self.assertEqual(document_from_string.call_count, 1)
+
+        graphql.get_document("schema", self.query + "\n", query_id="1")
+        self.assertEqual(document_from_string.call_count, 2)
+        self.assertEqual(len(graphql._DOCUMENT_CACHE), 1)  # pylint: disable=protected-access
+
+    @patch.dict(graphql.PLUGIN_CFG, {"sot_agg_transposer": "mypkg.transposer"})
+    @patch.object(graphql, "import_string")
+    def test_transposer_resolved_once(self, mock_import_string):
+        """Verify the transposer is imported once."""
+        for _ in range(100):
+            graphql.get_sot_agg_transposer()
+        mock_import_string.assert_called_once_with("mypkg.transposer")
+
+    def test_per_device_document_overhead(self):
+        """Benchmark the per device overhead of getting the document, which should be a fraction of parsing it."""
+        schema = graphene_settings.SCHEMA
+        iterations = 50
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            graphql._DOCUMENT_CACHE.clear()  # pylint: disable=protected-access
+            graphql.get_document(schema, self.query, query_id="1")
+        uncached = (time.perf_counter() - start) / iterations
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            graphql.get_document(schema, self.query, query_id="1")
+        cached = (time.perf_counter() - start) / iterations
+
+        self.assertLess(cached * 10, uncached)
+
+
+class GraphQLBatchTest(TestCase):
+    """Test the SoT aggregation query run for several devices at once."""
+
+    query = """
+    query ($device_id: ID!) {
+      device(id: $device_id) {
+        name
+        location { name }
+        platform { name network_driver }
+        role { name }
+      }
+    }
+    """
+
+    def setUp(self):
+        """Create the devices and a request of a superuser."""
+        super().setUp()
+        graphql._DOCUMENT_CACHE.clear()  # pylint: disable=protected-access
+        self.user.is_superuser = True
+        self.user.save()
+        self.request = RequestFactory().get("/")
+        self.request.user = self.user
+        self.devices = [create_device(name=f"batch-device-{index}") for index in range(16)]
+
+    def _count_queries(self, devices):
+        with CaptureQueriesContext(connection) as context:
+            graphql.graph_ql_query_batch(self.request, devices, self.query)
+        return len(context.captured_queries)
+
+    def test_batch_matches_per_device(self):
+        """Verify the batched output of each device is the output of the per device query."""
+        results = graphql.graph_ql_query_batch(self.request, self.devices[:4], self.query)
+        for device in self.devices[:4]:
+            self.assertEqual(results[device.pk], graph_ql_query(self.request, device, self.query))
+
+    def test_unsupported_query_falls_back(self):
+        """Verify queries which can not be rewritten are run per device."""
+        query = "query ($device_id: ID!) { device(id: $device_id) { name } location: device(id: $device_id) { id } }"
+        with patch.object(graphql, "graph_ql_query", return_value=(200, {})) as mock_graph_ql_query:
+            graphql.graph_ql_query_batch(self.request, self.devices[:3], query)
+        self.assertEqual(mock_graph_ql_query.call_count, 3)
+
+    def test_batch_query_count_is_sub_linear(self):
+        """Benchmark the amount of queries against the amount of devices, which should grow sub-linearly."""
+        small_batch_queries = self._count_queries(self.devices[:2])
+        large_batch_queries = self._count_queries(self.devices)
+        per_device_queries = 0
+        for device in self.devices[:2]:
+            with CaptureQueriesContext(connection) as context:
+                graph_ql_query(self.request, device, self.query)
+            per_device_queries += len(context.captured_queries)
+        self.assertLess(large_batch_queries, small_batch_queries * 8)
+        self.assertLess(large_batch_queries, per_device_queries * 8)
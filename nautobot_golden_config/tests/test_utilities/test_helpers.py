@@ -1,21 +1,38 @@
 """Unit tests for nautobot_golden_config utilities helpers."""
 
 import logging
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
 from unittest.mock import MagicMock, patch
 
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.template import engines
 from django.test import TestCase
+from jinja2 import FileSystemLoader
 from jinja2 import exceptions as jinja_errors
+from lxml import etree
 from nautobot.dcim.models import Device, Location, LocationType, Platform
 from nautobot.extras.models import DynamicGroup, GitRepository, GraphQLQuery, Status, Tag
 from nornir_nautobot.exceptions import NornirNautobotException
 
 from nautobot_golden_config.models import GoldenConfigSetting
 from nautobot_golden_config.tests.conftest import create_device, create_helper_repo, create_orphan_device
+from nautobot_golden_config.utilities import json_codec
 from nautobot_golden_config.utilities.helper import (
+    DjangoBytecodeCache,
+    TemplateDependencyEnvironment,
+    get_compiled_path_template,
     get_device_to_settings_map,
+    get_intended_fingerprint,
+    get_inventory_chunks,
     get_job_filter,
+    get_task_queues,
+    get_xml_config,
+    get_xml_subtree_with_full_path,
     null_to_empty,
     render_jinja_template,
 )
@@ -177,7 +194,7 @@ class HelpersTest(TestCase):  # pylint: disable=too-many-instance-attributes
 
     @patch("nautobot_golden_config.utilities.logger.NornirLogger")
     @patch("nautobot.dcim.models.Device")
-    @patch("nautobot_golden_config.utilities.helper.render_jinja2")
+    @patch("nautobot_golden_config.utilities.helper.get_compiled_path_template")
     def test_render_jinja_template_exceptions_templateerror(self, template_mock, mock_device, mock_nornir_logger):
         """Cause issue to cause TemplateError form Jinja2 Template."""
         with self.assertRaises(NornirNautobotException):
@@ -186,6 +203,16 @@ class HelpersTest(TestCase):  # pylint: disable=too-many-instance-attributes
                 render_jinja_template(mock_device, mock_nornir_logger, "template")
         mock_nornir_logger.error.assert_called_once()
 
+    @patch("nautobot.dcim.models.Device")
+    def test_render_jinja_template_compiled_once(self, mock_device):
+        """Verify a path template is compiled once, and compiled again when edited."""
+        get_compiled_path_template.cache_clear()
+        for _ in range(3):
+            render_jinja_template(mock_device, "logger", "{{ obj.name }}.cfg")
+        self.assertEqual(get_compiled_path_template.cache_info().misses, 1)
+        render_jinja_template(mock_device, "logger", "{{ obj.location.name }}/{{ obj.name }}.cfg")
+        self.assertEqual(get_compiled_path_template.cache_info().misses, 2)
+
     def test_get_backup_repository_dir_success(self):
         """Verify that we successfully look up the path from a provided repo object."""
         device = Device.objects.get(name="test_device")
@@ -296,3 +323,217 @@ class HelpersTest(TestCase):  # pylint: disable=too-many-instance-attributes
         self.assertEqual(self.device_to_settings_map[test_device.id], self.test_settings_c)
         self.assertEqual(self.device_to_settings_map[orphan_device.id], self.test_settings_b)
         self.assertEqual(get_device_to_settings_map(queryset=Device.objects.none()), {})
+
+    def test_get_inventory_chunks_disabled(self):
+        """Verify the queryset is used as is when chunking is disabled."""
+        queryset = Device.objects.all()
+        self.assertEqual(list(get_inventory_chunks(queryset, 0)), [queryset])
+        self.assertEqual(list(get_inventory_chunks(queryset, None)), [queryset])
+
+    def test_get_inventory_chunks(self):
+        """Verify the devices are split in chunks of the provided size."""
+        chunks = list(get_inventory_chunks(Device.objects.order_by("name"), 1))
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(
+            [list(chunk.values_list("name", flat=True)) for chunk in chunks], [["orphan_device"], ["test_device"]]
+        )
+
+    @patch.dict(
+        "nautobot_golden_config.utilities.helper.QUEUE_ROUTING",
+        {"backup": "io", "compliance": "cpu", "fast_lane": "interactive"},
+    )
+    def test_get_task_queues(self):
+        """Verify the configured queues are returned in order, skipping the ones not configured."""
+        self.assertEqual(get_task_queues("backup", "fast_lane"), ["io", "interactive"])
+        self.assertEqual(get_task_queues("intended", "fast_lane"), [settings.CELERY_TASK_DEFAULT_QUEUE, "interactive"])
+        self.assertEqual(get_task_queues("compliance", "compliance"), ["cpu"])
+        self.assertEqual(get_task_queues("intended"), [])
+        self.assertEqual(get_task_queues("fast_lane"), ["interactive"])
+
+    @patch.dict("nautobot_golden_config.utilities.helper.QUEUE_ROUTING", {"fast_lane": "interactive"}, clear=True)
+    def test_get_task_queues_only_fast_lane(self):
+        """Verify the default queue stays the default of the plays when only the `fast_lane` queue is configured."""
+        for workload in ["backup", "intended", "compliance"]:
+            self.assertEqual(
+                get_task_queues(workload, "fast_lane"), [settings.CELERY_TASK_DEFAULT_QUEUE, "interactive"]
+            )
+
+
+class IntendedFingerprintTest(unittest.TestCase):
+    """Test the fingerprint of the intended configuration inputs."""
+
+    def test_same_with_both_json_backends(self):
+        """Verify the floats orjson and the standard library format differently give the same fingerprint."""
+        device_data = {"mtu": 1e16, "ratio": 1e-7, "weights": [0.1, 2.5e-300, 12345678901234567.0], "name": "router1"}
+        fingerprint = get_intended_fingerprint(device_data, "commit")
+        with patch.object(json_codec, "orjson", None):
+            self.assertEqual(get_intended_fingerprint(device_data, "commit"), fingerprint)
+            stdlib_json = json_codec.dumps(device_data)
+        if json_codec.orjson is not None:
+            self.assertNotEqual(json_codec.dumps(device_data), stdlib_json)
+        self.assertNotEqual(get_intended_fingerprint(device_data, "other commit"), fingerprint)
+
+
+class TemplateCacheTest(unittest.TestCase):
+    """Test the compiled templates are shared by the devices and threads of a play."""
+
+    def setUp(self):
+        """Create two Jinja repositories with the same template names."""
+        self.paths = []
+        for hostname in ("router", "switch"):
+            tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+            self.addCleanup(tmp_dir.cleanup)
+            self._write(tmp_dir.name, "main.j2", "{% include 'base.j2' %}")
+            self._write(tmp_dir.name, "base.j2", f"hostname {hostname}-{{{{ index }}}}")
+            self.paths.append(tmp_dir.name)
+        self.jinja_env = TemplateDependencyEnvironment()
+
+    @staticmethod
+    def _write(path, name, content):
+        with open(os.path.join(path, name), "w", encoding="utf-8") as template_file:
+            template_file.write(content)
+
+    def _render(self, path, index=0):
+        # Same as the dispatcher, which sets a new loader for each device.
+        self.jinja_env.loader = FileSystemLoader(path)
+        return self.jinja_env.get_template("main.j2").render(index=index)
+
+    def test_compiled_once(self):
+        """Verify the templates are compiled once, although each device sets a new loader."""
+        with patch.object(self.jinja_env, "compile", wraps=self.jinja_env.compile) as mock_compile:
+            for index in range(5):
+                self.assertEqual(self._render(self.paths[0], index), f"hostname router-{index}")
+        self.assertEqual(mock_compile.call_count, 2)
+
+    def test_source_changed(self):
+        """Verify a template is compiled again when its file changed."""
+        self._render(self.paths[0])
+        self._write(self.paths[0], "base.j2", "hostname core-{{ index }}")
+        mtime = os.path.getmtime(os.path.join(self.paths[0], "base.j2")) + 10
+        os.utime(os.path.join(self.paths[0], "base.j2"), (mtime, mtime))
+        self.assertEqual(self._render(self.paths[0]), "hostname core-0")
+
+    def test_threads_loader(self):
+        """Verify the threads rendering from different repositories do not use each others loader."""
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda index: self._render(self.paths[index % 2], index), range(200)))
+        expected = [f"hostname {('router', 'switch')[index % 2]}-{index}" for index in range(200)]
+        self.assertEqual(results, expected)
+
+    @patch("nautobot_golden_config.utilities.helper.cache")
+    def test_django_bytecode_cache(self, mock_cache):
+        """Verify a template compiled by a worker is loaded compiled by the others."""
+        stored = {}
+        mock_cache.get.side_effect = stored.get
+        mock_cache.set.side_effect = lambda key, value, timeout: stored.update({key: value})
+        self.jinja_env = TemplateDependencyEnvironment(bytecode_cache=DjangoBytecodeCache(60))
+        self._render(self.paths[0])
+        self.assertEqual(len(stored), 2)
+
+        self.jinja_env = TemplateDependencyEnvironment(bytecode_cache=DjangoBytecodeCache(60))
+        with patch.object(self.jinja_env, "compile", wraps=self.jinja_env.compile) as mock_compile:
+            self.assertEqual(self._render(self.paths[0]), "hostname router-0")
+        mock_compile.assert_not_called()
+
+
+def _get_xml_subtree_per_match(config_xml, match_config):
+    """Reference extraction, copying the ancestors of each matched element into their own parent chain."""
+    new_root = etree.Element(config_xml.tag)
+    for element in config_xml.xpath(match_config):
+        current_element = new_root
+        for parent in reversed(list(element.iterancestors())):
+            if parent is config_xml:
+                continue
+            copied_parent = deepcopy(parent)
+            copied_parent[:] = []
+            current_element.append(copied_parent)
+            current_element = copied_parent
+        current_element.append(deepcopy(element))
+    return etree.tostring(new_root, encoding="unicode", pretty_print=True)
+
+
+def _openconfig_interfaces(count):
+    """Return a NETCONF reply with the OpenConfig configuration of interfaces and of the system."""
+    interfaces = "".join(
+        f"<interface><name>Ethernet{index}</name><config><name>Ethernet{index}</name><mtu>9000</mtu>"
+        f"<description>port {index}</description></config><subinterfaces><subinterface><index>0</index><ipv4>"
+        f"<addresses><address><ip>10.{index // 250}.{index % 250}.1</ip></address></addresses></ipv4>"
+        "</subinterface></subinterfaces></interface>"
+        for index in range(count)
+    )
+    return (
+        '<data xmlns:nc="urn:ietf:params:xml:ns:netconf:base:1.0">'
+        f'<interfaces xmlns="http://openconfig.net/yang/interfaces">{interfaces}</interfaces>'
+        '<system xmlns="http://openconfig.net/yang/system"><config><hostname>router1</hostname></config></system>'
+        "</data>"
+    )
+
+
+class XmlSubtreeTest(unittest.TestCase):
+    """Test the extraction of the elements matched by the XPath of XML compliance rules."""
+
+    MTU_XPATH = "//*[local-name()='interface']/*[local-name()='config']/*[local-name()='mtu']"
+
+    def test_single_match_unchanged(self):
+        """Verify the subtree of a single match is the same as with a parent chain per match."""
+        config_xml = get_xml_config(_openconfig_interfaces(3))
+        for match_config in ["/data/*[local-name()='system']", "//*[local-name()='interface'][2]", "/*"]:
+            self.assertEqual(
+                get_xml_subtree_with_full_path(config_xml, match_config),
+                _get_xml_subtree_per_match(config_xml, match_config),
+            )
+
+    def test_matches_share_their_ancestors(self):
+        """Verify the ancestors of the matched elements are created once, and merged in document order."""
+        config_xml = get_xml_config(_openconfig_interfaces(3))
+        subtree = etree.fromstring(get_xml_subtree_with_full_path(config_xml, self.MTU_XPATH))
+        self.assertEqual(len(subtree), 1)
+        self.assertEqual(len(subtree[0]), 3)
+        self.assertEqual([mtu.text for mtu in subtree.iter("{*}mtu")], ["9000"] * 3)
+        self.assertEqual(len(subtree.xpath("//*[local-name()='name']")), 0)
+
+    def test_nested_matches_copied_once(self):
+        """Verify an element below another matched element is only part of the copy of that element."""
+        config_xml = get_xml_config(_openconfig_interfaces(2))
+        match_config = "//*[local-name()='interface'] | //*[local-name()='description']"
+        subtree = etree.fromstring(get_xml_subtree_with_full_path(config_xml, match_config))
+        self.assertEqual(len(subtree.xpath("//*[local-name()='interface']")), 2)
+        self.assertEqual(len(subtree.xpath("//*[local-name()='description']")), 2)
+
+    def test_namespaces_and_attributes(self):
+        """Verify the created ancestors keep their namespaces and attributes."""
+        config_xml = get_xml_config(
+            '<r xmlns:a="urn:a" xmlns:b="urn:b"><a:x b:k="1" c="2"><b:y>1</b:y><b:y>2</b:y></a:x></r>'
+        )
+        self.assertEqual(
+            get_xml_subtree_with_full_path(config_xml, "//*[local-name()='y']"),
+            '<r>\n  <a:x xmlns:a="urn:a" xmlns:b="urn:b" b:k="1" c="2">\n    <b:y>1</b:y>\n    <b:y>2</b:y>\n'
+            "  </a:x>\n</r>\n",
+        )
+
+    def test_invalid_xpath(self):
+        """Verify an invalid XPath raises an XPathError, as the compliance play expects."""
+        with self.assertRaises(etree.XPathError):
+            get_xml_subtree_with_full_path(get_xml_config("<r/>"), "//[")
+
+    def test_ancestor_namespaces(self):
+        """Verify the created ancestors declare the same namespaces as with a parent chain per match."""
+        match_config = "//*[local-name()='s']"
+        for config in [
+            '<r><p xmlns:u="urn:u" xmlns:v="urn:v"><q><v:s/></q></p></r>',
+            '<r xmlns="urn:d"><p xmlns:u="urn:u"><q u:a="1">x<s/></q></p></r>',
+            '<a:r xmlns:a="urn:a"><a:p xmlns:b="urn:b"><b:q xmlns="urn:c"><s>t</s></b:q></a:p></a:r>',
+            '<r xmlns:a="urn:a" xmlns:b="urn:b"><p a:k="1"><!-- c --><a:s/><b:t/></p></r>',
+        ]:
+            config_xml = get_xml_config(config)
+            self.assertEqual(
+                get_xml_subtree_with_full_path(config_xml, match_config),
+                _get_xml_subtree_per_match(config_xml, match_config),
+            )
+
+    def test_many_matches(self):
+        """Verify the extraction of many interfaces of a large NETCONF payload is smaller than per match."""
+        config_xml = get_xml_config(_openconfig_interfaces(50))
+        subtree = get_xml_subtree_with_full_path(config_xml, self.MTU_XPATH)
+        self.assertLess(len(subtree), len(_get_xml_subtree_per_match(config_xml, self.MTU_XPATH)))
+        self.assertEqual(len(etree.fromstring(subtree).xpath(self.MTU_XPATH)), 50)
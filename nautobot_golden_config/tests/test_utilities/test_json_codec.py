@@ -0,0 +1,63 @@
+"""Unit tests for nautobot_golden_config utilities json_codec."""
+
+import unittest
+from collections import OrderedDict
+from datetime import datetime
+from unittest.mock import patch
+
+from nautobot_golden_config.utilities import json_codec
+
+
+class JsonCodecTest(unittest.TestCase):
+    """Test the JSON codec gives the same results with and without orjson."""
+
+    def _backends(self):
+        """Yield once with the installed backend, and once with the standard library."""
+        yield
+        with patch.object(json_codec, "orjson", None):
+            yield
+
+    def test_dumps(self):
+        """Verify values are serialized to the same compact or indented JSON."""
+        value = OrderedDict(b=[1, 2.5, "é", None, True], a=(1,), c={1: "one"})
+        for _ in self._backends():
+            self.assertEqual(json_codec.dumps(value), '{"b":[1,2.5,"é",null,true],"a":[1],"c":{"1":"one"}}')
+            self.assertEqual(
+                json_codec.dumps(value, sort_keys=True), '{"a":[1],"b":[1,2.5,"é",null,true],"c":{"1":"one"}}'
+            )
+            self.assertEqual(json_codec.dumps({"a": [1]}, indent=2), '{\n  "a": [\n    1\n  ]\n}')
+            self.assertEqual(json_codec.dumps({"a": 1}, indent=4), '{\n    "a": 1\n}')
+
+    def test_dumps_non_finite(self):
+        """Verify NaN and infinities are serialized as null, and circular references still raise ValueError."""
+        value = {"a": [float("nan"), 1.5], "b": (float("inf"), {"c": float("-inf")})}
+        circular = [float("nan")]
+        circular.append(circular)
+        for _ in self._backends():
+            self.assertEqual(json_codec.dumps(value), '{"a":[null,1.5],"b":[null,{"c":null}]}')
+            with self.assertRaises(ValueError):
+                json_codec.dumps(circular)
+
+    def test_dumps_default(self):
+        """Verify the values the standard library does not serialize are given to `default`, or raise TypeError."""
+        value = {"date": datetime(2024, 1, 1, 12, 30), "big": 2**70}
+        for _ in self._backends():
+            self.assertEqual(json_codec.dumps(value, default=str), f'{{"date":"2024-01-01 12:30:00","big":{2**70}}}')
+            with self.assertRaises(TypeError):
+                json_codec.dumps(value)
+
+    def test_loads(self):
+        """Verify JSON text and bytes are parsed, including what only the standard library accepts."""
+        for _ in self._backends():
+            self.assertEqual(json_codec.loads('{"a": [1, "é", null]}'), {"a": [1, "é", None]})
+            self.assertEqual(json_codec.loads(b'{"a": 1}'), {"a": 1})
+            self.assertEqual(json_codec.loads('{"a": Infinity}'), {"a": float("inf")})
+            with self.assertRaises(json_codec.JSONDecodeError):
+                json_codec.loads("not json")
+
+    def test_is_jsonable(self):
+        """Verify the values the standard library can serialize are jsonable."""
+        for _ in self._backends():
+            self.assertTrue(json_codec.is_jsonable({"a": [1, None], "b": OrderedDict(c=2**70)}))
+            self.assertFalse(json_codec.is_jsonable({"a": {1, 2}}))
+            self.assertFalse(json_codec.is_jsonable({"a": datetime(2024, 1, 1)}))
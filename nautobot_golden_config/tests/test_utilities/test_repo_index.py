@@ -0,0 +1,88 @@
+"""Unit tests for nautobot_golden_config utilities repo_index."""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from git import Actor, Repo
+
+from nautobot_golden_config.utilities.repo_index import (
+    build_repository_index,
+    get_repository_index,
+    writing_repository_files,
+)
+
+
+class RepositoryIndexTest(unittest.TestCase):
+    """Test the index of the files of a backup repository."""
+
+    def setUp(self):
+        """Create a local repository with committed backups."""
+        tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = tmp_dir.name
+        self.repo = Repo.init(self.path)
+        self._write("dc1/router1.cfg", "hostname router1\n")
+        self._write("dc2/router2.cfg", "hostname router2\n")
+        self._commit()
+        self.repository_record = MagicMock(pk="backup-repo", filesystem_path=self.path)
+
+    def _write(self, name, content):
+        os.makedirs(os.path.dirname(os.path.join(self.path, name)), exist_ok=True)
+        with open(os.path.join(self.path, name), "w", encoding="utf-8") as config_file:
+            config_file.write(content)
+
+    def _commit(self):
+        self.repo.git.add(A=True)
+        author = Actor("Golden Config", "golden-config@example.com")
+        return self.repo.index.commit("Backups", author=author, committer=author).hexsha
+
+    def test_build_repository_index(self):
+        """Verify the committed files are indexed with their size and blob SHA, and the git directory is not."""
+        index = build_repository_index(self.path)
+        self.assertEqual(index["commit"], self.repo.head.commit.hexsha)
+        self.assertEqual(set(index["files"]), {"dc1/router1.cfg", "dc2/router2.cfg"})
+        size, blob_sha, _ = index["files"]["dc1/router1.cfg"]
+        self.assertEqual(size, len("hostname router1\n"))
+        self.assertEqual(blob_sha, self.repo.head.commit.tree["dc1/router1.cfg"].hexsha)
+
+    def test_build_repository_index_uncommitted(self):
+        """Verify the uncommitted files are indexed without blob SHA."""
+        self._write("dc1/router1.cfg", "hostname router1-new\n")
+        self._write("dc3/router3.cfg", "hostname router3\n")
+        index = build_repository_index(self.path)
+        self.assertIsNone(index["files"]["dc1/router1.cfg"][1])
+        self.assertIsNone(index["files"]["dc3/router3.cfg"][1])
+        self.assertIsNotNone(index["files"]["dc2/router2.cfg"][1])
+
+    @patch("nautobot_golden_config.utilities.repo_index.cache")
+    def test_get_repository_index(self, mock_cache):
+        """Verify the cached index is used at the same commit, and built again after a new commit."""
+        mock_cache.get.return_value = build_repository_index(self.path)
+        self.assertEqual(get_repository_index(self.repository_record), mock_cache.get.return_value)
+        mock_cache.set.assert_not_called()
+
+        self._write("dc3/router3.cfg", "hostname router3\n")
+        self._commit()
+        index = get_repository_index(self.repository_record)
+        self.assertIn("dc3/router3.cfg", index["files"])
+        mock_cache.set.assert_called_once_with("nautobot_golden_config.repo_index.backup-repo", index, timeout=None)
+
+    @patch("nautobot_golden_config.utilities.repo_index.Repo.is_dirty")
+    @patch("nautobot_golden_config.utilities.repo_index.cache")
+    def test_get_repository_index_uncommitted(self, mock_cache, mock_is_dirty):
+        """Verify the working tree is not checked on lookup, the index is invalidated where the files are written."""
+        mock_cache.get.return_value = build_repository_index(self.path)
+        self._write("dc3/router3.cfg", "hostname router3\n")
+        self.assertEqual(get_repository_index(self.repository_record), mock_cache.get.return_value)
+        mock_is_dirty.assert_not_called()
+
+        settings = MagicMock(backup_repository=self.repository_record)
+        with writing_repository_files({"device1": settings, "device2": settings}, "backup_repository"):
+            mock_cache.delete_many.assert_called_once_with({"nautobot_golden_config.repo_index.backup-repo"})
+        self.assertEqual(mock_cache.delete_many.call_count, 2)
+
+    def test_get_repository_index_not_a_repository(self):
+        """Verify no index is returned for a path that is not a git repository."""
+        self.assertIsNone(get_repository_index(MagicMock(filesystem_path=os.path.join(self.path, "missing"))))
@@ -0,0 +1,136 @@
+"""Unit tests for nautobot_golden_config utilities rule_compliance."""
+
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase
+
+from nautobot_golden_config.models import ConfigCompliance, GoldenConfig
+from nautobot_golden_config.tests.conftest import create_config_compliance, create_device, create_feature_rule_json
+from nautobot_golden_config.utilities.rule_compliance import (
+    ComplianceBatcher,
+    recompute_device_compliance,
+    recompute_platform_compliance,
+    recompute_rule_compliance,
+)
+
+
+class RecomputeRuleComplianceTest(TestCase):
+    """Test the compliance recomputed from the stored configurations when a rule changes."""
+
+    def setUp(self):
+        """Setup devices with stored configurations and a JSON rule."""
+        self.device1 = create_device(name="router1")
+        self.device2 = create_device(name="router2")
+        self.rule = create_feature_rule_json(self.device1)
+        self.rule.match_config = "ntp"
+        self.rule.save()
+        GoldenConfig.objects.update_or_create(
+            device=self.device1,
+            defaults={
+                "backup_config": json.dumps({"ntp": ["10.0.0.1"], "snmp": "public"}),
+                "intended_config": json.dumps({"ntp": ["10.0.0.1"], "snmp": "private"}),
+            },
+        )
+        GoldenConfig.objects.update_or_create(
+            device=self.device2,
+            defaults={
+                "backup_config": json.dumps({"ntp": ["10.0.0.1"], "snmp": "public"}),
+                "intended_config": json.dumps({"ntp": ["10.0.0.2"], "snmp": "public"}),
+            },
+        )
+
+    def test_recompute_rule_compliance_creates_and_updates(self):
+        """Verify the results are created or updated in bulk, for all the devices of the platform."""
+        create_config_compliance(self.device1, compliance_rule=self.rule, actual={}, intended={"ntp": ["old"]})
+        self.assertEqual(recompute_rule_compliance(self.rule, MagicMock()), (2, 0))
+        self.assertEqual(ConfigCompliance.objects.filter(rule=self.rule).count(), 2)
+        compliance1 = ConfigCompliance.objects.get(rule=self.rule, device=self.device1)
+        self.assertTrue(compliance1.compliance)
+        self.assertEqual(compliance1.intended, {"ntp": ["10.0.0.1"]})
+        compliance2 = ConfigCompliance.objects.get(rule=self.rule, device=self.device2)
+        self.assertFalse(compliance2.compliance)
+        self.assertEqual(compliance2.intended, {"ntp": ["10.0.0.2"]})
+
+    def test_recompute_rule_compliance_after_rule_change(self):
+        """Verify a changed rule is applied to the stored configurations."""
+        recompute_rule_compliance(self.rule, MagicMock())
+        self.rule.match_config = "snmp"
+        self.rule.save()
+        recompute_rule_compliance(self.rule, MagicMock())
+        self.assertFalse(ConfigCompliance.objects.get(rule=self.rule, device=self.device1).compliance)
+        self.assertTrue(ConfigCompliance.objects.get(rule=self.rule, device=self.device2).compliance)
+
+    def test_recompute_rule_compliance_skips_missing_configs(self):
+        """Verify devices without a stored configuration are skipped, and invalid configurations counted as failed."""
+        GoldenConfig.objects.filter(device=self.device1).update(intended_config="")
+        GoldenConfig.objects.filter(device=self.device2).update(backup_config="not json")
+        logger = MagicMock()
+        self.assertEqual(recompute_rule_compliance(self.rule, logger), (0, 1))
+        self.assertFalse(ConfigCompliance.objects.filter(rule=self.rule).exists())
+        logger.warning.assert_called_once()
+
+    def test_recompute_rule_compliance_batch(self):
+        """Verify a custom rule is given to the batch function for all the devices, and one by one when that fails."""
+
+        def compliance_batch(objs):
+            if any(obj.device == self.device2 for obj in objs):
+                raise ValueError("Unable to parse.")
+            return [
+                {"compliance": True, "compliance_int": 1, "ordered": True, "missing": "", "extra": ""} for _ in objs
+            ]
+
+        self.rule.custom_compliance = True
+        self.rule.save()
+        mock_batch = MagicMock(side_effect=compliance_batch)
+        with patch.dict("nautobot_golden_config.models.BATCH_FUNC_MAPPER", {"custom": mock_batch}):
+            self.assertEqual(recompute_rule_compliance(self.rule, MagicMock()), (1, 1))
+        self.assertEqual(mock_batch.call_count, 3)
+        self.assertEqual(len(mock_batch.call_args_list[0].kwargs["objs"]), 2)
+        self.assertTrue(ConfigCompliance.objects.get(rule=self.rule, device=self.device1).compliance)
+        self.assertFalse(ConfigCompliance.objects.filter(rule=self.rule, device=self.device2).exists())
+
+    def test_recompute_platform_compliance(self):
+        """Verify all the rules of a platform are recomputed."""
+        recompute_platform_compliance(platform_pk=self.device1.platform.pk, logger=MagicMock())
+        self.assertEqual(ConfigCompliance.objects.filter(rule=self.rule).count(), 2)
+        recompute_platform_compliance(rule_pks=[], logger=MagicMock())
+        self.assertEqual(ConfigCompliance.objects.filter(rule=self.rule).count(), 2)
+
+    def test_recompute_device_compliance(self):
+        """Verify all the rules of the devices are recomputed, and the full diff stored on their Golden Config."""
+        GoldenConfig.objects.filter(device=self.device1).update(compliance_fingerprint="stale")
+        self.assertEqual(recompute_device_compliance([self.device1.pk], MagicMock()), (1, 0))
+        self.assertTrue(ConfigCompliance.objects.get(rule=self.rule, device=self.device1).compliance)
+        self.assertFalse(ConfigCompliance.objects.filter(device=self.device2).exists())
+        golden_config = GoldenConfig.objects.get(device=self.device1)
+        self.assertIn('+{"ntp": ["10.0.0.1"], "snmp": "private"}', golden_config.compliance_config)
+        self.assertIsNotNone(golden_config.compliance_last_success_date)
+        self.assertEqual(golden_config.compliance_fingerprint, "")
+
+
+@patch("nautobot_golden_config.utilities.rule_compliance.apply_compliance_task")
+class ComplianceBatcherTest(unittest.TestCase):
+    """Test the coalescing of the devices whose backup changed into compliance tasks."""
+
+    def test_add_enqueues_full_batches(self, mock_apply):
+        """Verify a task is enqueued each time the pending devices fill a batch."""
+        batcher = ComplianceBatcher(batch_size=2)
+        for device_pk in ["a", "b", "c"]:
+            batcher.add(device_pk)
+        mock_apply.assert_called_once()
+        self.assertEqual(mock_apply.call_args.kwargs["device_pks"], ["a", "b"])
+        self.assertEqual(batcher.enqueued, 2)
+
+    def test_flush_enqueues_remaining_devices(self, mock_apply):
+        """Verify the remaining devices are enqueued at the end of the play, and nothing when there are none."""
+        batcher = ComplianceBatcher(batch_size=2)
+        batcher.flush()
+        mock_apply.assert_not_called()
+        for device_pk in ["a", "b", "c"]:
+            batcher.add(device_pk)
+        batcher.flush()
+        self.assertEqual(mock_apply.call_count, 2)
+        self.assertEqual(mock_apply.call_args.kwargs["device_pks"], ["c"])
+        self.assertEqual(batcher.enqueued, 3)
@@ -0,0 +1,40 @@
+"""Unit tests for nautobot_golden_config utilities scheduling."""
+
+import unittest
+
+from django.test import TestCase
+from nautobot.dcim.models import Device
+
+from nautobot_golden_config.models import GoldenConfig
+from nautobot_golden_config.tests.conftest import create_device
+from nautobot_golden_config.utilities.scheduling import estimate_makespan, order_by_duration
+
+
+class EstimateMakespanTest(unittest.TestCase):
+    """Test the makespan estimate of an ordering."""
+
+    def test_estimate_makespan_longest_first(self):
+        """Verify a long task started last is a straggler, and started first is not."""
+        durations = [1.0] * 8 + [8.0]
+        self.assertEqual(estimate_makespan(durations, 2), 12.0)
+        self.assertEqual(estimate_makespan(sorted(durations, reverse=True), 2), 8.0)
+
+    def test_estimate_makespan_fewer_tasks_than_workers(self):
+        """Verify the makespan is the longest task when every task gets its own worker."""
+        self.assertEqual(estimate_makespan([3.0, 1.0, 2.0], 20), 3.0)
+        self.assertEqual(estimate_makespan([], 20), 0.0)
+
+
+class OrderByDurationTest(TestCase):
+    """Test the devices are ordered longest job first."""
+
+    def test_order_by_duration(self):
+        """Verify devices without a recorded duration come first, then by descending duration, then by name."""
+        names = []
+        for name, duration in [("short", 1.0), ("long-b", 5.0), ("never-run", None), ("long-a", 5.0)]:
+            GoldenConfig.objects.update_or_create(
+                device=create_device(name=name), defaults={"backup_last_duration": duration}
+            )
+            names.append(name)
+        ordered_qs = order_by_duration(Device.objects.filter(name__in=names), "backup_last_duration")
+        self.assertEqual(list(ordered_qs.values_list("name", flat=True)), ["never-run", "long-a", "long-b", "short"])
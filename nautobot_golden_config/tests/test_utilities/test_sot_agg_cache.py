@@ -0,0 +1,123 @@
+"""Unit tests for nautobot_golden_config utilities sot_agg_cache."""
+
+from unittest.mock import MagicMock, patch
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.test import TestCase
+from nautobot.dcim.models import Interface
+from nautobot.extras.choices import JobResultStatusChoices
+from nautobot.extras.models import ConfigContext, Job, JobResult, Status
+from nautobot.ipam.models import IPAddress, IPAddressToInterface, Namespace, Prefix
+
+from nautobot_golden_config.tests.conftest import create_device, create_orphan_device
+from nautobot_golden_config.utilities import graphql
+
+QUERY = "query ($device_id: ID!) { device(id: $device_id) { name } }"
+
+
+@patch("nautobot_golden_config.utilities.sot_agg_cache.SOT_AGG_CACHE_TIMEOUT", 300)
+@patch.object(graphql, "_graph_ql_query", return_value=(200, {"name": "foobaz"}))
+class SotAggCacheTest(TestCase):
+    """Test the SoT aggregation results are cached until the data of the device changes."""
+
+    def setUp(self):
+        """Setup a device and a request, on an empty cache."""
+        cache.clear()
+        self.device = create_device(name="foobaz")
+        self.request = MagicMock()
+        self.request.user.pk = 1
+
+    def test_result_cached(self, mock_graph_ql_query):
+        """Verify the query is run once for repeated requests."""
+        for _ in range(3):
+            self.assertEqual(graphql.graph_ql_query(self.request, self.device, QUERY), (200, {"name": "foobaz"}))
+        self.assertEqual(mock_graph_ql_query.call_count, 1)
+
+    def test_result_cached_per_user(self, mock_graph_ql_query):
+        """Verify the results of a user are not returned to another user."""
+        graphql.graph_ql_query(self.request, self.device, QUERY)
+        self.request.user.pk = 2
+        graphql.graph_ql_query(self.request, self.device, QUERY)
+        self.assertEqual(mock_graph_ql_query.call_count, 2)
+
+    def test_failed_result_not_cached(self, mock_graph_ql_query):
+        """Verify failed queries are run again."""
+        mock_graph_ql_query.return_value = (400, {"error": "foo"})
+        graphql.graph_ql_query(self.request, self.device, QUERY)
+        graphql.graph_ql_query(self.request, self.device, QUERY)
+        self.assertEqual(mock_graph_ql_query.call_count, 2)
+
+    def test_device_change_invalidates(self, mock_graph_ql_query):
+        """Verify a change of the device invalidates its cached result."""
+        graphql.graph_ql_query(self.request, self.device, QUERY)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.device.serial = "123"
+            self.device.save()
+        graphql.graph_ql_query(self.request, self.device, QUERY)
+        self.assertEqual(mock_graph_ql_query.call_count, 2)
+
+    def test_config_context_change_invalidates(self, mock_graph_ql_query):
+        """Verify a change of a config context invalidates all the cached results."""
+        graphql.graph_ql_query(self.request, self.device, QUERY)
+        with self.captureOnCommitCallbacks(execute=True):
+            ConfigContext.objects.create(name="foo", data={"foo": "bar"})
+        graphql.graph_ql_query(self.request, self.device, QUERY)
+        self.assertEqual(mock_graph_ql_query.call_count, 2)
+
+    def _create_interface(self, device, name="eth0"):
+        status, _ = Status.objects.get_or_create(name="Active")
+        status.content_types.add(ContentType.objects.get_for_model(Interface))
+        return Interface.objects.create(device=device, name=name, type="virtual", status=status)
+
+    def test_interface_move_invalidates_both(self, mock_graph_ql_query):
+        """Verify moving an interface to another device invalidates the cached results of both devices."""
+        other_device = create_orphan_device(name="foobar")
+        interface = self._create_interface(other_device)
+        graphql.graph_ql_query(self.request, self.device, QUERY)
+        graphql.graph_ql_query(self.request, other_device, QUERY)
+        with self.captureOnCommitCallbacks(execute=True):
+            interface.device = self.device
+            interface.save()
+        graphql.graph_ql_query(self.request, self.device, QUERY)
+        graphql.graph_ql_query(self.request, other_device, QUERY)
+        self.assertEqual(mock_graph_ql_query.call_count, 4)
+
+    def test_ip_assignment_move_invalidates_both(self, mock_graph_ql_query):
+        """Verify moving an IP address assignment to another device invalidates the cached results of both devices."""
+        other_device = create_orphan_device(name="foobar")
+        interface = self._create_interface(self.device)
+        other_interface = self._create_interface(other_device)
+        status = Status.objects.get(name="Active")
+        for model in (Prefix, IPAddress):
+            status.content_types.add(ContentType.objects.get_for_model(model))
+        namespace = Namespace.objects.get(name="Global")
+        Prefix.objects.create(prefix="10.0.0.0/24", namespace=namespace, status=status)
+        ip_address = IPAddress.objects.create(address="10.0.0.1/24", namespace=namespace, status=status)
+        assignment = IPAddressToInterface.objects.create(ip_address=ip_address, interface=interface)
+        graphql.graph_ql_query(self.request, self.device, QUERY)
+        graphql.graph_ql_query(self.request, other_device, QUERY)
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment.interface = other_interface
+            assignment.save()
+        graphql.graph_ql_query(self.request, self.device, QUERY)
+        graphql.graph_ql_query(self.request, other_device, QUERY)
+        self.assertEqual(mock_graph_ql_query.call_count, 4)
+
+    def test_bulk_edit_invalidates(self, mock_graph_ql_query):
+        """Verify a finished bulk edit job invalidates all the cached results, other jobs do not."""
+        job_result = JobResult.objects.create(
+            name="Bulk Edit Objects",
+            job_model=Job.objects.get(module_name="nautobot.core.jobs.bulk_actions", job_class_name="BulkEditObjects"),
+        )
+        graphql.graph_ql_query(self.request, self.device, QUERY)
+        with self.captureOnCommitCallbacks(execute=True):
+            job_result.status = JobResultStatusChoices.STATUS_STARTED
+            job_result.save()
+        graphql.graph_ql_query(self.request, self.device, QUERY)
+        self.assertEqual(mock_graph_ql_query.call_count, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            job_result.status = JobResultStatusChoices.STATUS_SUCCESS
+            job_result.save()
+        graphql.graph_ql_query(self.request, self.device, QUERY)
+        self.assertEqual(mock_graph_ql_query.call_count, 2)
@@ -0,0 +1,81 @@
+"""Unit tests for the Jinja template dependencies of the intended configurations."""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from git import Actor, Repo
+from jinja2 import FileSystemLoader
+
+from nautobot_golden_config.utilities.git import get_changed_files
+from nautobot_golden_config.utilities.helper import TemplateDependencyEnvironment, jinja_dependencies_unchanged
+
+TEMPLATES = {
+    "arista_eos.j2": "{% include 'arista/base.j2' %}\n",
+    "arista/base.j2": "hostname {{ hostname }}\n{% include 'arista/snmp.j2' %}\n{% include 'common.j2' %}\n",
+    "arista/snmp.j2": "snmp-server community public ro\n",
+    "cisco_ios.j2": "hostname {{ hostname }}\n{% include 'common.j2' %}\n",
+    "common.j2": "ntp server 10.0.0.1\n",
+}
+
+
+class TemplateDependenciesTest(unittest.TestCase):
+    """Test the templates loaded by each rendering are tracked across the commits of a local repository."""
+
+    def setUp(self):
+        """Create a local Jinja repository with nested includes."""
+        self.tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = self.tmp_dir.name
+        self.repo = Repo.init(self.path)
+        for name, content in TEMPLATES.items():
+            self._write(name, content)
+        self.first_commit = self._commit("Initial templates")
+        self.jinja_env = TemplateDependencyEnvironment(loader=FileSystemLoader(self.path))
+
+    def _write(self, name, content):
+        os.makedirs(os.path.dirname(os.path.join(self.path, name)), exist_ok=True)
+        with open(os.path.join(self.path, name), "w", encoding="utf-8") as template_file:
+            template_file.write(content)
+
+    def _commit(self, message):
+        self.repo.git.add(A=True)
+        author = Actor("Golden Config", "golden-config@example.com")
+        return self.repo.index.commit(message, author=author, committer=author).hexsha
+
+    def _render(self, template):
+        with self.jinja_env.record_loaded_templates() as loaded_templates:
+            self.jinja_env.get_template(template).render(hostname="router1")
+        return MagicMock(intended_template_deps=sorted(loaded_templates), intended_jinja_commit=self.first_commit)
+
+    def test_nested_includes_recorded(self):
+        """Verify the nested includes are recorded, including the templates already loaded by the environment."""
+        golden_config = self._render("arista_eos.j2")
+        self.assertEqual(
+            golden_config.intended_template_deps, ["arista/base.j2", "arista/snmp.j2", "arista_eos.j2", "common.j2"]
+        )
+        self.assertEqual(self._render("arista_eos.j2").intended_template_deps, golden_config.intended_template_deps)
+        self.assertEqual(self._render("cisco_ios.j2").intended_template_deps, ["cisco_ios.j2", "common.j2"])
+
+    def test_only_affected_devices_changed(self):
+        """Verify only the devices including a changed template are flagged for rendering."""
+        arista = self._render("arista_eos.j2")
+        cisco = self._render("cisco_ios.j2")
+        self._write("arista/snmp.j2", "snmp-server community private ro\n")
+        second_commit = self._commit("Change the SNMP community")
+
+        self.assertEqual(get_changed_files(self.path, self.first_commit, second_commit), frozenset({"arista/snmp.j2"}))
+        self.assertFalse(jinja_dependencies_unchanged(arista, self.path, second_commit))
+        self.assertTrue(jinja_dependencies_unchanged(cisco, self.path, second_commit))
+
+    def test_unknown_dependencies_changed(self):
+        """Verify devices are flagged for rendering when their dependencies or the commits are unknown."""
+        cisco = self._render("cisco_ios.j2")
+        self.assertTrue(jinja_dependencies_unchanged(cisco, self.path, self.first_commit))
+        self.assertFalse(jinja_dependencies_unchanged(cisco, self.path, "0" * 40))
+        cisco.intended_template_deps = []
+        self._write("README.md", "Templates\n")
+        self.assertFalse(jinja_dependencies_unchanged(cisco, self.path, self._commit("Add a README")))
+        cisco.intended_jinja_commit = ""
+        self.assertFalse(jinja_dependencies_unchanged(cisco, self.path, self.first_commit))
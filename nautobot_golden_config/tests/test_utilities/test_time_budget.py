@@ -0,0 +1,129 @@
+"""Unit tests for nautobot_golden_config utilities time budget."""
+
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from nornir.core.inventory import ConnectionOptions, Host
+from nornir_nautobot.exceptions import NornirNautobotException
+
+from nautobot_golden_config.utilities.time_budget import (
+    DeviceBudget,
+    TimeBudget,
+    bound_connection_timeouts,
+    run_within_budget,
+    write_within_budget,
+)
+
+
+@patch("nautobot_golden_config.utilities.time_budget.GoldenConfig")
+class RunWithinBudgetTest(unittest.TestCase):
+    """Test the deadline and the device time budget of a play task."""
+
+    def setUp(self):
+        """Setup a Nornir task on a host and a mock logger."""
+        self.task = MagicMock(host=Host(name="router1", data={"obj": "router1"}))
+        self.logger = MagicMock()
+
+    def test_no_budget(self, mock_golden_config):
+        """Verify the play task is run as is without a budget."""
+        stage_task = MagicMock(return_value="foo")
+        result = run_within_budget(self.task, stage_task, "backup", TimeBudget(), self.logger, rules={})
+        self.assertEqual(result, "foo")
+        self.assertIsNone(stage_task.call_args.kwargs["device_budget"].timeout)
+        self.assertEqual(self.task.host.connection_options, {})
+        mock_golden_config.objects.update_or_create.assert_not_called()
+
+    def test_deadline_reached(self, mock_golden_config):
+        """Verify the device is skipped, without failing, once the deadline is reached."""
+        stage_task = MagicMock()
+        time_budget = TimeBudget(deadline=time.time() - 1)
+        result = run_within_budget(self.task, stage_task, "backup", time_budget, self.logger)
+        self.assertFalse(result.failed)
+        self.assertEqual(time_budget.skipped, 1)
+        stage_task.assert_not_called()
+        mock_golden_config.objects.update_or_create.assert_not_called()
+
+    def test_device_budget_bounds_connections(self, mock_golden_config):
+        """Verify the connections of the device are bounded by its time budget."""
+        stage_task = MagicMock(return_value="foo")
+        run_within_budget(self.task, stage_task, "backup", TimeBudget(device_budget=30), self.logger)
+        self.assertEqual(stage_task.call_args.kwargs["device_budget"].timeout, 30)
+        self.assertEqual(self.task.host.connection_options["napalm"].extras, {"timeout": 30})
+        self.assertEqual(self.task.host.connection_options["scrapli"].extras["timeout_ops"], 30)
+        mock_golden_config.objects.update_or_create.assert_not_called()
+
+    def test_device_budget_exceeded(self, mock_golden_config):
+        """Verify a device whose connection failed past its budget is marked as timed out."""
+
+        def stage_task(task, logger, device_budget):  # pylint: disable=unused-argument
+            device_budget.deadline = time.monotonic()
+            raise OSError("Socket timed out")
+
+        with self.assertRaises(NornirNautobotException) as error:
+            run_within_budget(self.task, stage_task, "compliance", TimeBudget(device_budget=5), self.logger)
+        self.assertTrue(str(error.exception).startswith("`E3033:`"))
+        mock_golden_config.objects.update_or_create.assert_called_once_with(
+            device="router1", defaults={"compliance_timed_out": True}
+        )
+
+    def test_device_budget_error(self, mock_golden_config):
+        """Verify an error of the play task within its budget is raised as is."""
+        stage_task = MagicMock(side_effect=ValueError("foo"))
+        with self.assertRaises(ValueError):
+            run_within_budget(self.task, stage_task, "intended", TimeBudget(device_budget=5), self.logger)
+        mock_golden_config.objects.update_or_create.assert_not_called()
+
+
+class BoundConnectionTimeoutsTest(unittest.TestCase):
+    """Test the connection timeouts of a host are bounded by the time budget."""
+
+    def test_bound_connection_timeouts(self):
+        """Verify the connection parameters are kept, and only the longer timeouts are lowered."""
+        host = Host(
+            name="router1",
+            hostname="192.0.2.1",
+            username="admin",
+            connection_options={"netmiko": ConnectionOptions(extras={"conn_timeout": 5, "read_timeout_override": 60})},
+        )
+        bound_connection_timeouts(host, 20)
+        netmiko = host.get_connection_parameters("netmiko")
+        self.assertEqual((netmiko.hostname, netmiko.username), ("192.0.2.1", "admin"))
+        self.assertEqual(
+            netmiko.extras,
+            {"conn_timeout": 5, "auth_timeout": 20, "banner_timeout": 20, "read_timeout_override": 20},
+        )
+
+
+@patch("nautobot_golden_config.utilities.time_budget.GoldenConfig")
+class WriteWithinBudgetTest(unittest.TestCase):
+    """Test a device exceeding its time budget does not write its results."""
+
+    def setUp(self):
+        """Setup a temporary repository."""
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.file_path = os.path.join(self.directory.name, "region", "router1.cfg")
+
+    def tearDown(self):
+        """Remove the temporary repository."""
+        self.directory.cleanup()
+
+    def test_within_budget(self, mock_golden_config):
+        """Verify the file is written within the budget."""
+        write_within_budget(DeviceBudget("backup", 30), "router1", MagicMock(), self.file_path, "hostname router1\n")
+        with open(self.file_path, encoding="utf8") as config_file:
+            self.assertEqual(config_file.read(), "hostname router1\n")
+        mock_golden_config.objects.update_or_create.assert_not_called()
+
+    def test_budget_exceeded(self, mock_golden_config):
+        """Verify the file is not written once the budget is exceeded, and the device is marked as timed out."""
+        device_budget = DeviceBudget("backup", 0)
+        with self.assertRaises(NornirNautobotException):
+            write_within_budget(device_budget, "router1", MagicMock(), self.file_path, "hostname router1\n")
+        self.assertTrue(device_budget.timed_out)
+        self.assertFalse(os.path.exists(self.file_path))
+        mock_golden_config.objects.update_or_create.assert_called_once_with(
+            device="router1", defaults={"backup_timed_out": True}
+        )
@@ -0,0 +1,47 @@
+"""Full configuration diff of a device, stored by the compliance job or computed on demand and cached."""
+
+import hashlib
+
+from django.core.cache import cache
+
+from nautobot_golden_config.utilities.constant import COMPLIANCE_DIFF_CACHE_TIMEOUT
+from nautobot_golden_config.utilities.diff_engine import get_diff_engine, get_diff_engine_path
+
+CACHE_PREFIX = "nautobot_golden_config.compliance_diff"
+
+
+def diff_configs(backup_cfg, intended_cfg):
+    """Utility function to provide `Unix Diff` between two configurations, same as `diff_files`."""
+    yield from get_diff_engine()(
+        backup_cfg.splitlines(keepends=True), intended_cfg.splitlines(keepends=True), lineterm=""
+    )
+
+
+def _cache_key(backup_cfg, intended_cfg):
+    """Return the cache key of the diff of two configurations, from the hash of their content and the diff engine."""
+    backup_sha = hashlib.sha256(backup_cfg.encode("utf-8")).hexdigest()
+    intended_sha = hashlib.sha256(intended_cfg.encode("utf-8")).hexdigest()
+    return f"{CACHE_PREFIX}.{get_diff_engine_path()}.{backup_sha}.{intended_sha}"
+
+
+def get_compliance_diff(golden_config):
+    """Return the full configuration diff of a device, as stored by the compliance job or computed on demand.
+
+    When the compliance job does not store the diff, see `store_compliance_diff`, it is computed from the backup and
+    intended configurations stored on the Golden Config, and cached by the hash of their content, so it is computed
+    once per change of either configuration.
+
+    Args:
+        golden_config (GoldenConfig): The Golden Config of the device.
+
+    Returns:
+        str: The unified diff, empty when the configurations are the same or not stored.
+    """
+    if golden_config.compliance_config or not (golden_config.backup_config and golden_config.intended_config):
+        return golden_config.compliance_config
+    cache_key = _cache_key(golden_config.backup_config, golden_config.intended_config)
+    compliance_diff = cache.get(cache_key)
+    if compliance_diff is None:
+        compliance_diff = "\n".join(diff_configs(golden_config.backup_config, golden_config.intended_config))
+        cache.set(cache_key, compliance_diff, timeout=COMPLIANCE_DIFF_CACHE_TIMEOUT)
+    return compliance_diff
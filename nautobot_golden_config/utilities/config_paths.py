@@ -0,0 +1,126 @@
+"""Functions to keep the backup and intended paths persisted on GoldenConfig up to date."""
+
+import logging
+import re
+from itertools import chain
+
+from django.core.exceptions import FieldDoesNotExist
+from nautobot.dcim.models import Device
+from nornir_nautobot.exceptions import NornirNautobotException
+
+from nautobot_golden_config.models import GoldenConfig, GoldenConfigSetting
+from nautobot_golden_config.utilities.helper import (
+    get_device_settings,
+    get_device_to_settings_map,
+    render_jinja_template,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+# Paths persisted on GoldenConfig, as (GoldenConfig path field, repository, path template).
+CONFIG_PATHS = (
+    ("backup_path", "backup_repository", "backup_path_template"),
+    ("intended_path", "intended_repository", "intended_path_template"),
+)
+
+# The attribute of the device a path template uses, e.g. `location` in `{{ obj.location.name }}`, empty for `obj` alone.
+TEMPLATE_ATTRIBUTE_RE = re.compile(r"\bobj\b(?:\.(\w+))?")
+
+
+def get_config_paths(device, settings, logger=LOGGER):
+    """Render the backup and intended paths of a device.
+
+    Args:
+        device (Device): The device to render the paths of.
+        settings (GoldenConfigSetting): The settings of the device, or None.
+        logger (logging.Logger): Logger to log rendering errors to.
+
+    Returns:
+        dict: The GoldenConfig path fields, empty when the repository or the template is not set, or fails to render.
+    """
+    paths = {}
+    for path_field, repo_type, path_template in CONFIG_PATHS:
+        paths[path_field] = ""
+        if not settings or not getattr(settings, repo_type) or not getattr(settings, path_template):
+            continue
+        try:
+            paths[path_field] = render_jinja_template(device, logger, getattr(settings, path_template))
+        except NornirNautobotException:
+            continue
+    return paths
+
+
+def refresh_config_paths(queryset, device_to_settings_map=None):
+    """Update the persisted paths of the devices that have a GoldenConfig.
+
+    Args:
+        queryset (QuerySet): The Device queryset to update the paths of.
+        device_to_settings_map (dict): The device to GoldenConfigSetting mapping, looked up per device when not set.
+    """
+    golden_configs = []
+    for golden_config in GoldenConfig.objects.filter(device__in=queryset).select_related("device").iterator():
+        if device_to_settings_map is None:
+            settings = get_device_settings(golden_config.device)
+        else:
+            settings = device_to_settings_map.get(golden_config.device_id)
+        paths = get_config_paths(golden_config.device, settings)
+        if any(getattr(golden_config, path_field) != path for path_field, path in paths.items()):
+            for path_field, path in paths.items():
+                setattr(golden_config, path_field, path)
+            golden_configs.append(golden_config)
+    GoldenConfig.objects.bulk_update(golden_configs, [path_field for path_field, _, _ in CONFIG_PATHS], batch_size=500)
+
+
+def get_path_template_fields():
+    """Return the Device fields the backup and intended path templates of all the settings use.
+
+    Returns:
+        set: The concrete Device fields, or None when a template uses the device other than through them.
+    """
+    fields = set()
+    templates = GoldenConfigSetting.objects.values_list("backup_path_template", "intended_path_template")
+    for template in chain.from_iterable(templates):
+        for attribute in TEMPLATE_ATTRIBUTE_RE.findall(template or ""):
+            try:
+                field = Device._meta.get_field(attribute)
+            except FieldDoesNotExist:
+                return None
+            if not field.concrete:
+                return None
+            fields.add(field)
+    return fields
+
+
+def config_paths_changed(device, update_fields=None):
+    """Return whether saving a device may change its backup and intended paths.
+
+    Args:
+        device (Device): The device about to be saved, with its new field values.
+        update_fields (frozenset): The names of the fields saved, or None when all the fields are.
+
+    Returns:
+        bool: True when a field the path templates use is saved with a new value.
+    """
+    # A new device has no GoldenConfig yet, its paths are persisted by its first backup or intended job run.
+    if device._state.adding:  # pylint: disable=protected-access
+        return False
+    fields = get_path_template_fields()
+    if fields is None:
+        return True
+    if update_fields is not None:
+        fields = {field for field in fields if field.name in update_fields or field.attname in update_fields}
+    if not fields:
+        return False
+    attnames = [field.attname for field in fields]
+    saved = Device.objects.filter(pk=device.pk).values(*attnames).first()
+    return saved is None or any(saved[attname] != getattr(device, attname) for attname in attnames)
+
+
+def refresh_settings_config_paths(settings):
+    """Update the persisted paths of the devices in scope of settings.
+
+    Args:
+        settings (GoldenConfigSetting): The settings to update the paths of the devices in scope of.
+    """
+    queryset = settings.get_queryset()
+    refresh_config_paths(queryset, get_device_to_settings_map(queryset))
@@ -57,7 +57,7 @@ def get_secret_by_secret_group_name(
 def _get_device_agg_data(device, request):
     """Helper method to retrieve GraphQL data from a device."""
     settings = get_device_to_settings_map(Device.objects.filter(pk=device.pk))[device.id]
-    _, device_data = graph_ql_query(request, device, settings.sot_agg_query.query)
+    _, device_data = graph_ql_query(request, device, settings.sot_agg_query.query, query_id=settings.sot_agg_query.pk)
     return device_data
 
 
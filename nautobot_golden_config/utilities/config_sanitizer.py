@@ -0,0 +1,110 @@
+"""Sanitizer of the backup configurations, applying the `ConfigRemove` and `ConfigReplace` rules of a platform."""
+
+import re
+
+from netutils.config.clean import clean_config, sanitize_config
+
+# The literal text a pattern starts a line with, up to its first special character.
+LINE_START_LITERAL_RE = re.compile(r"\^([^\\.^$*+?{}\[\]|()]+)(.?)", re.DOTALL)
+INLINE_FLAGS_RE = re.compile(r"\(\?[aiLmsux-]")
+
+
+def _line_start_prefix(pattern):
+    r"""Return the literal text every match of a compiled pattern starts a line with, empty when there is none.
+
+    Such as `Building` for `^Building\s+configuration.*\n`. It is empty for the patterns with any alternation,
+    ignoring case or with inline flags, and when the text is followed by a quantifier, which may apply to its last
+    character, such as `^ab*`.
+    """
+    if (
+        pattern.flags & (re.IGNORECASE | re.VERBOSE)
+        or "|" in pattern.pattern
+        or INLINE_FLAGS_RE.search(pattern.pattern)
+    ):
+        return ""
+    match = LINE_START_LITERAL_RE.match(pattern.pattern)
+    if not match or match.group(2) in ("*", "+", "?", "{"):
+        return ""
+    return match.group(1)
+
+
+class _Substitution:
+    """A regex substitution, giving the same result as `re.sub(regex, replace, config, flags=re.MULTILINE)`."""
+
+    def __init__(self, regex, replace):
+        """Compile the regex, raising `re.error` when the regex or the replacement text is invalid."""
+        self.pattern = re.compile(regex, re.MULTILINE)
+        self.replace = replace
+        # Parses the replacement text, as `re.sub` does even when nothing matches.
+        self.pattern.sub(replace, "")
+        self.prefix = _line_start_prefix(self.pattern)
+        self.needle = "\n" + self.prefix
+
+    def _line_starts(self, config, position):
+        """Return the first start of a line beginning with the prefix, at or after the position, -1 when none."""
+        if position == 0 and config.startswith(self.prefix):
+            return 0
+        index = config.find(self.needle, max(position - 1, 0))
+        return index + 1 if index != -1 else -1
+
+    def __call__(self, config):
+        """Return the configuration with the matches of the regex replaced."""
+        if not self.prefix:
+            return self.pattern.sub(self.replace, config)
+        # The regex engine does not skip ahead to the start of the lines, so a match is only tried on the lines
+        # starting with the prefix. Matches can not be empty and start nowhere else, they are the ones of `re.sub`.
+        pieces, last = [], 0
+        start = self._line_starts(config, 0)
+        while start != -1:
+            match = self.pattern.match(config, start)
+            if match:
+                pieces.append(config[last : match.start()])
+                pieces.append(match.expand(self.replace))
+                last = match.end()
+            start = self._line_starts(config, match.end() if match else start + 1)
+        if not pieces:
+            return config
+        pieces.append(config[last:])
+        return "".join(pieces)
+
+
+class ConfigSanitizer:
+    """Sanitizer of the backup configurations of a platform, compiled once per job.
+
+    The lines are removed as by `netutils.config.clean.clean_config`, then substituted as by
+    `netutils.config.clean.sanitize_config`, with the same result. The regexes anchored to the start of a line with
+    a literal text, which most are, are only tried on the lines starting with that text.
+    """
+
+    def __init__(self, remove_lines=None, substitute_lines=None):
+        """Compile the rules.
+
+        Args:
+            remove_lines (list): The `{"regex": ...}` of the lines to remove, in order.
+            substitute_lines (list): The `{"regex": ..., "replace": ...}` of the substitutions, in order.
+        """
+        self.remove_lines = remove_lines or []
+        self.substitute_lines = substitute_lines or []
+        try:
+            self.substitutions = [_Substitution(item["regex"], "") for item in self.remove_lines] + [
+                _Substitution(item["regex"], item["replace"]) for item in self.substitute_lines
+            ]
+        except re.error:
+            # Left to netutils, which raises the error when sanitizing, failing the backup of the devices only.
+            self.substitutions = None
+
+    def __bool__(self):
+        """Return whether the sanitizer has any rules."""
+        return bool(self.remove_lines or self.substitute_lines)
+
+    def sanitize(self, config):
+        """Return the configuration with the lines removed and substituted.
+
+        Raises:
+            re.error: When a regex or a replacement text of the rules is invalid.
+        """
+        if self.substitutions is None:
+            return sanitize_config(clean_config(config, self.remove_lines), self.substitute_lines)
+        for substitution in self.substitutions:
+            config = substitution(config)
+        return config
@@ -13,6 +13,20 @@ ENABLE_PLAN = PLUGIN_CFG["enable_plan"]
 ENABLE_DEPLOY = PLUGIN_CFG["enable_deploy"]
 ENABLE_POSTPROCESSING = PLUGIN_CFG["enable_postprocessing"]
 DEFAULT_DEPLOY_STATUS = PLUGIN_CFG["default_deploy_status"]
+INVENTORY_CHUNK_SIZE = PLUGIN_CFG["inventory_chunk_size"]
+QUEUE_ROUTING = PLUGIN_CFG["queue_routing"]
+SOT_AGG_BATCH_SIZE = PLUGIN_CFG["sot_agg_batch_size"]
+SOT_AGG_CACHE_TIMEOUT = PLUGIN_CFG["sot_agg_cache_timeout"]
+JINJA_BYTECODE_CACHE_DIR = PLUGIN_CFG["jinja_bytecode_cache_dir"]
+JINJA_BYTECODE_CACHE_TIMEOUT = PLUGIN_CFG["jinja_bytecode_cache_timeout"]
+COMPLIANCE_SOURCE = PLUGIN_CFG["compliance_source"]
+COMPLIANCE_RULE_RECOMPUTE = PLUGIN_CFG["compliance_rule_recompute"]
+COMPLIANCE_AFTER_BACKUP = PLUGIN_CFG["compliance_after_backup"]
+COMPLIANCE_AFTER_BACKUP_BATCH_SIZE = PLUGIN_CFG["compliance_after_backup_batch_size"]
+STORE_COMPLIANCE_DIFF = PLUGIN_CFG["store_compliance_diff"]
+COMPLIANCE_DIFF_CACHE_TIMEOUT = PLUGIN_CFG["compliance_diff_cache_timeout"]
+# File extensions of the templates compiled when a Jinja repository is synced.
+JINJA_TEMPLATE_EXTENSIONS = (".j2", ".jinja", ".jinja2")
 
 CONFIG_FEATURES = {
     "intended": ENABLE_INTENDED,
@@ -0,0 +1,208 @@
+"""Line diff engines producing the unified diff of the configurations, see the `compliance_diff_engine` setting."""
+
+import bisect
+import difflib
+from collections import Counter
+from functools import lru_cache
+
+from django.utils.module_loading import import_string
+
+from nautobot_golden_config.utilities.constant import PLUGIN_CFG
+
+# Edit distance after which a region without unique common lines is diffed as a replacement, to bound the cost.
+MAX_MYERS_DISTANCE = 2000
+
+
+def get_diff_engine_path():
+    """Return the dotted path of the `compliance_diff_engine` function, `difflib.unified_diff` when not set.
+
+    The engines may describe the same changes with other hunks, so the diffs stored or cached are tied to this path.
+    """
+    return PLUGIN_CFG.get("compliance_diff_engine") or "difflib.unified_diff"
+
+
+@lru_cache(maxsize=None)
+def get_diff_engine():
+    """Return the `compliance_diff_engine` function, resolved once per worker."""
+    return import_string(get_diff_engine_path())
+
+
+def _hash_lines(a, b):
+    """Return the lines of both sequences as integers, equal lines getting the same integer."""
+    line_ids = {}
+    a_ids = [line_ids.setdefault(line, len(line_ids)) for line in a]
+    b_ids = [line_ids.setdefault(line, len(line_ids)) for line in b]
+    return a_ids, b_ids
+
+
+def _unique_anchors(a, b, region):
+    """Return the lines unique in both parts of an `(alo, ahi, blo, bhi)` region, as increasing `(i, j)` pairs."""
+    alo, ahi, blo, bhi = region
+    a_counts = Counter(a[alo:ahi])
+    b_counts = Counter(b[blo:bhi])
+    b_index = {b[j]: j for j in range(blo, bhi) if b_counts[b[j]] == 1}
+    pairs = [(i, b_index[a[i]]) for i in range(alo, ahi) if a_counts[a[i]] == 1 and a[i] in b_index]
+    # Patience sorting of the `j` values, keeping the back pointers of the longest increasing subsequence.
+    tails, tail_indexes, previous = [], [], [None] * len(pairs)
+    for index, (_, j) in enumerate(pairs):
+        position = bisect.bisect_left(tails, j)
+        if position:
+            previous[index] = tail_indexes[position - 1]
+        if position == len(tails):
+            tails.append(j)
+            tail_indexes.append(index)
+        else:
+            tails[position] = j
+            tail_indexes[position] = index
+    anchors = []
+    index = tail_indexes[-1] if tail_indexes else None
+    while index is not None:
+        anchors.append(pairs[index])
+        index = previous[index]
+    anchors.reverse()
+    return anchors
+
+
+def _myers_matches(a, b, region):
+    """Return the matching lines of a region on a shortest edit script, or None past `MAX_MYERS_DISTANCE`."""
+    alo, ahi, blo, bhi = region
+    n, m = ahi - alo, bhi - blo
+    furthest = {1: 0}
+    trace = []
+    for distance in range(min(n + m, MAX_MYERS_DISTANCE) + 1):
+        trace.append(furthest.copy())
+        for k in range(-distance, distance + 1, 2):
+            if k == -distance or (k != distance and furthest[k - 1] < furthest[k + 1]):
+                x = furthest[k + 1]
+            else:
+                x = furthest[k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x, y = x + 1, y + 1
+            furthest[k] = x
+            if x >= n and y >= m:
+                return _myers_backtrack(trace, n, m, alo, blo)
+    return None
+
+
+def _myers_backtrack(trace, x, y, alo, blo):
+    """Walk the Myers trace back from the end of both regions, returning the matching `(i, j)` lines."""
+    matches = []
+    for distance in range(len(trace) - 1, -1, -1):
+        furthest = trace[distance]
+        k = x - y
+        if k == -distance or (k != distance and furthest[k - 1] < furthest[k + 1]):
+            previous_k = k + 1
+        else:
+            previous_k = k - 1
+        previous_x = furthest[previous_k]
+        previous_y = previous_x - previous_k
+        while x > previous_x and y > previous_y:
+            x, y = x - 1, y - 1
+            matches.append((alo + x, blo + y))
+        x, y = previous_x, previous_y
+    return matches
+
+
+def get_matching_lines(a, b):
+    """Return the matching `(i, j)` lines of two sequences of hashable lines, with a patience diff.
+
+    Common prefixes and suffixes are matched first, then the lines found once in both regions anchor the regions
+    in between, down to regions without such lines, which are matched with Myers' algorithm.
+    """
+    matches = []
+    regions = [(0, len(a), 0, len(b))]
+    while regions:
+        alo, ahi, blo, bhi = regions.pop()
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            matches.append((alo, blo))
+            alo, blo = alo + 1, blo + 1
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi, bhi = ahi - 1, bhi - 1
+            matches.append((ahi, bhi))
+        if alo == ahi or blo == bhi:
+            continue
+        anchors = _unique_anchors(a, b, (alo, ahi, blo, bhi))
+        if anchors:
+            for i, j in anchors:
+                matches.append((i, j))
+                regions.append((alo, i, blo, j))
+                alo, blo = i + 1, j + 1
+            regions.append((alo, ahi, blo, bhi))
+            continue
+        matches.extend(_myers_matches(a, b, (alo, ahi, blo, bhi)) or [])
+    return sorted(matches)
+
+
+class HashedLineMatcher(difflib.SequenceMatcher):
+    """SequenceMatcher whose matching blocks come from `get_matching_lines` on hashed lines."""
+
+    def set_seq2(self, b):
+        """Set the second sequence, without building the index of its elements `SequenceMatcher` uses."""
+        if b is self.b:
+            return
+        self.b = b
+        self.matching_blocks = self.opcodes = None
+        self.fullbcount = None
+
+    def get_matching_blocks(self):
+        """Return the matching blocks as `(i, j, size)`, adjacent blocks merged, like `SequenceMatcher` does."""
+        if self.matching_blocks is not None:
+            return self.matching_blocks
+        blocks = []
+        for i, j in get_matching_lines(*_hash_lines(self.a, self.b)):
+            if blocks and blocks[-1][0] + blocks[-1][2] == i and blocks[-1][1] + blocks[-1][2] == j:
+                blocks[-1][2] += 1
+            else:
+                blocks.append([i, j, 1])
+        blocks.append([len(self.a), len(self.b), 0])
+        self.matching_blocks = [difflib.Match(*block) for block in blocks]
+        return self.matching_blocks
+
+
+def _format_range_unified(start, stop):
+    """Convert a range to the `start,length` format of a unified diff hunk, as `difflib` does."""
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return f"{beginning}"
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+
+def fast_unified_diff(  # noqa: PLR0913 pylint: disable=too-many-arguments
+    a, b, fromfile="", tofile="", fromfiledate="", tofiledate="", n=3, lineterm="\n"
+):
+    """Drop-in replacement of `difflib.unified_diff`, matching the lines with `HashedLineMatcher`.
+
+    The output has the same format as `difflib.unified_diff` and turns the first sequence into the second, while
+    large and mostly similar configurations are diffed in about linear time. It is not the same diff: when the
+    changes can be described several ways, such as repeated lines or moved blocks, the hunks usually differ from the
+    ones of `difflib`, and are not always the shortest either.
+    """
+    started = False
+    for group in HashedLineMatcher(None, a, b).get_grouped_opcodes(n):
+        if not started:
+            started = True
+            fromdate = f"\t{fromfiledate}" if fromfiledate else ""
+            todate = f"\t{tofiledate}" if tofiledate else ""
+            yield f"--- {fromfile}{fromdate}{lineterm}"
+            yield f"+++ {tofile}{todate}{lineterm}"
+
+        first, last = group[0], group[-1]
+        file1_range = _format_range_unified(first[1], last[2])
+        file2_range = _format_range_unified(first[3], last[4])
+        yield f"@@ -{file1_range} +{file2_range} @@{lineterm}"
+
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                for line in a[i1:i2]:
+                    yield " " + line
+                continue
+            if tag in {"replace", "delete"}:
+                for line in a[i1:i2]:
+                    yield "-" + line
+            if tag in {"replace", "insert"}:
+                for line in b[j1:j2]:
+                    yield "+" + line
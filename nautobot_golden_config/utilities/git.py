@@ -1,7 +1,10 @@
 """Git helper methods and class."""
 
 import logging
+from functools import lru_cache
 
+from git import Repo
+from git.exc import GitError
 from nautobot.core.utils.git import GitRepo as _GitRepo
 
 LOGGER = logging.getLogger(__name__)
@@ -39,3 +42,24 @@ class GitRepo(_GitRepo):  # pylint: disable=too-many-instance-attributes
         """Push latest to the git repo."""
         LOGGER.debug("Push changes to repo")
         self.repo.remotes.origin.push().raise_if_error()
+
+
+@lru_cache(maxsize=128)
+def get_changed_files(path, from_commit, to_commit):
+    """Return the paths of the files changed between two commits of a local repository.
+
+    Args:
+        path (str): The filesystem path of the repository.
+        from_commit (str): The commit hash to compare from.
+        to_commit (str): The commit hash to compare to.
+
+    Returns:
+        frozenset: The repository relative paths of the added, changed, renamed or deleted files, or None when the
+            commits can not be compared, for instance when the older commit is not in the local clone.
+    """
+    try:
+        output = Repo(path).git.diff("--name-only", "--no-renames", from_commit, to_commit)
+    except (GitError, ValueError) as error:
+        LOGGER.debug("Could not compare commits `%s` and `%s`: %s", from_commit, to_commit, error)
+        return None
+    return frozenset(output.splitlines())
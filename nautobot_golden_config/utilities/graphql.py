@@ -1,21 +1,248 @@
 """Example code to execute GraphQL query from the ORM."""
 
+import hashlib
 import logging
+import threading
+from copy import deepcopy
+from functools import lru_cache
 
 from django.utils.module_loading import import_string
 from graphene_django.settings import graphene_settings
 from graphql import get_default_backend
 from graphql.error import GraphQLSyntaxError
+from graphql.execution import ExecutionResult, execute
+from graphql.language.ast import Argument, Field, Name, OperationDefinition, Variable
+from graphql.language.parser import parse
+from graphql.language.visitor import Visitor, visit
+from graphql.validation import validate
 
+from nautobot_golden_config.utilities import sot_agg_cache
 from nautobot_golden_config.utilities.constant import PLUGIN_CFG
 
 LOGGER = logging.getLogger(__name__)
 
+# Parsed and validated documents, shared by all the threads of the worker, keyed by GraphQLQuery id and query text.
+_DOCUMENT_CACHE = {}
+_DOCUMENT_CACHE_LOCK = threading.Lock()
 
-def graph_ql_query(request, device, query):
-    """Function to run graphql and transposer command."""
+# Names used in the batched query, prefixed to avoid clashing with the names of the saved query.
+BATCH_IDS_VARIABLE = "gc_device_ids"
+BATCH_ID_ALIAS = "gc_batch_id"
+
+
+@lru_cache(maxsize=None)
+def get_sot_agg_transposer():
+    """Return the `sot_agg_transposer` function, resolved once per worker, or None when not set."""
+    if not PLUGIN_CFG.get("sot_agg_transposer"):
+        return None
+    return import_string(PLUGIN_CFG.get("sot_agg_transposer"))
+
+
+def get_document(schema, query, query_id=None):
+    """Return the parsed document of a query and its validation errors, parsing and validating it once per worker.
+
+    Args:
+        schema (GraphQLSchema): The schema the query is validated against.
+        query (str): The GraphQL query text.
+        query_id (str): The pk of the GraphQLQuery of the query, if any, so edited queries replace their old document.
+
+    Returns:
+        tuple: The GraphQLDocument and the list of validation errors.
+
+    Raises:
+        GraphQLSyntaxError: When the query can not be parsed, syntax errors are not cached.
+    """
+    query_hash = hashlib.sha256(query.encode("utf-8")).hexdigest()
+    cache_key = (str(query_id) if query_id else query_hash, id(schema))
+    cached = _DOCUMENT_CACHE.get(cache_key)
+    if cached and cached[0] == query_hash:
+        return cached[1], cached[2]
+
+    with _DOCUMENT_CACHE_LOCK:
+        cached = _DOCUMENT_CACHE.get(cache_key)
+        if cached and cached[0] == query_hash:
+            return cached[1], cached[2]
+        LOGGER.debug("GraphQL - parse and validate query: `%s`", str(query))
+        document = get_default_backend().document_from_string(schema, query)
+        errors = validate(schema, document.document_ast)
+        _DOCUMENT_CACHE[cache_key] = (query_hash, document, errors)
+    return document, errors
+
+
+class _VariableUsageCounter(Visitor):
+    """Count the usages of each variable of a document."""
+
+    def __init__(self):
+        """Initialize the counter."""
+        self.usages = {}
+
+    def enter_Variable(self, node, *args):  # pylint: disable=invalid-name,unused-argument
+        """Count a variable usage, including its definition."""
+        self.usages[node.name.value] = self.usages.get(node.name.value, 0) + 1
+
+
+def _is_batchable(document_ast):
+    """Whether a document is a single `device(id: $device_id)` query, with `$device_id` not used anywhere else."""
+    operations = [node for node in document_ast.definitions if isinstance(node, OperationDefinition)]
+    if len(operations) != 1 or operations[0].operation != "query":
+        return False
+    operation = operations[0]
+    selections = operation.selection_set.selections
+    if len(selections) != 1 or not isinstance(selections[0], Field):
+        return False
+    field = selections[0]
+    arguments = [(argument.name.value, argument.value) for argument in field.arguments]
+    if (
+        field.name.value != "device"
+        or field.alias
+        or not field.selection_set
+        or len(arguments) != 1
+        or arguments[0][0] != "id"
+        or not isinstance(arguments[0][1], Variable)
+    ):
+        return False
+    if [definition.variable.name.value for definition in operation.variable_definitions or []] != ["device_id"]:
+        return False
+    counter = _VariableUsageCounter()
+    visit(document_ast, counter)
+    # The variable is only used by its definition and the `device` argument.
+    return counter.usages == {"device_id": 2}
+
+
+def _rewrite_batch_document(schema, document_ast):
+    """Rewrite a `device(id: $device_id)` query to a `devices(id: $gc_device_ids)` query, aliasing each device id.
+
+    Returns:
+        Document: The rewritten document, or None if the query does not have the supported shape.
+    """
+    if not _is_batchable(document_ast):
+        return None
+
+    devices_field = schema.get_query_type().fields.get("devices")
+    if not devices_field or "id" not in devices_field.args:
+        return None
+
+    batch_ast = deepcopy(document_ast)
+    operation = [node for node in batch_ast.definitions if isinstance(node, OperationDefinition)][0]
+    field = operation.selection_set.selections[0]
+    operation.variable_definitions = (
+        parse(f"query (${BATCH_IDS_VARIABLE}: {devices_field.args['id'].type}) {{ __typename }}")
+        .definitions[0]
+        .variable_definitions
+    )
+    field.name = Name(value="devices")
+    field.arguments = [Argument(name=Name(value="id"), value=Variable(name=Name(value=BATCH_IDS_VARIABLE)))]
+    field.selection_set.selections.append(Field(alias=Name(value=BATCH_ID_ALIAS), name=Name(value="id")))
+    if validate(schema, batch_ast):
+        return None
+    return batch_ast
+
+
+def get_batch_document(schema, query, query_id=None):
+    """Return the batched version of a query, rewritten and validated once per worker.
+
+    Args:
+        schema (GraphQLSchema): The schema the query is validated against.
+        query (str): The GraphQL query text.
+        query_id (str): The pk of the GraphQLQuery of the query, if any.
+
+    Returns:
+        Document: The batched document AST, or None when the query can not be batched.
+
+    Raises:
+        GraphQLSyntaxError: When the query can not be parsed.
+    """
+    query_hash = hashlib.sha256(query.encode("utf-8")).hexdigest()
+    cache_key = (str(query_id) if query_id else query_hash, id(schema), "batch")
+    cached = _DOCUMENT_CACHE.get(cache_key)
+    if cached and cached[0] == query_hash:
+        return cached[1]
+
+    document, errors = get_document(schema, query, query_id)
+    batch_ast = None if errors else _rewrite_batch_document(schema, document.document_ast)
+    if batch_ast is None:
+        LOGGER.debug("GraphQL - query can not be batched: `%s`", str(query))
+    with _DOCUMENT_CACHE_LOCK:
+        _DOCUMENT_CACHE[cache_key] = (query_hash, batch_ast)
+    return batch_ast
+
+
+def _transpose(data):
+    """Apply the `sot_agg_transposer` to the data of a device, if set."""
+    if PLUGIN_CFG.get("sot_agg_transposer"):
+        LOGGER.debug("GraphQL - transform data with function: `%s`", str(PLUGIN_CFG.get("sot_agg_transposer")))
+        try:
+            data = get_sot_agg_transposer()(data)
+        except Exception as error:  # pylint: disable=broad-except
+            return (400, {"error": str(error)})
+    return (200, data)
+
+
+def graph_ql_query_batch(request, devices, query, query_id=None):
+    """Run the SoT aggregation query for several devices in a single execution.
+
+    The query is rewritten from `device(id: $device_id)` to `devices(id: $gc_device_ids)` and the result is split per
+    device, so each device gets the same output as with `graph_ql_query`. Queries that can not be rewritten, failed
+    executions and devices missing from the result fall back to `graph_ql_query` per device. Devices with a cached
+    result are not queried.
+
+    Args:
+        request (HttpRequest): The request, used as GraphQL context.
+        devices (list): The Device objects to run the query for.
+        query (str): The GraphQL query text.
+        query_id (str): The pk of the GraphQLQuery of the query, if any.
+
+    Returns:
+        dict: The `(status, data)` tuple of `graph_ql_query` for each device pk.
+    """
+    schema = graphene_settings.SCHEMA
+    try:
+        batch_ast = get_batch_document(schema, query, query_id)
+    except GraphQLSyntaxError:
+        batch_ast = None
+
+    cache_keys = {device.pk: sot_agg_cache.get_cache_key(request, device, query, query_id) for device in devices}
+    results = {device.pk: sot_agg_cache.get_cached_result(cache_keys[device.pk]) for device in devices}
+    missing_devices = [device for device in devices if results[device.pk] is None]
+
+    batch_results = {}
+    if batch_ast is not None and missing_devices:
+        LOGGER.debug("GraphQL - execute batched query for %s devices", len(missing_devices))
+        result = execute(
+            schema,
+            batch_ast,
+            context_value=request,
+            variable_values={BATCH_IDS_VARIABLE: [str(device.pk) for device in missing_devices]},
+        )
+        if not result.invalid and not result.errors:
+            for data in (result.data or {}).get("devices") or []:
+                device_pk = data.pop(BATCH_ID_ALIAS)
+                batch_results[device_pk] = _transpose(data)
+
+    for device in missing_devices:
+        if str(device.pk) in batch_results:
+            results[device.pk] = batch_results[str(device.pk)]
+            sot_agg_cache.set_cached_result(cache_keys[device.pk], results[device.pk])
+        else:
+            results[device.pk] = graph_ql_query(request, device, query, query_id=query_id)
+    return results
+
+
+def graph_ql_query(request, device, query, query_id=None):
+    """Function to run graphql and transposer command, returning the cached result when the SoT cache is enabled."""
+    cache_key = sot_agg_cache.get_cache_key(request, device, query, query_id)
+    result = sot_agg_cache.get_cached_result(cache_key)
+    if result is None:
+        result = _graph_ql_query(request, device, query, query_id)
+        sot_agg_cache.set_cached_result(cache_key, result)
+    else:
+        LOGGER.debug("GraphQL - cached result for `%s`", str(device))
+    return result
+
+
+def _graph_ql_query(request, device, query, query_id=None):
+    """Run graphql and transposer command."""
     LOGGER.debug("GraphQL - request for `%s`", str(device))
-    backend = get_default_backend()
     schema = graphene_settings.SCHEMA
 
     LOGGER.debug("GraphQL - set query variable to device.")
@@ -23,14 +250,17 @@ def graph_ql_query(request, device, query):
 
     try:
         LOGGER.debug("GraphQL - test query: `%s`", str(query))
-        document = backend.document_from_string(schema, query)
+        document, errors = get_document(schema, query, query_id)
 
     except GraphQLSyntaxError as error:
         LOGGER.warning("GraphQL - test query Failed: `%s`", str(query))
         return (400, {"error": str(error)})
 
     LOGGER.debug("GraphQL - execute query with variables")
-    result = document.execute(context_value=request, variable_values=variables)
+    if errors:
+        result = ExecutionResult(errors=errors, invalid=True)
+    else:
+        result = execute(schema, document.document_ast, context_value=request, variable_values=variables)
     if result.invalid:
         LOGGER.warning("GraphQL - query executed unsuccessfully")
         return (400, result.to_dict())
@@ -38,12 +268,7 @@ def graph_ql_query(request, device, query):
 
     data = data.get("device", {})
 
-    if PLUGIN_CFG.get("sot_agg_transposer"):
-        LOGGER.debug("GraphQL - transform data with function: `%s`", str(PLUGIN_CFG.get("sot_agg_transposer")))
-        try:
-            data = import_string(PLUGIN_CFG.get("sot_agg_transposer"))(data)
-        except Exception as error:  # pylint: disable=broad-except
-            return (400, {"error": str(error)})
-
-    LOGGER.debug("GraphQL - request successful")
-    return (200, data)
+    status, data = _transpose(data)
+    if status == 200:  # noqa: PLR2004
+        LOGGER.debug("GraphQL - request successful")
+    return (status, data)
@@ -1,19 +1,26 @@
 """Helper functions."""
 
 # pylint: disable=raise-missing-from
+import hashlib
 import json
+import os
+import posixpath
+import threading
+from contextlib import contextmanager
 from copy import deepcopy
+from functools import lru_cache
 
 from django.conf import settings
 from django.contrib import messages
+from django.core.cache import cache
 from django.db.models import Q
 from django.template import engines
 from django.urls import reverse
 from django.utils.html import format_html
+from jinja2 import BytecodeCache, FileSystemBytecodeCache, FileSystemLoader
 from jinja2 import exceptions as jinja_errors
 from jinja2.sandbox import SandboxedEnvironment
 from lxml import etree
-from nautobot.core.utils.data import render_jinja2
 from nautobot.dcim.filters import DeviceFilterSet
 from nautobot.dcim.models import Device
 from nautobot.extras.models import Job
@@ -21,8 +28,15 @@ from nornir_nautobot.exceptions import NornirNautobotException
 
 from nautobot_golden_config import config as app_config
 from nautobot_golden_config import models
-from nautobot_golden_config.utilities import utils
-from nautobot_golden_config.utilities.constant import JINJA_ENV
+from nautobot_golden_config.utilities import json_codec, utils
+from nautobot_golden_config.utilities.constant import (
+    JINJA_BYTECODE_CACHE_DIR,
+    JINJA_BYTECODE_CACHE_TIMEOUT,
+    JINJA_ENV,
+    JINJA_TEMPLATE_EXTENSIONS,
+    QUEUE_ROUTING,
+)
+from nautobot_golden_config.utilities.git import get_changed_files
 
 FRAMEWORK_METHODS = {
     "default": utils.default_framework,
@@ -45,6 +59,10 @@ FIELDS_PK = {
 
 FIELDS_NAME = {"tags", "status"}
 
+# Compiled XPath of the XML compliance rules, per thread, cleared when it holds more than XPATH_CACHE_SIZE expressions.
+_XPATH_CACHE = threading.local()
+XPATH_CACHE_SIZE = 256
+
 
 def get_job_filter(data=None):
     """Helper function to return a the filterable list of OS's based on platform.name and a specific custom value."""
@@ -96,6 +114,85 @@ def get_job_filter(data=None):
     return devices_filtered.qs
 
 
+def get_inventory_chunks(queryset, chunk_size):
+    """Helper function to split the in scope devices into smaller querysets, each one used for its own Nornir inventory.
+
+    Args:
+        queryset (QuerySet): The Device queryset in scope of the job.
+        chunk_size (int): The maximum amount of devices per chunk, chunking is disabled when not set.
+
+    Yields:
+        QuerySet: A Device queryset for each chunk, or the original ``queryset`` when chunking is disabled.
+    """
+    if not chunk_size or chunk_size < 1:
+        yield queryset
+        return
+    device_pks = list(queryset.values_list("pk", flat=True))
+    for index in range(0, len(device_pks), chunk_size):
+        yield queryset.filter(pk__in=device_pks[index : index + chunk_size])  # noqa: E203
+
+
+def get_task_queues(*workloads):
+    """Helper function to return the Celery queues a job is routed to, based on the `queue_routing` setting.
+
+    Args:
+        workloads (str): The `queue_routing` keys of the job, e.g. `backup` or `fast_lane`, the first one is the default.
+
+    Returns:
+        list: The configured queues, without duplicates, an empty list uses the default Nautobot queue. When the first
+            workload is not configured but another one is, the default Nautobot queue is kept first, so a secondary
+            queue such as `fast_lane` never becomes the default of the job.
+    """
+    task_queues = []
+    for workload in workloads:
+        queue = QUEUE_ROUTING.get(workload)
+        if queue and queue not in task_queues:
+            task_queues.append(queue)
+    if task_queues and not QUEUE_ROUTING.get(workloads[0]) and settings.CELERY_TASK_DEFAULT_QUEUE not in task_queues:
+        task_queues.insert(0, settings.CELERY_TASK_DEFAULT_QUEUE)
+    return task_queues
+
+
+def get_intended_fingerprint(device_data, *template_inputs):
+    """Helper function to fingerprint the inputs an intended configuration is rendered from.
+
+    Args:
+        device_data (dict): The SoT aggregation data of the device, after the transposer.
+        template_inputs (str): The other inputs of the rendering, such as the Jinja repository commit.
+
+    Returns:
+        str: The SHA-256 hex digest of the inputs.
+    """
+    # Always serialized with the standard library, orjson formats some floats differently, e.g. `1e+16` for `1e16`,
+    # so the fingerprint is the same on the workers with and without orjson.
+    device_json = json.dumps(device_data, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    digest = hashlib.sha256(device_json.encode("utf-8"))
+    for template_input in template_inputs:
+        digest.update(b"\0" + str(template_input).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def jinja_dependencies_unchanged(golden_config, repo_path, commit):
+    """Helper function to check that none of the templates an intended configuration was rendered from has changed.
+
+    Args:
+        golden_config (GoldenConfig): The GoldenConfig of the device, with its recorded template dependencies.
+        repo_path (str): The filesystem path of the Jinja repository.
+        commit (str): The current commit of the Jinja repository.
+
+    Returns:
+        bool: True when the templates are unchanged since the last rendering, False when changed or unknown.
+    """
+    if not commit or not golden_config.intended_jinja_commit:
+        return False
+    if golden_config.intended_jinja_commit == commit:
+        return True
+    if not golden_config.intended_template_deps:
+        return False
+    changed_files = get_changed_files(repo_path, golden_config.intended_jinja_commit, commit)
+    return changed_files is not None and changed_files.isdisjoint(golden_config.intended_template_deps)
+
+
 def null_to_empty(val):
     """Convert to empty string if the value is currently null."""
     if not val:
@@ -112,18 +209,150 @@ def verify_settings(logger, global_settings, attrs):
             raise NornirNautobotException(error_msg)
 
 
+class TemplateDependencyEnvironment(SandboxedEnvironment):
+    """Sandboxed Jinja2 environment shared by the threads of a play.
+
+    The loader is set per thread, as the dispatcher sets a new `FileSystemLoader` for each device, and the compiled
+    templates are cached by search path and template name, so they are shared by all the devices and threads. The
+    templates loaded by each thread, including the included ones, are recorded.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """Initialize the environment, the per thread state and the compiled template lock."""
+        self._thread_state = threading.local()
+        super().__init__(*args, **kwargs)
+        self._shared_loader = self._thread_state.__dict__.pop("loader", None)
+        self._recorder = threading.local()
+        self._compile_lock = threading.Lock()
+
+    @property
+    def loader(self):
+        """Return the loader set by the current thread, or the loader the environment was created with."""
+        return getattr(self._thread_state, "loader", self._shared_loader)
+
+    @loader.setter
+    def loader(self, loader):
+        """Set the loader of the current thread only."""
+        self._thread_state.loader = loader
+
+    def _get_cache_key(self, name):
+        """Return the compiled template cache key, by search path so new loaders of the same path share templates."""
+        if isinstance(self.loader, FileSystemLoader):
+            return (tuple(self.loader.searchpath), name)
+        return (id(self.loader), name)
+
+    def _get_cached_template(self, cache_key, globals):  # pylint: disable=redefined-builtin
+        """Return the cached template, or None when not cached or its source file changed since it was compiled."""
+        template = self.cache.get(cache_key)
+        if template is not None and (not self.auto_reload or template.is_up_to_date):
+            if globals:
+                template.globals.update(globals)
+            return template
+        return None
+
+    def _load_template(self, name, globals):  # pylint: disable=redefined-builtin
+        """Record the template name, and load the template from the shared cache, compiling it once when missing."""
+        loaded_templates = getattr(self._recorder, "loaded_templates", None)
+        if loaded_templates is not None:
+            loaded_templates.add(posixpath.normpath(name))
+        if self.loader is None or self.cache is None:
+            return super()._load_template(name, globals)
+
+        cache_key = self._get_cache_key(name)
+        template = self._get_cached_template(cache_key, globals)
+        if template is not None:
+            return template
+        with self._compile_lock:
+            template = self._get_cached_template(cache_key, globals)
+            if template is None:
+                template = self.loader.load(self, name, self.make_globals(globals))
+                self.cache[cache_key] = template
+        return template
+
+    @contextmanager
+    def record_loaded_templates(self):
+        """Context manager yielding the set of template names loaded by the current thread while in the context."""
+        self._recorder.loaded_templates = set()
+        try:
+            yield self._recorder.loaded_templates
+        finally:
+            self._recorder.loaded_templates = None
+
+
+class DjangoBytecodeCache(BytecodeCache):
+    """Jinja2 bytecode cache stored in the Django cache, so the templates compiled by a worker are shared by all."""
+
+    def __init__(self, timeout):
+        """Initialize the cache with the amount of seconds the compiled templates are kept."""
+        self.timeout = timeout
+
+    def load_bytecode(self, bucket):
+        """Load the compiled template of the bucket, Jinja2 discards it when the template source changed."""
+        code = cache.get(f"nautobot_golden_config.jinja_bytecode.{bucket.key}")
+        if code is not None:
+            bucket.bytecode_from_string(code)
+
+    def dump_bytecode(self, bucket):
+        """Store the compiled template of the bucket."""
+        cache.set(
+            f"nautobot_golden_config.jinja_bytecode.{bucket.key}", bucket.bytecode_to_string(), timeout=self.timeout
+        )
+
+
 def get_django_env():
     """Load Django Jinja filters from the Django jinja template engine, and add them to the jinja_env.
 
     Returns:
-        SandboxedEnvironment
+        TemplateDependencyEnvironment
     """
     # Use a custom Jinja2 environment instead of Django's to avoid HTML escaping
-    jinja_env = SandboxedEnvironment(**JINJA_ENV)
+    bytecode_cache = None
+    if JINJA_BYTECODE_CACHE_TIMEOUT:
+        bytecode_cache = DjangoBytecodeCache(JINJA_BYTECODE_CACHE_TIMEOUT)
+    elif JINJA_BYTECODE_CACHE_DIR:
+        os.makedirs(JINJA_BYTECODE_CACHE_DIR, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(JINJA_BYTECODE_CACHE_DIR)
+    jinja_env = TemplateDependencyEnvironment(bytecode_cache=bytecode_cache, **JINJA_ENV)
     jinja_env.filters = engines["jinja"].env.filters
     return jinja_env
 
 
+def precompile_jinja_templates(path):
+    """Helper function to compile the templates of a Jinja repository, storing them in the bytecode cache.
+
+    Args:
+        path (str): The filesystem path of the Jinja repository.
+
+    Returns:
+        tuple: The amount of compiled templates, and the list of `(template name, error)` of the invalid templates.
+    """
+    jinja_env = get_django_env()
+    jinja_env.loader = FileSystemLoader(path)
+    template_names = jinja_env.list_templates(
+        filter_func=lambda name: name.endswith(JINJA_TEMPLATE_EXTENSIONS) and not name.startswith(".")
+    )
+    errors = []
+    for template_name in template_names:
+        try:
+            jinja_env.get_template(template_name)
+        except jinja_errors.TemplateError as error:
+            errors.append((template_name, error))
+    return len(template_names) - len(errors), errors
+
+
+@lru_cache(maxsize=256)
+def get_compiled_path_template(template):
+    """Return the compiled template of a GoldenConfigSetting path template, compiled once per worker.
+
+    Args:
+        template (str): A Jinja2 template, e.g. the `backup_path_template` of a GoldenConfigSetting.
+
+    Returns:
+        Template: The ``template`` compiled with the Nautobot Jinja2 environment, edited templates are compiled again.
+    """
+    return engines["jinja"].env.from_string(template)
+
+
 def render_jinja_template(obj, logger, template):
     """
     Helper function to render Jinja templates.
@@ -140,7 +369,8 @@ def render_jinja_template(obj, logger, template):
         NornirNautobotException: When there is an error rendering the ``template``.
     """
     try:
-        return render_jinja2(template_code=template, context={"obj": obj})
+        # Concatenated to a string, as the Nautobot `render_jinja2` does, so the output is not marked as safe.
+        return "" + get_compiled_path_template(template).render({"obj": obj})
     except jinja_errors.UndefinedError as error:
         error_msg = (
             "`E3019:` Jinja encountered and UndefinedError`, check the template for missing variable definitions.\n"
@@ -169,24 +399,33 @@ def render_jinja_template(obj, logger, template):
         raise NornirNautobotException(error_msg)
 
 
+def get_device_settings(device):
+    """Helper function to return the GoldenConfigSetting of a device with the highest weight, or None."""
+    dynamic_group = (
+        device.dynamic_groups.exclude(golden_config_setting__isnull=True)
+        .order_by("-golden_config_setting__weight")
+        .select_related("golden_config_setting")
+        .first()
+    )
+    return dynamic_group.golden_config_setting if dynamic_group else None
+
+
 def get_device_to_settings_map(queryset):
     """Helper function to map settings to devices."""
     device_to_settings_map = {}
     update_dynamic_groups_cache()
     for device in queryset:
-        dynamic_group = device.dynamic_groups.exclude(golden_config_setting__isnull=True).order_by(
-            "-golden_config_setting__weight"
-        )
-        if dynamic_group.exists():
-            device_to_settings_map[device.id] = dynamic_group.first().golden_config_setting
+        device_settings = get_device_settings(device)
+        if device_settings:
+            device_to_settings_map[device.id] = device_settings
     return device_to_settings_map
 
 
 def get_json_config(config):
     """Helper to JSON load config files."""
     try:
-        return json.loads(config)
-    except json.decoder.JSONDecodeError:
+        return json_codec.loads(config)
+    except json_codec.JSONDecodeError:
         return None
 
 
@@ -254,10 +493,50 @@ def dispatch_params(method, platform, logger):
     return params
 
 
+def get_compiled_xpath(match_config):
+    """Return the compiled XPath of a rule, compiled once per thread as XPath objects are not thread safe.
+
+    Raises:
+        etree.XPathSyntaxError: When the expression is not valid.
+    """
+    compiled_xpaths = getattr(_XPATH_CACHE, "compiled", None)
+    if compiled_xpaths is None:
+        compiled_xpaths = _XPATH_CACHE.compiled = {}
+    if match_config not in compiled_xpaths:
+        if len(compiled_xpaths) >= XPATH_CACHE_SIZE:
+            compiled_xpaths.clear()
+        compiled_xpaths[match_config] = etree.XPath(match_config)
+    return compiled_xpaths[match_config]
+
+
+def _copy_ancestor(ancestor, config_xml):
+    """Return a copy of an ancestor of matched elements without its children, with the namespaces `deepcopy` declares.
+
+    These are the namespaces the ancestor declares, and for a child of the root the namespaces of the root used in its
+    subtree, the root being created without them. Deeper ancestors inherit those from their created parent.
+    """
+    parent_nsmap = ancestor.getparent().nsmap
+    nsmap = {prefix: uri for prefix, uri in ancestor.nsmap.items() if parent_nsmap.get(prefix) != uri}
+    if ancestor.getparent() is config_xml:
+        used = {
+            etree.QName(name).namespace
+            for node in ancestor.iter(tag=etree.Element)
+            for name in [node.tag, *node.attrib]
+        }
+        nsmap.update((prefix, uri) for prefix, uri in parent_nsmap.items() if uri in used and prefix not in nsmap)
+    copied_ancestor = etree.Element(ancestor.tag, dict(ancestor.attrib), nsmap=nsmap)
+    copied_ancestor.text = ancestor.text
+    return copied_ancestor
+
+
 def get_xml_subtree_with_full_path(config_xml, match_config):
     """
     Extracts a subtree from an XML configuration based on a provided XPath expression and rebuilds the full path from the root.
 
+    The matched elements are copied once into a single skeleton tree, where their ancestors are created once, without
+    their children, and shared by all the matched elements below them. Elements below another matched element are
+    already part of its copy. The ancestors declare the same namespaces as their copies with `deepcopy` did.
+
     Args:
         config_xml (etree.Element): The root of the XML configuration from which to extract the subtree.
         match_config (str): An XPath expression that specifies the elements to include in the subtree.
@@ -265,18 +544,24 @@ def get_xml_subtree_with_full_path(config_xml, match_config):
     Returns:
         str: The XML subtree as a string, including all elements specified by the XPath expression and their full paths from the root.
     """
-    config_elements = config_xml.xpath(match_config)
     new_root = etree.Element(config_xml.tag)
-    for element in config_elements:
-        current_element = new_root
-        for parent in reversed(list(element.iterancestors())):  # from root to parent
-            if parent is config_xml:  # skip the root
-                continue
-            copied_parent = deepcopy(parent)
-            copied_parent[:] = []  # remove children
+    skeleton = {config_xml: new_root}
+    matched = set()
+    for element in get_compiled_xpath(match_config)(config_xml):
+        missing_ancestors = []
+        ancestor = element.getparent()
+        while ancestor is not None and ancestor not in skeleton and ancestor not in matched:
+            missing_ancestors.append(ancestor)
+            ancestor = ancestor.getparent()
+        if ancestor in matched:
+            continue
+        current_element = skeleton[ancestor] if ancestor is not None else new_root
+        for parent in reversed(missing_ancestors):  # from the closest created ancestor to the parent
+            copied_parent = _copy_ancestor(parent, config_xml)
             current_element.append(copied_parent)
-            current_element = copied_parent
+            skeleton[parent] = current_element = copied_parent
         current_element.append(deepcopy(element))
+        matched.add(element)
     return etree.tostring(new_root, encoding="unicode", pretty_print=True)
 
 
@@ -0,0 +1,106 @@
+"""JSON codec of the app, using orjson when it is installed and the standard library `json` otherwise."""
+
+import json
+import math
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# Raised by `loads` on invalid JSON, orjson's error is a subclass of it.
+JSONDecodeError = json.JSONDecodeError
+
+# Leave to `default` what the standard library does not serialize either, so both give the same result.
+_ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+)
+
+
+def loads(data):
+    """Parse JSON text or bytes.
+
+    orjson is stricter than `json` on a few documents, such as the ones with `NaN` or nested too deeply, these are
+    parsed with `json`.
+
+    Raises:
+        JSONDecodeError: When the data is not valid JSON.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+def _orjson_dumps(value, indent=None, sort_keys=False, default=None):
+    """Serialize a value with orjson, returning None when orjson is not installed or can not serialize it."""
+    if orjson is None or indent not in (None, 2):
+        return None
+    option = _ORJSON_OPTIONS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    try:
+        return orjson.dumps(value, default=default, option=option)
+    except orjson.JSONEncodeError:
+        # Such as integers over 64 bits, serialized by `json`.
+        return None
+
+
+def _replace_non_finite(value):
+    """Return a copy of a value with its NaN and infinities replaced by None, as orjson serializes them."""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {key: _replace_non_finite(child) for key, child in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_replace_non_finite(child) for child in value]
+    return value
+
+
+def dumps(value, indent=None, sort_keys=False, default=None):
+    """Serialize a value to JSON text, compact or indented by `indent` spaces, without escaping non-ASCII characters.
+
+    NaN and infinities, which are not valid JSON, are serialized as `null` with both backends. The text is otherwise
+    not the same with both backends, orjson formats some floats differently, such as `1e+16` for `1e16`, so it must
+    not be hashed, see `get_intended_fingerprint`.
+
+    Args:
+        value (any): The value to serialize.
+        indent (int): The amount of spaces to indent with, None for compact JSON.
+        sort_keys (bool): Whether the keys of the dictionaries are sorted.
+        default (callable): Function returning a serializable version of the values that are not.
+
+    Raises:
+        TypeError: When the value can not be serialized, as `json.dumps` does.
+    """
+    data = _orjson_dumps(value, indent=indent, sort_keys=sort_keys, default=default)
+    if data is not None:
+        return data.decode("utf-8")
+    options = {
+        "indent": indent,
+        "sort_keys": sort_keys,
+        "default": default,
+        "ensure_ascii": False,
+        "separators": (",", ":") if indent is None else None,
+    }
+    try:
+        return json.dumps(value, allow_nan=False, **options)
+    except ValueError:
+        # Raised again for the errors other than NaN and infinities, such as circular references.
+        json.dumps(value, **options)
+    return json.dumps(_replace_non_finite(value), **options)
+
+
+def is_jsonable(value):
+    """Check if a value can be serialized to JSON."""
+    if _orjson_dumps(value) is not None:
+        return True
+    try:
+        json.dumps(value)
+        return True
+    except (TypeError, OverflowError):
+        return False
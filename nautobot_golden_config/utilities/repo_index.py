@@ -0,0 +1,124 @@
+"""Index of the files of the backup and intended repositories, built when they are synced and shared by the jobs."""
+
+import logging
+import os
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from git import Repo
+from git.exc import GitError
+
+LOGGER = logging.getLogger(__name__)
+
+CACHE_PREFIX = "nautobot_golden_config.repo_index"
+
+
+def build_repository_index(path):
+    """Build the index of the files of a local repository, with a single walk of its directories.
+
+    Args:
+        path (str): The filesystem path of the repository.
+
+    Returns:
+        dict: The `commit` the index was built at, and the `files` as `{relative path: (size, blob SHA, mtime)}`.
+            The blob SHA is None for the files that are not committed, or changed since the last commit.
+
+    Raises:
+        GitError: When the path is not a git repository.
+    """
+    repo = Repo(path)
+    blob_shas = {}
+    for line in repo.git.ls_files("--stage", "-z").split("\0"):
+        if line:
+            metadata, relative_path = line.split("\t", 1)
+            blob_shas[relative_path] = metadata.split()[1]
+    for relative_path in repo.git.diff("--name-only", "-z", "HEAD").split("\0"):
+        blob_shas.pop(relative_path, None)
+
+    files = {}
+    directories = [path]
+    while directories:
+        with os.scandir(directories.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name != ".git":
+                        directories.append(entry.path)
+                elif entry.is_file():
+                    relative_path = os.path.relpath(entry.path, path).replace(os.sep, "/")
+                    stat = entry.stat()
+                    files[relative_path] = (stat.st_size, blob_shas.get(relative_path), stat.st_mtime)
+    return {"commit": repo.head.commit.hexsha, "files": files}
+
+
+def _cache_key(repository_record):
+    """Return the cache key of the index of a repository."""
+    return f"{CACHE_PREFIX}.{repository_record.pk}"
+
+
+def refresh_repository_index(repository_record):
+    """Build the index of a repository and store it in the Django cache, for the jobs to use.
+
+    Args:
+        repository_record (GitRepository): The repository to index.
+
+    Returns:
+        dict: The index of the repository, or None when it is not a git repository.
+    """
+    try:
+        index = build_repository_index(repository_record.filesystem_path)
+    except (GitError, ValueError, OSError) as error:
+        LOGGER.debug("Could not index repository `%s`: %s", repository_record, error)
+        return None
+    cache.set(_cache_key(repository_record), index, timeout=None)
+    return index
+
+
+def delete_repository_index(repository_record):
+    """Delete the index of a deleted repository."""
+    cache.delete(_cache_key(repository_record))
+
+
+@contextmanager
+def writing_repository_files(device_to_settings_map, repo_type):
+    """Invalidate the indexes of the repositories a play writes files to, before and after it writes them.
+
+    Args:
+        device_to_settings_map (dict): The device to GoldenConfigSetting mapping of the play.
+        repo_type (str): The GoldenConfigSetting attribute of the repositories written, e.g. `backup_repository`.
+    """
+    cache_keys = {
+        _cache_key(getattr(settings, repo_type))
+        for settings in set(device_to_settings_map.values())
+        if getattr(settings, repo_type, None)
+    }
+    cache.delete_many(cache_keys)
+    try:
+        yield
+    finally:
+        cache.delete_many(cache_keys)
+
+
+def get_repository_index(repository_record):
+    """Return the index of a repository, built again when the local repository moved since it was built.
+
+    The repositories are synced by each job, so the index is only used when it was built at the current commit of the
+    local repository. The working tree is not checked for uncommitted changes, which would walk it on every lookup:
+    the index is invalidated where the app writes files, see `writing_repository_files`, and built again once they
+    are committed by `gc_repo_push`.
+
+    Args:
+        repository_record (GitRepository): The repository to return the index of.
+
+    Returns:
+        dict: The index of the repository, or None when it is not a git repository.
+    """
+    try:
+        repo = Repo(repository_record.filesystem_path)
+        commit = repo.head.commit.hexsha
+    except (GitError, ValueError, OSError) as error:
+        LOGGER.debug("Could not index repository `%s`: %s", repository_record, error)
+        return None
+    index = cache.get(_cache_key(repository_record))
+    if index and index["commit"] == commit:
+        return index
+    return refresh_repository_index(repository_record)
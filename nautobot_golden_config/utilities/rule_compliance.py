@@ -0,0 +1,276 @@
+"""Functions to recompute the compliance of changed rules and devices, from the configurations stored in the database."""
+
+import logging
+import threading
+
+from django.utils import timezone
+
+from nautobot_golden_config.models import ComplianceRule, ConfigCompliance, GoldenConfig
+from nautobot_golden_config.nornir_plays.config_compliance import get_config_element
+from nautobot_golden_config.utilities.compliance_diff import diff_configs
+from nautobot_golden_config.utilities.constant import COMPLIANCE_AFTER_BACKUP_BATCH_SIZE, STORE_COMPLIANCE_DIFF
+from nautobot_golden_config.utilities.helper import get_task_queues
+
+LOGGER = logging.getLogger(__name__)
+
+# Amount of devices whose configurations are loaded, and results written, at once.
+BATCH_SIZE = 500
+
+UPDATED_FIELDS = [
+    "actual",
+    "intended",
+    "compliance",
+    "compliance_int",
+    "ordered",
+    "missing",
+    "extra",
+    "remediation",
+    "last_updated",
+]
+
+
+def _build_compliance(rule_entry, golden_config, existing, logger, parsed_configs=None):
+    """Return the ConfigCompliance of a device for a rule, with its stored configurations, not computed nor saved.
+
+    Args:
+        rule_entry (dict): The rule, as `{"obj", "ordered", "section"}` like the compliance play uses.
+        golden_config (GoldenConfig): The Golden Config of the device, with its stored configurations.
+        existing (dict): The existing ConfigCompliance of the rule, keyed by device pk.
+        logger (logging.Logger): Logger to log messages to.
+        parsed_configs (dict): The JSON configurations of the device already parsed, see `get_config_element`.
+    """
+    device = golden_config.device
+    rule = rule_entry["obj"]
+    compliance = existing.get(device.pk) or ConfigCompliance(device=device)
+    compliance.rule = rule
+    compliance.device = device
+    compliance.actual = get_config_element(rule_entry, golden_config.backup_config, device, logger, parsed_configs)
+    compliance.intended = get_config_element(rule_entry, golden_config.intended_config, device, logger, parsed_configs)
+    return compliance
+
+
+def _get_rule_entry(rule):
+    """Return a rule as `{"obj", "ordered", "section"}`, like the compliance play uses."""
+    return {"obj": rule, "ordered": rule.config_ordered, "section": rule.match_config.splitlines()}
+
+
+def save_compliances(compliances, now):
+    """Create the new ConfigCompliance and update the existing ones, with one bulk write each."""
+    to_create, to_update = [], []
+    for compliance in compliances:
+        compliance.last_updated = now
+        (to_update if compliance.present_in_database else to_create).append(compliance)
+    ConfigCompliance.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+    ConfigCompliance.objects.bulk_update(to_update, UPDATED_FIELDS, batch_size=BATCH_SIZE)
+
+
+def _recompute_batch(rule, golden_configs, logger):
+    """Recompute the compliance of a rule for a batch of devices, with one read and two bulk writes.
+
+    The devices are computed together, see `ConfigCompliance.compute_batch`, and one by one when that fails, to
+    only count the devices that failed.
+
+    Returns:
+        tuple: The amount of devices recomputed, and of devices that failed.
+    """
+    rule_entry = _get_rule_entry(rule)
+    existing = {
+        compliance.device_id: compliance
+        for compliance in ConfigCompliance.objects.filter(
+            rule=rule, device__in=[golden_config.device_id for golden_config in golden_configs]
+        )
+    }
+    compliances, failed = [], 0
+    for golden_config in golden_configs:
+        try:
+            compliances.append(_build_compliance(rule_entry, golden_config, existing, logger))
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            logger.warning("Unable to recompute the compliance of `%s` for `%s`: %s", rule, golden_config.device, error)
+            failed += 1
+    try:
+        ConfigCompliance.compute_batch(compliances)
+    except Exception:  # pylint: disable=broad-exception-caught
+        computed = []
+        for compliance in compliances:
+            try:
+                ConfigCompliance.compute_batch([compliance])
+                computed.append(compliance)
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                logger.warning(
+                    "Unable to recompute the compliance of `%s` for `%s`: %s", rule, compliance.device, error
+                )
+                failed += 1
+        compliances = computed
+    save_compliances(compliances, timezone.now())
+    return len(compliances), failed
+
+
+def recompute_rule_compliance(rule, logger=LOGGER):
+    """Recompute the compliance of a rule for all the devices of its platform, from their stored configurations.
+
+    Devices without a stored backup or intended configuration are skipped, their compliance is left as is.
+
+    Args:
+        rule (ComplianceRule): The rule to recompute.
+        logger (logging.Logger): Logger to log messages to.
+
+    Returns:
+        tuple: The amount of devices recomputed, and of devices that failed.
+    """
+    golden_configs = (
+        GoldenConfig.objects.filter(device__platform=rule.platform)
+        .exclude(backup_config="")
+        .exclude(intended_config="")
+        .select_related("device__platform")
+        .only("device", "backup_config", "intended_config")
+    )
+    recomputed = failed = 0
+    batch = []
+    for golden_config in golden_configs.iterator(chunk_size=BATCH_SIZE):
+        batch.append(golden_config)
+        if len(batch) == BATCH_SIZE:
+            counts = _recompute_batch(rule, batch, logger)
+            recomputed, failed, batch = recomputed + counts[0], failed + counts[1], []
+    if batch:
+        counts = _recompute_batch(rule, batch, logger)
+        recomputed, failed = recomputed + counts[0], failed + counts[1]
+    logger.info("Recomputed the compliance of `%s` for %s devices, %s failed.", rule, recomputed, failed)
+    return recomputed, failed
+
+
+def recompute_platform_compliance(platform_pk=None, rule_pks=None, logger=LOGGER):
+    """Recompute the compliance of the given rules, or of all the rules of a platform.
+
+    Args:
+        platform_pk (str): The pk of the platform whose rules are recomputed, e.g. after a remediation setting change.
+        rule_pks (list): The pk of the rules to recompute.
+        logger (logging.Logger): Logger to log messages to.
+    """
+    rules = ComplianceRule.objects.select_related("feature", "platform")
+    if rule_pks is not None:
+        rules = rules.filter(pk__in=rule_pks)
+    if platform_pk is not None:
+        rules = rules.filter(platform=platform_pk)
+    for rule in rules:
+        recompute_rule_compliance(rule, logger)
+
+
+def recompute_device_compliance(device_pks, logger=LOGGER):
+    """Recompute the compliance of devices for all the rules of their platform, from their stored configurations.
+
+    Devices without a stored backup or intended configuration are skipped, their compliance is left as is.
+
+    Args:
+        device_pks (list): The pk of the devices to recompute.
+        logger (logging.Logger): Logger to log messages to.
+
+    Returns:
+        tuple: The amount of devices recomputed, and of devices that failed.
+    """
+    golden_configs = list(
+        GoldenConfig.objects.filter(device__in=device_pks)
+        .exclude(backup_config="")
+        .exclude(intended_config="")
+        .select_related("device__platform")
+    )
+    rules = {}
+    for rule in ComplianceRule.objects.filter(
+        platform__in={golden_config.device.platform_id for golden_config in golden_configs}
+    ).select_related("feature", "platform"):
+        rules.setdefault(rule.platform_id, []).append(_get_rule_entry(rule))
+    existing = {}
+    for compliance in ConfigCompliance.objects.filter(device__in=[gc.device_id for gc in golden_configs]):
+        existing.setdefault(compliance.rule_id, {})[compliance.device_id] = compliance
+
+    now = timezone.now()
+    compliances, recomputed, failed = [], [], 0
+    for golden_config in golden_configs:
+        device = golden_config.device
+        parsed_configs = {}
+        try:
+            device_compliances = [
+                _build_compliance(
+                    rule_entry, golden_config, existing.get(rule_entry["obj"].pk, {}), logger, parsed_configs
+                )
+                for rule_entry in rules.get(device.platform_id, [])
+            ]
+            ConfigCompliance.compute_batch(device_compliances)
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            logger.warning("Unable to recompute the compliance of `%s`: %s", device, error)
+            failed += 1
+            continue
+        compliances.extend(device_compliances)
+        golden_config.compliance_last_attempt_date = now
+        golden_config.compliance_last_success_date = now
+        golden_config.compliance_config = (
+            "\n".join(diff_configs(golden_config.backup_config, golden_config.intended_config))
+            if STORE_COMPLIANCE_DIFF
+            else ""
+        )
+        # The fingerprint is of the repository files, the next compliance job recomputes the device.
+        golden_config.compliance_fingerprint = ""
+        golden_config.last_updated = now
+        recomputed.append(golden_config)
+    save_compliances(compliances, now)
+    GoldenConfig.objects.bulk_update(
+        recomputed,
+        [
+            "compliance_last_attempt_date",
+            "compliance_last_success_date",
+            "compliance_config",
+            "compliance_fingerprint",
+            "last_updated",
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    logger.info("Recomputed the compliance of %s devices, %s failed.", len(recomputed), failed)
+    return len(recomputed), failed
+
+
+def apply_compliance_task(task, **kwargs):
+    """Enqueue a compliance task, on the `compliance` queue of `queue_routing` if set."""
+    options = {}
+    task_queues = get_task_queues("compliance")
+    if task_queues:
+        options["queue"] = task_queues[0]
+    task.apply_async(kwargs=kwargs, **options)
+
+
+class ComplianceBatcher:
+    """Coalesce the devices whose backup changed into batches, each batch enqueued as a single compliance task."""
+
+    def __init__(self, batch_size=COMPLIANCE_AFTER_BACKUP_BATCH_SIZE):
+        """Initialize the batcher.
+
+        Args:
+            batch_size (int): The amount of devices per compliance task.
+        """
+        self.batch_size = max(batch_size, 1)
+        self.enqueued = 0
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def add(self, device_pk):
+        """Add a device, enqueueing the pending devices once they fill a batch."""
+        with self._lock:
+            self._pending.append(str(device_pk))
+            if len(self._pending) < self.batch_size:
+                return
+            batch, self._pending = self._pending, []
+        self._enqueue(batch)
+
+    def flush(self):
+        """Enqueue the pending devices, at the end of the play."""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if batch:
+            self._enqueue(batch)
+
+    def _enqueue(self, device_pks):
+        """Enqueue the compliance task of a batch of devices."""
+        # pylint: disable=import-outside-toplevel,cyclic-import
+        from nautobot_golden_config.tasks import compliance_after_backup
+
+        apply_compliance_task(compliance_after_backup, device_pks=device_pks)
+        with self._lock:
+            self.enqueued += len(device_pks)
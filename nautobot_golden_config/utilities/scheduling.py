@@ -0,0 +1,114 @@
+"""Functions to order the devices of a play longest job first, based on the durations recorded on GoldenConfig."""
+
+import heapq
+
+from django.db.models import F
+from nautobot.dcim.models import Device
+from nautobot_plugin_nornir.constants import NORNIR_SETTINGS
+
+from nautobot_golden_config.utilities.helper import get_inventory_chunks
+
+# Default amount of workers of the Nornir threaded runner.
+DEFAULT_NUM_WORKERS = 20
+
+
+def order_by_duration(queryset, duration_field):
+    """Order the devices longest job first, devices without a recorded duration are considered the longest.
+
+    Args:
+        queryset (QuerySet): The Device queryset in scope of the play.
+        duration_field (str): The GoldenConfig duration field of the play, e.g. `backup_last_duration`.
+
+    Returns:
+        QuerySet: The ``queryset`` ordered by descending duration, then by the default Device ordering.
+    """
+    return queryset.order_by(F(f"goldenconfig__{duration_field}").desc(nulls_first=True), *Device._meta.ordering)
+
+
+def estimate_makespan(durations, num_workers):
+    """Estimate the time needed to run the durations, in order, with each one started by the first free worker.
+
+    Args:
+        durations (list): The duration, in seconds, of each task in the order they are started.
+        num_workers (int): The amount of tasks run in parallel.
+
+    Returns:
+        float: The estimated elapsed time, in seconds.
+    """
+    workers = [0.0] * max(1, min(num_workers, len(durations)))
+    for duration in durations:
+        heapq.heappush(workers, heapq.heappop(workers) + duration)
+    return max(workers)
+
+
+def get_makespan_estimates(queryset, ordered_queryset, duration_field, chunk_size):
+    """Estimate the makespan of a play with its default ordering and with the longest job first ordering.
+
+    Devices without a recorded duration are estimated with the average of the recorded ones, each inventory chunk
+    is run after the previous one finished.
+
+    Args:
+        queryset (QuerySet): The Device queryset in scope of the play, with its default ordering.
+        ordered_queryset (QuerySet): The same queryset, ordered longest job first.
+        duration_field (str): The GoldenConfig duration field of the play, e.g. `backup_last_duration`.
+        chunk_size (int): The maximum amount of devices per Nornir inventory.
+
+    Returns:
+        tuple: The default and the longest job first makespan estimates in seconds, or `None` when no duration was
+            recorded yet.
+    """
+    durations = dict(queryset.values_list("pk", f"goldenconfig__{duration_field}"))
+    recorded = [duration for duration in durations.values() if duration is not None]
+    if not recorded:
+        return None
+    average = sum(recorded) / len(recorded)
+    num_workers = NORNIR_SETTINGS.get("runner", {}).get("options", {}).get("num_workers", DEFAULT_NUM_WORKERS)
+
+    def _makespan(device_qs):
+        return sum(
+            estimate_makespan(
+                [average if durations[pk] is None else durations[pk] for pk in chunk_qs.values_list("pk", flat=True)],
+                num_workers,
+            )
+            for chunk_qs in get_inventory_chunks(device_qs, chunk_size)
+        )
+
+    return _makespan(queryset), _makespan(ordered_queryset)
+
+
+def log_makespan_estimates(logger, queryset, ordered_queryset, duration_field, chunk_size):
+    """Log how the longest job first ordering is expected to affect the makespan of a play.
+
+    Args:
+        logger (NornirLogger): Logger to log messages to.
+        queryset (QuerySet): The Device queryset in scope of the play, with its default ordering.
+        ordered_queryset (QuerySet): The same queryset, ordered longest job first.
+        duration_field (str): The GoldenConfig duration field of the play, e.g. `backup_last_duration`.
+        chunk_size (int): The maximum amount of devices per Nornir inventory.
+    """
+    estimates = get_makespan_estimates(queryset, ordered_queryset, duration_field, chunk_size)
+    if not estimates:
+        logger.debug("No recorded durations yet, the devices are run in their default order.")
+        return
+    default_makespan, ordered_makespan = estimates
+    logger.info(
+        f"Estimated makespan with longest job first ordering: {ordered_makespan:.1f}s, "
+        f"with the default ordering: {default_makespan:.1f}s."
+    )
+
+
+def schedule_longest_first(logger, queryset, duration_field, chunk_size):
+    """Order the devices of a play longest job first, and log the expected effect on the makespan.
+
+    Args:
+        logger (NornirLogger): Logger to log messages to.
+        queryset (QuerySet): The Device queryset in scope of the play.
+        duration_field (str): The GoldenConfig duration field of the play, e.g. `backup_last_duration`.
+        chunk_size (int): The maximum amount of devices per Nornir inventory.
+
+    Returns:
+        QuerySet: The ``queryset`` ordered longest job first.
+    """
+    ordered_queryset = order_by_duration(queryset, duration_field)
+    log_makespan_estimates(logger, queryset, ordered_queryset, duration_field, chunk_size)
+    return ordered_queryset
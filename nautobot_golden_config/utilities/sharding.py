@@ -0,0 +1,180 @@
+"""Functions to split the devices of a job in shards, each one run by a separate Celery worker."""
+
+import fcntl
+import logging
+import os
+from collections import defaultdict
+from contextlib import contextmanager
+
+from nautobot.dcim.models import Device
+from nautobot.extras.datasources.git import ensure_git_repository
+
+from nautobot_golden_config.choices import ShardTypeChoice
+from nautobot_golden_config.models import GoldenConfig, GoldenConfigSetting
+from nautobot_golden_config.utilities.repo_index import writing_repository_files
+
+# Configurations written by each play, as (GoldenConfig config field, success date field, repository, path field).
+PLAY_OUTPUTS = {
+    "config_backup": ("backup_config", "backup_last_success_date", "backup_repository", "backup_path"),
+    "config_intended": ("intended_config", "intended_last_success_date", "intended_repository", "intended_path"),
+}
+
+
+class ShardRequest:  # pylint: disable=too-few-public-methods
+    """Minimal request object, used as GraphQL context for the shard."""
+
+    def __init__(self, user):
+        """Set the user that is running the job."""
+        self.user = user
+
+
+class JobResultLogHandler(logging.Handler):
+    """Logging handler writing the records of a shard to the JobResult of the parent job, as JobLogEntry rows."""
+
+    def __init__(self, job_result):
+        """Set the JobResult the records are written to."""
+        super().__init__()
+        self.job_result = job_result
+
+    def emit(self, record):
+        """Write the record to the JobResult, with the `object` and `grouping` extras of the record."""
+        try:
+            self.job_result.log(
+                message=self.format(record),
+                level_choice=record.levelname.lower(),
+                obj=getattr(record, "object", None),
+                grouping=getattr(record, "grouping", record.funcName),
+            )
+        except Exception:  # pylint: disable=broad-exception-caught
+            self.handleError(record)
+
+
+class ShardJob:  # pylint: disable=too-few-public-methods
+    """Stand-in of the parent Job, providing the attributes the Nornir plays use, restricted to the devices of a shard."""
+
+    def __init__(self, job_result, device_to_settings, log_level):
+        """Initialize the shard from the parent JobResult and the `{device pk: GoldenConfigSetting pk}` mapping.
+
+        Args:
+            job_result (JobResult): The JobResult of the parent job, shard logs are written to it.
+            device_to_settings (dict): Mapping of the devices in the shard to the pk of their GoldenConfigSetting.
+            log_level (int): The log level of the parent job.
+        """
+        self.job_result = job_result
+        # Not registered with `logging.getLogger`, so each shard gets its own handler and is released once done.
+        self.logger = logging.Logger(f"{__name__}.{job_result.pk}", level=log_level)
+        self.logger.parent = logging.getLogger(__name__)
+        self.logger.addHandler(JobResultLogHandler(job_result))
+        self.user = job_result.user
+        self.request = ShardRequest(self.user)
+        self.qs = Device.objects.filter(pk__in=list(device_to_settings))
+        settings = {
+            str(pk): setting for pk, setting in GoldenConfigSetting.objects.in_bulk(device_to_settings.values()).items()
+        }
+        self.device_to_settings_map = {
+            device_pk: settings[device_to_settings[str(device_pk)]]
+            for device_pk in self.qs.values_list("pk", flat=True)
+        }
+
+
+def get_device_shards(queryset, device_to_settings_map, shard_type, shard_size=None):
+    """Split the devices of a job in shards.
+
+    Args:
+        queryset (QuerySet): The Device queryset in scope of the job.
+        device_to_settings_map (dict): The device to GoldenConfigSetting mapping of the job.
+        shard_type (str): One of `ShardTypeChoice`, how the devices are grouped in shards.
+        shard_size (int): The maximum amount of devices per shard, larger groups are split.
+
+    Returns:
+        list: A list of `{device pk: GoldenConfigSetting pk}` dictionaries, one per shard.
+    """
+    if shard_type in (None, "", ShardTypeChoice.TYPE_NONE):
+        return []
+
+    groups = defaultdict(list)
+    for device_pk, location_pk in queryset.values_list("pk", "location"):
+        if device_pk not in device_to_settings_map:
+            continue
+        if shard_type == ShardTypeChoice.TYPE_LOCATION:
+            group_key = location_pk
+        elif shard_type == ShardTypeChoice.TYPE_SETTING:
+            group_key = device_to_settings_map[device_pk].pk
+        else:
+            group_key = None
+        groups[group_key].append(device_pk)
+
+    shards = []
+    for device_pks in groups.values():
+        size = shard_size or len(device_pks)
+        for index in range(0, len(device_pks), size):
+            shards.append(
+                {
+                    str(device_pk): str(device_to_settings_map[device_pk].pk)
+                    for device_pk in device_pks[index : index + size]  # noqa: E203
+                }
+            )
+    return shards
+
+
+@contextmanager
+def repository_lock(repository_record):
+    """Hold an exclusive lock on the local copy of a repository, so the shards of a host do not sync it at once.
+
+    Args:
+        repository_record (GitRepository): The repository synced while the lock is held.
+    """
+    lock_path = f"{repository_record.filesystem_path.rstrip(os.sep)}.lock"
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, "w", encoding="utf8") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def ensure_shard_repositories(shard_job, repo_types):
+    """Make sure the worker running a shard has a local copy of the repositories, at the commit of the parent job.
+
+    Args:
+        shard_job (ShardJob): The shard being run.
+        repo_types (list): The GoldenConfigSetting repository attributes used by the play.
+    """
+    repository_records = set()
+    for settings in set(shard_job.device_to_settings_map.values()):
+        for repo_type in repo_types:
+            repository_record = getattr(settings, repo_type, None)
+            if repository_record:
+                repository_records.add(repository_record)
+    for repository_record in repository_records:
+        with repository_lock(repository_record):
+            ensure_git_repository(repository_record, head=repository_record.current_head)
+
+
+def write_shard_configs(job, play_name, since):
+    """Write the configurations persisted by the shards to the repositories of the parent job, before they are committed.
+
+    Shards may run on workers that do not share the filesystem of the parent job, so the files are written again
+    from the content and the path persisted on GoldenConfig.
+
+    Args:
+        job (Job): The parent job.
+        play_name (str): The name of the play the shards ran.
+        since (datetime): Only configurations successfully updated after this date are written.
+    """
+    if play_name not in PLAY_OUTPUTS:
+        return
+    config_field, date_field, repo_type, path_field = PLAY_OUTPUTS[play_name]
+    golden_configs = GoldenConfig.objects.filter(device__in=job.qs, **{f"{date_field}__gte": since}).only(
+        "device", config_field, path_field
+    )
+    with writing_repository_files(job.device_to_settings_map, repo_type):
+        for golden_config in golden_configs.iterator():
+            settings = job.device_to_settings_map.get(golden_config.device_id)
+            if not settings or not getattr(settings, repo_type) or not getattr(golden_config, path_field):
+                continue
+            file_path = os.path.join(getattr(settings, repo_type).filesystem_path, getattr(golden_config, path_field))
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, "w", encoding="utf-8") as config_file:
+                config_file.write(getattr(golden_config, config_field))
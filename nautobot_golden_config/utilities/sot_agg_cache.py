@@ -0,0 +1,77 @@
+"""Versioned cache of the SoT aggregation query results, shared by the jobs, the views and the postprocessing."""
+
+import hashlib
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+from nautobot_golden_config.utilities.constant import SOT_AGG_CACHE_TIMEOUT
+
+CACHE_PREFIX = "nautobot_golden_config.sot_agg"
+GLOBAL_VERSION_KEY = f"{CACHE_PREFIX}.version"
+
+
+def _device_version_key(device_pk):
+    """Return the cache key of the data version of a device."""
+    return f"{CACHE_PREFIX}.version.{device_pk}"
+
+
+def bump_device_versions(device_pks):
+    """Invalidate the cached results of the devices, once the current transaction is committed.
+
+    Args:
+        device_pks (list): The pk of the devices whose aggregated data changed.
+    """
+    if not SOT_AGG_CACHE_TIMEOUT:
+        return
+    version_keys = {_device_version_key(device_pk) for device_pk in device_pks if device_pk}
+    if version_keys:
+        transaction.on_commit(lambda: cache.set_many({key: uuid.uuid4().hex for key in version_keys}, timeout=None))
+
+
+def bump_global_version():
+    """Invalidate the cached results of all the devices, once the current transaction is committed."""
+    if not SOT_AGG_CACHE_TIMEOUT:
+        return
+    transaction.on_commit(lambda: cache.set(GLOBAL_VERSION_KEY, uuid.uuid4().hex, timeout=None))
+
+
+def get_cache_key(request, device, query, query_id=None):
+    """Return the cache key of the SoT aggregation result of a device, for its current data version.
+
+    The versions are random tokens rather than counters, so an evicted version can not match older results.
+
+    Args:
+        request (HttpRequest): The request, its user is part of the key as the results depend on its permissions.
+        device (Device): The device the query is run for.
+        query (str): The GraphQL query text.
+        query_id (str): The pk of the GraphQLQuery of the query, if any.
+
+    Returns:
+        str: The cache key, or None when the cache is disabled.
+    """
+    if not SOT_AGG_CACHE_TIMEOUT:
+        return None
+    version_keys = [GLOBAL_VERSION_KEY, _device_version_key(device.pk)]
+    versions = cache.get_many(version_keys)
+    for version_key in version_keys:
+        if version_key not in versions:
+            cache.add(version_key, uuid.uuid4().hex, timeout=None)
+            versions[version_key] = cache.get(version_key)
+    user_pk = getattr(getattr(request, "user", None), "pk", None)
+    key_parts = [str(device.pk), str(query_id), query, str(user_pk)] + [str(versions[key]) for key in version_keys]
+    return f"{CACHE_PREFIX}.{hashlib.sha256(chr(0).join(key_parts).encode('utf-8')).hexdigest()}"
+
+
+def get_cached_result(cache_key):
+    """Return the cached `(status, data)` result of a device, or None when not cached."""
+    if not cache_key:
+        return None
+    return cache.get(cache_key)
+
+
+def set_cached_result(cache_key, result):
+    """Cache the `(status, data)` result of a device, failed results are not cached."""
+    if cache_key and result[0] == 200:  # noqa: PLR2004
+        cache.set(cache_key, result, timeout=SOT_AGG_CACHE_TIMEOUT)
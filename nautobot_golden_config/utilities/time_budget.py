@@ -0,0 +1,184 @@
+"""Functions to bound the time a play spends on the fleet, and on each device."""
+
+import os
+import threading
+import time
+
+from nornir.core.inventory import ConnectionOptions
+from nornir.core.task import Result, Task
+from nornir_nautobot.exceptions import NornirNautobotException
+
+from nautobot_golden_config.models import GoldenConfig
+
+# Options of the Nornir connection plugins bounding how long a connection to a device can wait.
+CONNECTION_TIMEOUT_OPTIONS = {
+    "napalm": ["timeout"],
+    "netmiko": ["conn_timeout", "auth_timeout", "banner_timeout", "read_timeout_override"],
+    "scrapli": ["timeout_socket", "timeout_transport", "timeout_ops"],
+}
+
+
+class TimeBudget:
+    """The deadline of a job and the time budget of each device per play."""
+
+    def __init__(self, deadline=None, device_budget=None):
+        """Initialize the budget.
+
+        Args:
+            deadline (float): The epoch timestamp after which no device is started anymore, no deadline when not set.
+            device_budget (int): The maximum amount of seconds per device per play, no budget when not set.
+        """
+        self.deadline = deadline
+        self.device_budget = device_budget
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_job_data(cls, data):
+        """Create the budget from the `deadline` (minutes from now) and `device_time_budget` (seconds) job inputs."""
+        deadline = time.time() + data["deadline"] * 60 if data.get("deadline") else None
+        return cls(deadline=deadline, device_budget=data.get("device_time_budget") or None)
+
+    def expired(self):
+        """Whether the deadline was reached."""
+        return self.deadline is not None and time.time() >= self.deadline
+
+    def skip(self, count=1):
+        """Record devices skipped because the deadline was reached."""
+        with self._lock:
+            self.skipped += count
+
+    def get_device_timeout(self):
+        """Return the amount of seconds a device can run for, bound by its budget and the deadline, if any."""
+        timeouts = []
+        if self.device_budget:
+            timeouts.append(self.device_budget)
+        if self.deadline is not None:
+            timeouts.append(max(self.deadline - time.time(), 0))
+        return min(timeouts) if timeouts else None
+
+
+class DeviceBudget:
+    """The time budget of a device for a play stage, checked by the stage before it writes its results."""
+
+    def __init__(self, stage, timeout=None):
+        """Start the budget.
+
+        Args:
+            stage (str): The name of the play stage, one of `backup`, `intended` or `compliance`.
+            timeout (float): The amount of seconds the device can run for, no budget when not set.
+        """
+        self.stage = stage
+        self.timeout = timeout
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.timed_out = False
+
+    def expired(self):
+        """Whether the device exceeded its budget."""
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def check(self, obj, logger):
+        """Mark the device as timed out on GoldenConfig and fail it, when it exceeded its budget.
+
+        Args:
+            obj (Device): The device of the Nornir host.
+            logger (NornirLogger): Logger to log messages to.
+
+        Raises:
+            NornirNautobotException: If the device exceeded its budget, so its results are not written.
+        """
+        if not self.expired():
+            return
+        self.timed_out = True
+        GoldenConfig.objects.update_or_create(device=obj, defaults={f"{self.stage}_timed_out": True})
+        error_msg = f"`E3033:` The {self.stage} did not complete within its time budget of {self.timeout:.0f} seconds."
+        logger.error(error_msg, extra={"object": obj})
+        raise NornirNautobotException(error_msg)
+
+
+def bound_connection_timeouts(host, timeout):
+    """Bound the timeouts of the connections of a Nornir host to the time budget of the device.
+
+    Args:
+        host (Host): The Nornir host.
+        timeout (float): The amount of seconds the device can run for.
+    """
+    for connection, timeout_options in CONNECTION_TIMEOUT_OPTIONS.items():
+        parameters = host.get_connection_parameters(connection)
+        extras = dict(parameters.extras or {})
+        for option in timeout_options:
+            extras[option] = min(extras[option], timeout) if isinstance(extras.get(option), (int, float)) else timeout
+        host.connection_options[connection] = ConnectionOptions(
+            hostname=parameters.hostname,
+            port=parameters.port,
+            username=parameters.username,
+            password=parameters.password,
+            platform=parameters.platform,
+            extras=extras,
+        )
+
+
+def check_within_budget(device_budget, obj, logger):
+    """Fail a device that exceeded its time budget, before a step of its play that can not be interrupted.
+
+    Args:
+        device_budget (DeviceBudget): The time budget of the device, if any.
+        obj (Device): The device of the Nornir host.
+        logger (NornirLogger): Logger to log messages to.
+    """
+    if device_budget:
+        device_budget.check(obj, logger)
+
+
+def write_within_budget(device_budget, obj, logger, file_path, content):
+    """Write a result file of a device, once checked the device is within its time budget.
+
+    Args:
+        device_budget (DeviceBudget): The time budget of the device, if any.
+        obj (Device): The device of the Nornir host.
+        logger (NornirLogger): Logger to log messages to.
+        file_path (str): The path of the file in its repository.
+        content (str): The content of the file.
+    """
+    check_within_budget(device_budget, obj, logger)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "w", encoding="utf8") as filehandler:
+        filehandler.write(content)
+
+
+def run_within_budget(  # pylint: disable=too-many-arguments
+    task: Task, stage_task, stage, time_budget, logger, **kwargs
+) -> Result:
+    """Nornir task running a play task for a device, within the time budget of the job.
+
+    Devices are skipped once the deadline is reached. The connections to a device are bounded by its time budget,
+    and the play task checks the budget before writing its results, so a device exceeding it is marked as timed out
+    on GoldenConfig and failed, without any of its results written.
+
+    Args:
+        task (Task): Nornir task individual object
+        stage_task (function): The Nornir task of the play, e.g. `run_backup`, called with a `device_budget` argument.
+        stage (str): The name of the play stage, one of `backup`, `intended` or `compliance`.
+        time_budget (TimeBudget): The time budget of the job.
+        logger (NornirLogger): Logger to log messages to.
+        kwargs (dict): The arguments of ``stage_task``.
+
+    Returns:
+        result (Result): Result from Nornir task
+    """
+    obj = task.host.data["obj"]
+    if time_budget.expired():
+        time_budget.skip()
+        logger.warning(f"Skipped the {stage}, the job deadline was reached.", extra={"object": obj})
+        return Result(host=task.host)
+
+    device_budget = DeviceBudget(stage, time_budget.get_device_timeout())
+    if device_budget.timeout is not None:
+        bound_connection_timeouts(task.host, device_budget.timeout)
+    try:
+        return stage_task(task, logger=logger, device_budget=device_budget, **kwargs)
+    except Exception:  # pylint: disable=broad-exception-caught
+        # A connection interrupted by its bounded timeout fails the device as timed out, rather than with its error.
+        if not device_budget.timed_out and device_budget.expired():
+            device_budget.check(obj, logger)
+        raise
@@ -1,6 +1,5 @@
 """Django views for Nautobot Golden Configuration."""  # pylint: disable=too-many-lines
 
-import json
 import logging
 from datetime import datetime
 
@@ -24,7 +23,8 @@ from rest_framework.response import Response
 
 from nautobot_golden_config import filters, forms, models, tables
 from nautobot_golden_config.api import serializers
-from nautobot_golden_config.utilities import constant
+from nautobot_golden_config.utilities import constant, json_codec
+from nautobot_golden_config.utilities.compliance_diff import get_compliance_diff
 from nautobot_golden_config.utilities.config_postprocessing import get_config_postprocessing
 from nautobot_golden_config.utilities.graphql import graph_ql_query
 from nautobot_golden_config.utilities.helper import add_message, get_device_to_settings_map
@@ -172,16 +172,19 @@ class GoldenConfigUIViewSet(  # pylint: disable=abstract-method
         if self.device.id in settings:
             sot_agg_query_setting = settings[self.device.id].sot_agg_query
             if sot_agg_query_setting is not None:
-                _, self.output = graph_ql_query(request, self.device, sot_agg_query_setting.query)
+                _, self.output = graph_ql_query(
+                    request, self.device, sot_agg_query_setting.query, query_id=sot_agg_query_setting.pk
+                )
             else:
                 self.output = {"Error": "No saved `GraphQL Query` query was configured in the `Golden Config Setting`"}
         else:
             raise ObjectDoesNotExist(f"{self.device.name} does not map to a Golden Config Setting.")
 
         if self.structured_format == "yaml":
-            self.output = yaml.dump(json.loads(json.dumps(self.output)), default_flow_style=False)
+            # Converted to plain types, e.g. the OrderedDict of the GraphQL result, which YAML would tag.
+            self.output = yaml.dump(json_codec.loads(json_codec.dumps(self.output)), default_flow_style=False)
         else:
-            self.output = json.dumps(self.output, indent=4)
+            self.output = json_codec.dumps(self.output, indent=4)
         self.title_name = "Aggregate Data"
         return self._post_render(request)
 
@@ -190,7 +193,7 @@ class GoldenConfigUIViewSet(  # pylint: disable=abstract-method
         """Additional action to handle compliance."""
         self._pre_helper(pk, request)
 
-        self.output = self.config_details.compliance_config
+        self.output = get_compliance_diff(self.config_details)
         if self.config_details.backup_last_success_date:
             backup_date = str(self.config_details.backup_last_success_date.strftime("%b %d %Y"))
         else:
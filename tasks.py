@@ -836,3 +836,15 @@ def validate_app_config(context):
         file="development/app_config_schema.py",
         env={"APP_CONFIG_SCHEMA_COMMAND": "validate"},
     )
+
+
+@task(help={"names": "Comma separated names of the benchmarks to run, all of them when not set."})
+def benchmark(context, names=""):
+    """Run the benchmarks of the app optimizations against the implementations they replace."""
+    start(context, service="nautobot")
+    nbshell(
+        context,
+        plain=True,
+        file="development/benchmarks.py",
+        env={"BENCHMARK_NAMES": names},
+    )